@@ -0,0 +1,135 @@
+"""
+Admission control for expensive work (headless Chromium renders, PDF builds).
+
+Each pool runs at most ``capacity`` jobs at once.  Up to ``queue_size`` more
+wait in priority order (interactive reads, then PDF exports, then
+background prefetches; FIFO within a priority).  A request that would
+overflow the queue gets ``Overloaded``, which becomes a fast 503 with a
+``Retry-After`` estimate, unless it outranks a queued waiter, which is
+shed in its place.  Waiting longer than ``timeout`` also ends in
+``Overloaded``.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+from app import metrics
+from app.config import settings
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    EXPORT = 1
+    BACKGROUND = 2
+
+
+class Overloaded(Exception):
+    def __init__(self, pool: str, reason: str, retry_after: float):
+        super().__init__(f"{pool} is overloaded ({reason})")
+        self.pool = pool
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    future: asyncio.Future = field(compare=False)
+
+
+class AdmissionController:
+    def __init__(self, name: str, capacity: int, queue_size: int, timeout: float):
+        self.name = name
+        self.capacity = capacity
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._in_use = 0
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._service_time = 5.0  # moving average of how long a slot is held
+
+    def _retry_after(self) -> float:
+        """Rough time until a newcomer would get a slot."""
+        ahead = len(self._waiters) + 1
+        return max(1, math.ceil(self._service_time * ahead / max(1, self.capacity)))
+
+    def _update_gauges(self) -> None:
+        metrics.ADMISSION_QUEUE_DEPTH.labels(self.name).set(len(self._waiters))
+        metrics.ADMISSION_IN_USE.labels(self.name).set(self._in_use)
+
+    def _reject(self, priority: Priority, reason: str) -> Overloaded:
+        metrics.ADMISSION_REJECTED.labels(self.name, priority.name.lower(), reason).inc()
+        return Overloaded(self.name, reason, self._retry_after())
+
+    def _release(self) -> None:
+        """Hand the slot to the best waiter, or free it."""
+        while self._waiters:
+            waiter = heapq.heappop(self._waiters)
+            if not waiter.future.done():
+                waiter.future.set_result(None)
+                self._update_gauges()
+                return
+        self._in_use -= 1
+        self._update_gauges()
+
+    def _discard(self, waiter: _Waiter) -> None:
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+
+    async def _wait(self, priority: Priority) -> None:
+        if len(self._waiters) >= self.queue_size:
+            worst = max(self._waiters, default=None)  # none when queue_size is 0
+            if worst is None or worst.priority <= priority:
+                raise self._reject(priority, "queue full")
+            self._discard(worst)
+            worst.future.set_exception(self._reject(Priority(worst.priority), "shed"))
+
+        waiter = _Waiter(priority, next(self._seq), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, waiter)
+        self._update_gauges()
+        try:
+            async with asyncio.timeout(self.timeout):
+                await waiter.future
+        except BaseException as e:
+            future = waiter.future
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self._release()  # the slot was handed over just as we gave up
+            else:
+                self._discard(waiter)
+                self._update_gauges()
+            if isinstance(e, TimeoutError):
+                raise self._reject(priority, "timeout") from None
+            raise
+
+    @asynccontextmanager
+    async def admit(self, priority: Priority = Priority.INTERACTIVE):
+        """Hold one slot of this pool for the duration of the block."""
+        start = time.monotonic()
+        if self._in_use < self.capacity and not self._waiters:
+            self._in_use += 1
+            self._update_gauges()
+        else:
+            await self._wait(priority)
+        admitted = time.monotonic()
+        metrics.ADMISSION_WAIT.labels(self.name, priority.name.lower()).observe(admitted - start)
+        try:
+            yield
+        finally:
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - admitted)
+            self._release()
+
+
+renders = AdmissionController(
+    "playwright", settings.render_concurrency, settings.render_queue_size, settings.admission_timeout
+)
+pdf_exports = AdmissionController(
+    "pdf", settings.pdf_export_concurrency, settings.pdf_export_queue_size, settings.admission_timeout
+)
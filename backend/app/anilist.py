@@ -4,12 +4,17 @@ Anilist API client — OAuth2 + GraphQL for manga tracking.
 
 from urllib.parse import quote
 
-import httpx
+from app import metrics
+from app.cache import Cache
 from app.config import settings
+from app.http_client import get_http_client
 
 ANILIST_AUTH_URL = "https://anilist.co/api/v2/oauth/authorize"
 ANILIST_TOKEN_URL = "https://anilist.co/api/v2/oauth/token"
-GRAPHQL_URL = "https://graphql.anilist.co"
+GRAPHQL_URL = settings.anilist_graphql_url
+
+# Title searches are the same for everyone, so matches are shared across users
+_searches = Cache("anilist_search", settings.anilist_cache_ttl)
 
 
 def get_authorize_url(redirect_uri: str | None = None) -> str:
@@ -26,8 +31,8 @@ def get_authorize_url(redirect_uri: str | None = None) -> str:
 async def exchange_code(code: str, redirect_uri: str | None = None) -> dict:
     """Exchange an authorization code for an access token."""
     uri = redirect_uri or settings.anilist_redirect_uri
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(
+    with metrics.upstream_call("anilist") as call:
+        resp = await get_http_client().post(
             ANILIST_TOKEN_URL,
             json={
                 "grant_type": "authorization_code",
@@ -38,14 +43,15 @@ async def exchange_code(code: str, redirect_uri: str | None = None) -> dict:
             },
             headers={"Accept": "application/json"},
         )
-        resp.raise_for_status()
-        return resp.json()
+        call.record(resp)
+    resp.raise_for_status()
+    return resp.json()
 
 
 async def _graphql(query: str, variables: dict, access_token: str) -> dict:
     """Execute a GraphQL query against the Anilist API."""
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(
+    with metrics.upstream_call("anilist") as call:
+        resp = await get_http_client().post(
             GRAPHQL_URL,
             json={"query": query, "variables": variables},
             headers={
@@ -54,11 +60,12 @@ async def _graphql(query: str, variables: dict, access_token: str) -> dict:
                 "Accept": "application/json",
             },
         )
-        resp.raise_for_status()
-        data = resp.json()
-        if "errors" in data:
-            raise Exception(f"Anilist GraphQL error: {data['errors']}")
-        return data["data"]
+        call.record(resp)
+    resp.raise_for_status()
+    data = resp.json()
+    if "errors" in data:
+        raise Exception(f"Anilist GraphQL error: {data['errors']}")
+    return data["data"]
 
 
 async def get_viewer(access_token: str) -> dict:
@@ -77,7 +84,11 @@ async def get_viewer(access_token: str) -> dict:
 
 
 async def search_manga(title: str, access_token: str, page: int = 1) -> list[dict]:
-    """Search Anilist for manga by title."""
+    """Search Anilist for manga by title (cached for ``ANILIST_CACHE_TTL`` seconds)."""
+    key = f"{page}:{title.strip().lower()}"
+    cached = await _searches.get(key)
+    if cached is not None:
+        return cached
     query = """
     query ($search: String!, $page: Int) {
       Page(page: $page, perPage: 10) {
@@ -92,7 +103,9 @@ async def search_manga(title: str, access_token: str, page: int = 1) -> list[dic
     }
     """
     data = await _graphql(query, {"search": title, "page": page}, access_token)
-    return data["Page"]["media"]
+    media = data["Page"]["media"]
+    await _searches.set(key, media)
+    return media
 
 
 async def get_user_manga_list(access_token: str) -> list[dict]:
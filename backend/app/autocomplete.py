@@ -0,0 +1,90 @@
+"""
+Prefix-aware cache for type-ahead search.
+
+Typing "one piece" sends ``o``, ``on``, ``one``, ... in quick succession.
+Results are cached by normalized query (case and whitespace folded).  The
+site returns at most ``SEARCH_RESULT_CAP`` matches, so a cached result with
+fewer than that is the *complete* set of titles containing the query; any
+longer query starting with it is answered by filtering that set locally
+instead of asking the site again.
+
+Entries expire after ``SEARCH_CACHE_TTL`` seconds and the least recently
+used are dropped beyond ``SEARCH_CACHE_SIZE``.  Concurrent identical
+queries share one upstream call.
+"""
+
+import time
+import unicodedata
+from collections import OrderedDict
+
+from app import metrics
+from app.config import settings
+from app.singleflight import SingleFlight
+
+
+def normalize(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _fold(text: str) -> str:
+    """Lowercase and strip accents, for matching titles locally."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return " ".join("".join(c for c in decomposed if not unicodedata.combining(c)).split())
+
+
+class SearchCache:
+    def __init__(self, max_entries: int, ttl: float, cap: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cap = cap
+        self._entries: OrderedDict[str, tuple[float, list[dict]]] = OrderedDict()
+        self._flight = SingleFlight("search")
+
+    def _get(self, key: str) -> list[dict] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _put(self, key: str, mangas: list[dict]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, mangas)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _from_prefix(self, key: str) -> list[dict] | None:
+        """Filter the longest cached, complete prefix result down to ``key``."""
+        folded = _fold(key)
+        for end in range(len(key) - 1, 0, -1):
+            mangas = self._get(key[:end])
+            if mangas is not None and len(mangas) < self.cap:
+                return [m for m in mangas if folded in _fold(m["title"])]
+        return None
+
+    async def search(self, query: str, fetch) -> list[dict]:
+        """Return results for ``query``, calling ``await fetch(normalized_query)`` on a miss."""
+        key = normalize(query)
+        mangas = self._get(key)
+        if mangas is not None:
+            metrics.SEARCH_CACHE.labels("hit").inc()
+            return mangas
+        mangas = self._from_prefix(key)
+        if mangas is not None:
+            metrics.SEARCH_CACHE.labels("prefix_hit").inc()
+            self._put(key, mangas)
+            return mangas
+        metrics.SEARCH_CACHE.labels("miss").inc()
+        return await self._flight.do(key, self._fetch, key, fetch)
+
+    async def _fetch(self, key: str, fetch) -> list[dict]:
+        mangas = await fetch(key)
+        if self.ttl > 0:
+            self._put(key, mangas)
+        return mangas
+
+
+searches = SearchCache(settings.search_cache_size, settings.search_cache_ttl, settings.search_result_cap)
@@ -0,0 +1,137 @@
+"""
+Browser-harvested session for plain-HTTP scraping.
+
+When the site puts its pages behind a JavaScript or cookie challenge, a
+plain httpx request gets a bot wall.  Rather than rendering every page in
+Chromium, ``BrowserSession`` opens the site in a browser once, lets any
+challenge run, and copies the resulting cookies into the shared httpx
+client (along with the browser's client-hint headers, via ``headers``).
+Page and image fetches then go over plain HTTP with the same identity.
+
+The session is renewed ``BROWSER_SESSION_REFRESH_MARGIN`` seconds before its
+first cookie expires (or after ``BROWSER_SESSION_TTL`` seconds, whichever
+is sooner), and early when a fetch is refused with a 403.  Enable it with
+``BROWSER_SESSION=true``.
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+
+from app import admission, metrics, tracing
+from app.admission import Priority
+from app.config import settings
+from app.governor import governor
+from app.http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+MIN_INTERVAL = 30  # seconds between harvests, however often the session is reported stale
+
+
+class BrowserSession:
+    def __init__(self, url: str, user_agent: str, ttl: float, margin: float):
+        self.url = url
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.margin = margin
+        self.cookies: list[dict] = []
+        self.expires_at = 0.0
+        self._headers: dict[str, str] = {}
+        self._stale = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def headers(self, base: dict[str, str]) -> dict[str, str]:
+        """``base`` plus the client-hint headers the browser sent, if a session is live."""
+        if not self._headers or self.expires_at < time.time():
+            return base
+        return {**base, **self._headers}
+
+    def expire(self) -> None:
+        """Report the session as rejected, so it is renewed without waiting for expiry."""
+        if self._task:
+            self._stale.set()
+
+    async def harvest(self) -> None:
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError, async_playwright
+
+        async with admission.renders.admit(Priority.INTERACTIVE):
+            with tracing.span("browser_session", url=self.url):
+                async with async_playwright() as p:
+                    browser = await p.chromium.launch(headless=True)
+                    try:
+                        context = await browser.new_context(user_agent=self.user_agent)
+                        page = await context.new_page()
+                        navigations = []
+
+                        def on_response(response) -> None:
+                            if response.request.is_navigation_request() and response.frame == page.main_frame:
+                                navigations.append(response)
+
+                        page.on("response", on_response)
+                        async with governor.guard(self.url) as outcome:
+                            try:
+                                # A challenge page answers 403/503 first, then redirects once it passes
+                                resp = await page.goto(self.url, wait_until="networkidle", timeout=30000)
+                            except PlaywrightTimeoutError:
+                                outcome.status = 504
+                                raise
+                            # Judge the page the browser ended up on, so a challenge that
+                            # never passes counts against the breaker
+                            final = navigations[-1] if navigations else resp
+                            outcome.status = final.status if final is not None else 502
+                        outcome.raise_if_failed()
+                        sent = await resp.request.all_headers() if resp is not None else {}
+                        cookies = await context.cookies()
+                    finally:
+                        await browser.close()
+        if not cookies:
+            raise ValueError("the site set no cookies")
+        self._apply(cookies, {k: v for k, v in sent.items() if k.startswith("sec-ch-ua")})
+
+    def _apply(self, cookies: list[dict], headers: dict[str, str]) -> None:
+        jar = get_http_client().cookies
+        for old in self.cookies:
+            try:
+                jar.delete(old["name"], domain=old["domain"], path=old["path"])
+            except KeyError:
+                pass
+        for cookie in cookies:
+            jar.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"])
+        expiries = [c["expires"] for c in cookies if c.get("expires", -1) > 0]
+        self.cookies = cookies
+        self._headers = headers
+        self.expires_at = min([time.time() + self.ttl, *expiries])
+        metrics.BROWSER_SESSION_EXPIRY.set(self.expires_at)
+
+    async def _run(self) -> None:
+        while True:
+            self._stale.clear()
+            try:
+                await self.harvest()
+                metrics.BROWSER_SESSION_REFRESHES.labels("ok").inc()
+                wait = self.expires_at - time.time() - self.margin
+            except Exception as e:
+                logger.warning(f"Browser session refresh failed: {e}")
+                metrics.BROWSER_SESSION_REFRESHES.labels("error").inc()
+                wait = MIN_INTERVAL
+            await asyncio.sleep(MIN_INTERVAL)
+            try:
+                async with asyncio.timeout(max(0, wait - MIN_INTERVAL)):
+                    await self._stale.wait()
+            except TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if not settings.browser_session:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run(), context=contextvars.Context())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,253 @@
+"""
+Shared cache for parsed pages, chapter image lists, auth lookups and AniList
+searches.
+
+``CACHE_BACKEND`` picks where entries live:
+
+- ``memory`` (default): an LRU in this process, bounded by ``CACHE_MAX_ENTRIES``.
+- ``sqlite``: a SQLite file at ``CACHE_URL`` (WAL mode), shared by every
+  worker on the host.  Expired entries go first, then the entries closest
+  to expiring, once it holds more than ``CACHE_MAX_ENTRIES``.
+- ``redis``: a Redis-protocol server at ``CACHE_URL`` (``redis://...``),
+  shared by every worker that can reach it.  Eviction is left to the
+  server's ``maxmemory-policy``; the server's ``evicted_keys`` count (for
+  every client, not just this app) is polled into the eviction metric.
+
+The backend is built at startup (``init_backend``), so a misconfigured one
+stops the app there.  After that, values are JSON, zlib-compressed when
+large, and backend errors are logged and treated as misses, so a cache
+outage only costs speed.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any
+
+from app import metrics
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_ABOVE = 1024
+_RAW, _ZLIB = b"j", b"z"
+
+
+def dumps(value: Any) -> bytes:
+    data = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+    if len(data) > COMPRESS_ABOVE:
+        return _ZLIB + zlib.compress(data, 6)
+    return _RAW + data
+
+
+def loads(data: bytes) -> Any:
+    if data[:1] == _ZLIB:
+        return json.loads(zlib.decompress(data[1:]))
+    return json.loads(data[1:])
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            metrics.CACHE_EVICTIONS.labels(self.name).inc()
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def close(self) -> None:
+        pass
+
+
+class SqliteBackend:
+    name = "sqlite"
+    PRUNE_EVERY = 100  # sets between size checks
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or "cache.sqlite3", check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_expires_idx ON cache (expires)")
+        self._sets = 0
+
+    def _get(self, key: str) -> bytes | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl),
+            )
+            self._sets += 1
+            if self._sets % self.PRUNE_EVERY == 0:
+                self._prune()
+
+    def _prune(self) -> None:
+        self._db.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        (count,) = self._db.execute("SELECT count(*) FROM cache").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires LIMIT ?)", (excess,)
+            )
+            metrics.CACHE_EVICTIONS.labels(self.name).inc(excess)
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    async def get(self, key: str) -> bytes | None:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._delete, key)
+
+    async def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class RedisBackend:
+    name = "redis"
+    STATS_EVERY = 100  # sets between reads of the server's eviction count
+
+    def __init__(self, url: str):
+        import redis.asyncio
+
+        self._client = redis.asyncio.from_url(url or "redis://localhost:6379/0")
+        self._sets = 0
+        self._evicted: int | None = None
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._client.set(key, value, px=max(1, int(ttl * 1000)))
+        self._sets += 1
+        if self._sets % self.STATS_EVERY == 1:
+            await self._sync_evictions()
+
+    async def _sync_evictions(self) -> None:
+        try:
+            evicted = (await self._client.info("stats")).get("evicted_keys", 0)
+        except Exception as e:
+            logger.debug(f"Redis INFO failed: {e}")  # e.g. not allowed by the server's ACL
+            return
+        if self._evicted is not None and evicted > self._evicted:
+            metrics.CACHE_EVICTIONS.labels(self.name).inc(evicted - self._evicted)
+        self._evicted = evicted
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(key)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+_backend = None
+
+
+def _build_backend():
+    kind = settings.cache_backend
+    if kind == "sqlite":
+        return SqliteBackend(settings.cache_url, settings.cache_max_entries)
+    if kind == "redis":
+        return RedisBackend(settings.cache_url)
+    if kind == "memory":
+        return MemoryBackend(settings.cache_max_entries)
+    raise ValueError(f"Unknown CACHE_BACKEND {kind!r}; expected memory, sqlite or redis")
+
+
+def init_backend() -> None:
+    """Build the configured backend; raises if it can't be (bad name, missing package)."""
+    global _backend
+    if _backend is None:
+        _backend = _build_backend()
+
+
+def get_backend():
+    init_backend()
+    return _backend
+
+
+async def close_backend() -> None:
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+
+
+class Cache:
+    """A namespace of JSON-serializable values with a default TTL."""
+
+    def __init__(self, namespace: str, ttl: float):
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def _key(self, key: str) -> str:
+        return f"fiebre:{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Any | None:
+        try:
+            backend = get_backend()
+            data = await backend.get(self._key(key))
+        except Exception as e:
+            logger.warning(f"Cache get failed ({settings.cache_backend}): {e}")
+            metrics.CACHE_REQUESTS.labels(settings.cache_backend, self.namespace, "error").inc()
+            return None
+        if data is None:
+            metrics.CACHE_REQUESTS.labels(backend.name, self.namespace, "miss").inc()
+            return None
+        metrics.CACHE_REQUESTS.labels(backend.name, self.namespace, "hit").inc()
+        return loads(data)
+
+    async def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        try:
+            await get_backend().set(self._key(key), dumps(value), ttl)
+        except Exception as e:
+            logger.warning(f"Cache set failed ({settings.cache_backend}): {e}")
+
+    async def delete(self, key: str) -> None:
+        try:
+            await get_backend().delete(self._key(key))
+        except Exception as e:
+            logger.warning(f"Cache delete failed ({settings.cache_backend}): {e}")
@@ -0,0 +1,104 @@
+"""
+Stored chapter catalog (the ``manga_chapters`` table).
+
+Range operations such as "mark everything up to chapter N" run in the
+database through the ``mark_chapters_read`` SQL function, which reads the
+chapter list from this catalog instead of taking one URL per chapter from
+the caller.  The catalog is refreshed from the scraper when it is older
+than ``CATALOG_TTL``, or whenever a caller already has a fresh chapter list.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+from app import scraper
+from app.supabase_client import execute, get_supabase, upsert_chunked
+
+logger = logging.getLogger(__name__)
+
+CATALOG_TTL = timedelta(hours=1)
+
+
+async def _is_fresh(manga_url: str) -> bool:
+    result = await execute(
+        get_supabase()
+        .table("manga_chapters")
+        .select("synced_at")
+        .eq("manga_url", manga_url)
+        .order("synced_at", desc=True)
+        .limit(1)
+    )
+    if not result.data:
+        return False
+    synced_at = datetime.fromisoformat(result.data[0]["synced_at"])
+    return datetime.now(timezone.utc) - synced_at < CATALOG_TTL
+
+
+async def store(manga_url: str, chapters: list[dict]) -> None:
+    """Write a scraped chapter list (as returned by ``scraper.get_chapters``).
+
+    Catalogued chapters missing from the list (removed or re-uploaded under
+    a new URL) are deleted, so range marking doesn't touch them.
+    """
+    synced_at = datetime.now(timezone.utc).isoformat()
+    rows = [
+        {
+            "manga_url": manga_url,
+            "chapter_url": ch["url"],
+            "chapter_number": ch["chapter_number"],
+            "position": i,
+            "synced_at": synced_at,
+        }
+        for i, ch in enumerate(chapters)
+    ]
+    await upsert_chunked("manga_chapters", rows, on_conflict="manga_url,chapter_url")
+    # Every row of this list carries this synced_at; older ones weren't in it
+    await execute(
+        get_supabase()
+        .table("manga_chapters")
+        .delete()
+        .eq("manga_url", manga_url)
+        .lt("synced_at", synced_at)
+    )
+
+
+async def ensure(manga_url: str, chapters: list[dict] | None = None) -> bool:
+    """Make sure the catalog holds ``manga_url``'s chapters.
+
+    Pass ``chapters`` when the caller has just scraped them; otherwise the
+    catalog is only re-scraped once it is stale.  Returns False when no
+    chapter list could be obtained.
+    """
+    if chapters is None:
+        if await _is_fresh(manga_url):
+            return True
+        try:
+            chapters = await scraper.get_chapters(manga_url)
+        except Exception as e:
+            logger.warning(f"Failed to refresh chapter catalog for {manga_url}: {e}")
+            return False
+    if not chapters:
+        return False
+    await store(manga_url, chapters)
+    return True
+
+
+async def mark_read_up_to(
+    user_id: str, manga_url: str, max_chapter: float | None, is_read: bool = True
+) -> int:
+    """Mark every catalogued chapter numbered <= ``max_chapter`` (all if None) in one statement.
+
+    Returns the number of chapter_status rows that changed.
+    """
+    result = await execute(
+        get_supabase().rpc(
+            "mark_chapters_read",
+            {
+                "p_user_id": user_id,
+                "p_manga_url": manga_url,
+                "p_max_chapter": max_chapter,
+                "p_is_read": is_read,
+            },
+        )
+    )
+    return result.data or 0
@@ -10,6 +10,65 @@ class Settings(BaseSettings):
     anilist_redirect_uri: str = "http://192.168.0.135:5173/settings?anilist_callback=true"
     backend_url: str = "http://192.168.0.135:8000"
     frontend_url: str = "http://192.168.0.135:5173"
+    leercapitulo_url: str = "https://www.leercapitulo.co"
+    anilist_graphql_url: str = "https://graphql.anilist.co"
+    server_timing_enabled: bool = True
+    trace_sample_rate: float = 0.0
+    trace_otlp_endpoint: str = ""
+    loop_monitor_interval: float = 0.5
+    debug_blocking: bool = False
+    blocking_threshold_ms: float = 100
+    progress_debounce_seconds: float = 2.0
+    supabase_page_size: int = 1000
+    supabase_max_rows: int = 1000
+    chapter_images_ttl: int = 3600
+    image_cache_mb: float = 128
+    image_cache_dir: str = ""
+    image_cache_disk_mb: float = 2048
+    capture_render_images: bool = False
+    image_hedging: bool = False
+    image_timeout: float = 30
+    image_mirror_hosts: dict[str, list[str]] = {}
+    browser_session: bool = False
+    browser_session_ttl: int = 1800
+    browser_session_refresh_margin: int = 120
+    prefetch_enabled: bool = False
+    prefetch_pages: int = 4
+    prefetch_concurrency: int = 2
+    image_transcode_workers: int = 2
+    image_transcode_timeout_ms: float = 1500
+    upstream_rate: float = 5
+    upstream_burst: float = 10
+    upstream_host_rates: dict[str, float] = {}
+    upstream_concurrency: int = 8
+    upstream_max_wait: float = 10
+    upstream_retries: int = 2
+    upstream_backoff: float = 0.5
+    breaker_failures: int = 5
+    breaker_cooldown: float = 30
+    pdf_jobs_dir: str = ""
+    pdf_workers: int = 2
+    pdf_jobs_per_user: int = 2
+    pdf_job_ttl: float = 86400
+    render_concurrency: int = 2
+    render_queue_size: int = 16
+    pdf_export_concurrency: int = 2
+    pdf_export_queue_size: int = 4
+    admission_timeout: float = 30
+    listing_refresh_pages: int = 3
+    listing_refresh_interval: float = 300
+    listing_refresh_jitter: float = 0.1
+    search_cache_size: int = 2000
+    search_cache_ttl: float = 600
+    search_result_cap: int = 10
+    batch_detail_max: int = 50
+    batch_detail_concurrency: int = 4
+    cache_backend: str = "memory"
+    cache_url: str = ""
+    cache_max_entries: int = 10000
+    page_cache_ttl: float = 60
+    auth_cache_ttl: float = 60
+    anilist_cache_ttl: float = 3600
 
     class Config:
         env_file = ".env"
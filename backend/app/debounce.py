@@ -0,0 +1,99 @@
+"""
+Keyed, debounced background jobs.
+
+``schedule(*key)`` (re)starts a quiet-window timer for ``key``; once no new
+call has arrived for ``delay`` seconds the job runs once as ``fn(*key)``.
+Calls that arrive while the job is running queue exactly one follow-up run,
+so a burst of N calls costs at most two runs and the last call is never
+lost.  Jobs run outside the scheduling request's trace.
+"""
+
+import asyncio
+import contextvars
+import logging
+from dataclasses import dataclass, field
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    requested: int = 0  # schedule() calls so far
+    completed: int = 0  # calls covered by the last finished run
+    deadline: float = 0.0
+    running: bool = False
+    task: asyncio.Task | None = None
+    settled: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class KeyedDebouncer:
+    def __init__(self, name: str, fn, delay: float):
+        self.name = name
+        self.fn = fn
+        self.delay = delay
+        self._entries: dict[tuple, _Entry] = {}
+
+    def schedule(self, *key) -> None:
+        """Request a run for ``key`` after the quiet window."""
+        loop = asyncio.get_running_loop()
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry()
+        elif not entry.running:
+            metrics.DEBOUNCE_COALESCED.labels(self.name).inc()
+        entry.requested += 1
+        entry.deadline = loop.time() + self.delay
+        if entry.task is None:
+            entry.task = loop.create_task(self._run(key, entry), context=contextvars.Context())
+
+    async def _run(self, key: tuple, entry: _Entry) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while entry.completed < entry.requested:
+                while (remaining := entry.deadline - loop.time()) > 0:
+                    await asyncio.sleep(remaining)
+                target = entry.requested
+                entry.running = True
+                try:
+                    await self.fn(*key)
+                    metrics.DEBOUNCE_RUNS.labels(self.name, "ok").inc()
+                except Exception as e:
+                    logger.warning(f"{self.name} failed for {key}: {e}")
+                    metrics.DEBOUNCE_RUNS.labels(self.name, "error").inc()
+                finally:
+                    entry.running = False
+                entry.completed = target
+        finally:
+            del self._entries[key]
+            entry.settled.set()
+
+    def status(self, *key) -> str:
+        """``idle``, ``pending`` (waiting for the quiet window) or ``running``."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return "idle"
+        return "running" if entry.running else "pending"
+
+    async def wait(self, *key, timeout: float) -> bool:
+        """Wait until every run requested so far for ``key`` has finished.
+
+        Returns False if ``timeout`` expires first.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return True
+        try:
+            await asyncio.wait_for(entry.settled.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def drain(self, timeout: float) -> None:
+        """Run everything still pending now (used at shutdown)."""
+        for entry in self._entries.values():
+            entry.deadline = 0
+        tasks = [e.task for e in self._entries.values() if e.task]
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
@@ -1,6 +1,45 @@
+import asyncio
+import base64
+import hashlib
+import json
+import time
+
 from fastapi import Depends, HTTPException, Header
+from gotrue.types import User
+from app import metrics
+from app.cache import Cache
+from app.config import settings
 from app.supabase_client import get_supabase
 
+# Verified tokens -> user, so every request doesn't cost an Auth round-trip
+_users = Cache("auth_users", settings.auth_cache_ttl)
+
+
+def _seconds_left(token: str) -> float:
+    """Time until the JWT's ``exp``; only bounds the cache lifetime, not verified."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"]) - time.time()
+    except (IndexError, KeyError, TypeError, ValueError):
+        return 0
+
+
+async def _get_user(token: str) -> User | None:
+    """Ask Supabase Auth who owns ``token`` (cached for ``AUTH_CACHE_TTL`` seconds)."""
+    key = hashlib.sha256(token.encode()).hexdigest()
+    cached = await _users.get(key)
+    if cached is not None:
+        return User.model_validate(cached)
+    with metrics.upstream_call("supabase_auth") as call:
+        user_response = await asyncio.to_thread(get_supabase().auth.get_user, token)
+        call.status = "ok"
+    user = user_response.user if user_response else None
+    if user:
+        ttl = min(settings.auth_cache_ttl, _seconds_left(token))
+        await _users.set(key, user.model_dump(mode="json"), ttl)
+    return user
+
 
 async def get_current_user(authorization: str = Header(None)):
     """Extract and verify the Supabase JWT from the Authorization header."""
@@ -9,10 +48,10 @@ async def get_current_user(authorization: str = Header(None)):
 
     token = authorization.removeprefix("Bearer ")
     try:
-        user_response = get_supabase().auth.get_user(token)
-        if not user_response or not user_response.user:
+        user = await _get_user(token)
+        if not user:
             raise HTTPException(status_code=401, detail="Invalid token")
-        return user_response.user
+        return user
     except HTTPException:
         raise
     except Exception:
@@ -25,9 +64,7 @@ async def get_optional_user(authorization: str = Header(None)):
         return None
     token = authorization.removeprefix("Bearer ")
     try:
-        user_response = get_supabase().auth.get_user(token)
-        if user_response and user_response.user:
-            return user_response.user
+        return await _get_user(token)
     except Exception:
         pass
     return None
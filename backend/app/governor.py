@@ -0,0 +1,293 @@
+"""
+Upstream politeness governor.
+
+Every request to the manga site and its image CDN goes through here, so
+that under load we slow down instead of hammering a host that is already
+pushing back.  Per host:
+
+- a token bucket (``UPSTREAM_RATE`` requests/s, bursts of ``UPSTREAM_BURST``;
+  ``UPSTREAM_HOST_RATES`` overrides the rate for specific hosts),
+- a cap of ``UPSTREAM_CONCURRENCY`` requests in flight,
+- a circuit breaker: ``BREAKER_FAILURES`` consecutive failures (429, 403,
+  5xx, timeouts, connection errors) open it for ``BREAKER_COOLDOWN``
+  seconds, or for the host's ``Retry-After`` if longer.  After the cooldown
+  one probe request is let through (half-open); success closes the
+  breaker, failure re-opens it with a doubled cooldown.
+
+``get()`` also retries throttled and failed GETs with exponential backoff,
+honouring ``Retry-After``.  When a call is refused or keeps failing it
+raises ``UpstreamUnavailable``, which the app turns into a 503 with a
+``Retry-After`` header instead of a 500.
+"""
+
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+from app import metrics
+from app.config import settings
+from app.http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+FAILURE_STATUSES = {403, 429, 500, 502, 503, 504}
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 30.0
+
+
+class UpstreamUnavailable(Exception):
+    """An upstream host is throttling us, failing, or short-circuited."""
+
+    def __init__(self, host: str, reason: str, retry_after: float):
+        super().__init__(f"{host} unavailable ({reason})")
+        self.host = host
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    """Parse a Retry-After header (seconds or HTTP date)."""
+    value = resp.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Take a token, returning how long the caller must wait before using it."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_until = 0.0
+        self.probing = False
+
+    def allow(self) -> float:
+        """Return 0 if a call may proceed, else the seconds until it might."""
+        if self.state == self.CLOSED:
+            return 0.0
+        now = time.monotonic()
+        if now < self.opened_until:
+            return self.opened_until - now
+        if self.probing:
+            return 1.0
+        self.state = self.HALF_OPEN
+        self.probing = True
+        return 0.0
+
+    def success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probing = False
+        self.cooldown = self.base_cooldown
+
+    def failure(self, retry_after: float | None = None) -> bool:
+        """Count a failure; return True if this one opened the breaker."""
+        self.failures += 1
+        if self.state == self.HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, 600)
+        elif self.state == self.OPEN or self.failures < self.threshold:
+            return False
+        self.state = self.OPEN
+        self.probing = False
+        self.opened_until = time.monotonic() + max(self.cooldown, retry_after or 0)
+        return True
+
+
+class _Host:
+    def __init__(self, host: str):
+        self.host = host
+        rate = settings.upstream_host_rates.get(host, settings.upstream_rate)
+        self.bucket = TokenBucket(rate, max(1.0, settings.upstream_burst))
+        self.slots = asyncio.Semaphore(settings.upstream_concurrency)
+        self.breaker = CircuitBreaker(settings.breaker_failures, settings.breaker_cooldown)
+
+
+class Outcome:
+    """Filled in by the caller of ``guard()`` to report how the call went."""
+
+    __slots__ = ("_host", "status", "retry_after")
+
+    def __init__(self, host: _Host):
+        self._host = host
+        self.status: int | None = None
+        self.retry_after: float | None = None
+
+    def record(self, resp: httpx.Response) -> None:
+        self.status = resp.status_code
+        self.retry_after = _retry_after(resp)
+
+    @property
+    def failed(self) -> bool:
+        return self.status in FAILURE_STATUSES
+
+    def unavailable(self) -> UpstreamUnavailable:
+        reason = "timeout" if self.status == 504 else f"status {self.status}"
+        return UpstreamUnavailable(
+            self._host.host, reason, self.retry_after or self._host.breaker.cooldown
+        )
+
+    def raise_if_failed(self) -> None:
+        """Raise ``UpstreamUnavailable`` for a throttling or failure status."""
+        if self.failed:
+            raise self.unavailable()
+
+
+class Governor:
+    def __init__(self):
+        self._hosts: dict[str, _Host] = {}
+
+    def _host(self, url: str) -> _Host:
+        host = urlsplit(url).hostname or url
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _Host(host)
+        return state
+
+    def _set_state(self, state: _Host) -> None:
+        metrics.UPSTREAM_BREAKER_STATE.labels(state.host).set(state.breaker.state)
+
+    def _failure(self, state: _Host, retry_after: float | None = None) -> None:
+        if state.breaker.failure(retry_after):
+            logger.warning(
+                f"Circuit for {state.host} open for "
+                f"{state.breaker.opened_until - time.monotonic():.0f}s "
+                f"after {state.breaker.failures} failures"
+            )
+        self._set_state(state)
+
+    @asynccontextmanager
+    async def guard(self, url: str):
+        """Admit one call to ``url``'s host; report its status on the yielded ``Outcome``.
+
+        Raises ``UpstreamUnavailable`` if the breaker is open, the wait for a
+        token would exceed ``UPSTREAM_MAX_WAIT``, or the call times out or
+        can't connect.  Responses are passed through; a failure status only
+        feeds the breaker.
+        """
+        state = self._host(url)
+        wait = state.breaker.allow()
+        if wait:
+            metrics.UPSTREAM_SHORT_CIRCUITED.labels(state.host).inc()
+            raise UpstreamUnavailable(state.host, "circuit open", wait)
+        probe = state.breaker.state == CircuitBreaker.HALF_OPEN
+        self._set_state(state)
+
+        delay = state.bucket.reserve()
+        if delay > settings.upstream_max_wait:
+            state.bucket.tokens += 1  # give the token back
+            if probe:
+                state.breaker.probing = False
+            metrics.UPSTREAM_THROTTLED.labels(state.host, "rejected").inc()
+            raise UpstreamUnavailable(state.host, "rate limited", delay)
+        if delay:
+            metrics.UPSTREAM_THROTTLED.labels(state.host, "delayed").inc()
+            await asyncio.sleep(delay)
+
+        outcome = Outcome(state)
+        async with state.slots:
+            try:
+                yield outcome
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                self._failure(state)
+                raise UpstreamUnavailable(
+                    state.host, "timeout" if isinstance(e, httpx.TimeoutException) else "connection error",
+                    state.breaker.cooldown,
+                ) from e
+            except BaseException as e:
+                # Callers that can't raise httpx errors (Playwright) mark a
+                # timeout by setting ``outcome.status = 504`` before raising.
+                self._settle(state, outcome, probe)
+                if outcome.failed and isinstance(e, Exception) and not isinstance(e, UpstreamUnavailable):
+                    raise outcome.unavailable() from e
+                raise
+        self._settle(state, outcome, probe)
+
+    def _settle(self, state: _Host, outcome: Outcome, probe: bool) -> None:
+        if outcome.failed:
+            self._failure(state, outcome.retry_after)
+            return
+        if outcome.status is not None:
+            state.breaker.success()
+        elif probe:
+            state.breaker.probing = False  # no answer either way; let the next call probe
+        self._set_state(state)
+
+    async def get(self, url: str, upstream: str, **kwargs) -> httpx.Response:
+        """GET ``url`` through the governor, retrying throttled and failed attempts.
+
+        Returns the response (callers still ``raise_for_status()`` for
+        ordinary client errors).  Raises ``UpstreamUnavailable`` when the
+        host keeps throttling or failing.
+        """
+        state = self._host(url)
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                async with self.guard(url) as outcome:
+                    with metrics.upstream_call(upstream) as call:
+                        resp = await get_http_client().get(url, **kwargs)
+                        call.record(resp)
+                    outcome.record(resp)
+            except UpstreamUnavailable as e:
+                if e.reason in ("circuit open", "rate limited") or attempt >= settings.upstream_retries:
+                    raise
+                reason = e.reason
+            else:
+                if resp.status_code == 403:
+                    # Usually a bot wall; retrying right away only makes it worse.
+                    raise UpstreamUnavailable(state.host, "forbidden", state.breaker.cooldown)
+                if resp.status_code not in RETRYABLE_STATUSES:
+                    return resp
+                reason = f"status {resp.status_code}"
+                retry_after = outcome.retry_after
+                if attempt >= settings.upstream_retries:
+                    raise UpstreamUnavailable(state.host, reason, retry_after or state.breaker.cooldown)
+
+            delay = retry_after if retry_after is not None else self._backoff(attempt)
+            if delay > settings.upstream_max_wait:
+                raise UpstreamUnavailable(state.host, reason, delay)
+            metrics.UPSTREAM_RETRIES.labels(state.host, reason).inc()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(MAX_BACKOFF, settings.upstream_backoff * 2 ** attempt))
+
+
+governor = Governor()
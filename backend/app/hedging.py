@@ -0,0 +1,147 @@
+"""
+Hedged page-image downloads with timeouts learned from each host.
+
+A flat timeout lets one slow CDN edge stall a reader page, or a whole PDF,
+for half a minute.  With ``IMAGE_HEDGING=true``:
+
+- The last ``WINDOW`` download times of each image host are kept.  Once
+  there are enough of them, a download times out after ``TIMEOUT_FACTOR``
+  times the host's p99 (between ``MIN_TIMEOUT`` and ``IMAGE_TIMEOUT``).
+- A download still running at the host's p95 gets a second, hedged request,
+  sent to a mirror host if one is configured.  Whichever finishes first
+  wins and the other is cancelled.
+- If every request fails, the next mirror in ``IMAGE_MIRROR_HOSTS`` is tried.
+
+``fiebre_image_fetch_duration_seconds`` is the latency a reader sees,
+hedges included; ``fiebre_image_host_latency_seconds`` shows each host's
+current p50/p95/p99.
+"""
+
+import asyncio
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import httpx
+
+from app import metrics
+from app.config import settings
+from app.governor import governor
+from app.http_client import get_http_client
+
+WINDOW = 200
+MIN_SAMPLES = 20
+TIMEOUT_FACTOR = 3
+MIN_TIMEOUT = 2.0
+
+
+class LatencyWindow:
+    """The most recent download times for one host."""
+
+    def __init__(self, size: int):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        """The ``q`` quantile of recent samples, or None until there are enough."""
+        if len(self._samples) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class HedgedFetcher:
+    def __init__(self, timeout: float, mirrors: dict[str, list[str]]):
+        self.timeout = timeout
+        self.mirrors = mirrors
+        self._latency: dict[str, LatencyWindow] = {}
+
+    def _window(self, host: str) -> LatencyWindow:
+        window = self._latency.get(host)
+        if window is None:
+            window = self._latency[host] = LatencyWindow(WINDOW)
+        return window
+
+    def timeout_for(self, host: str) -> float:
+        p99 = self._window(host).quantile(0.99)
+        if p99 is None:
+            return self.timeout
+        return min(self.timeout, max(MIN_TIMEOUT, p99 * TIMEOUT_FACTOR))
+
+    def hedge_after(self, host: str) -> float | None:
+        return self._window(host).quantile(0.95)
+
+    def _observe(self, host: str, seconds: float) -> None:
+        window = self._window(host)
+        window.add(seconds)
+        for q in (0.5, 0.95, 0.99):
+            value = window.quantile(q)
+            if value is not None:
+                metrics.IMAGE_HOST_LATENCY.labels(host, str(q)).set(value)
+
+    def _mirror_urls(self, url: str) -> list[str]:
+        parts = urlsplit(url)
+        return [parts._replace(netloc=host).geturl() for host in self.mirrors.get(parts.netloc, [])]
+
+    async def _attempt(self, url: str, headers: dict[str, str]) -> bytes:
+        host = urlsplit(url).netloc
+        timeout = self.timeout_for(host)
+        async with governor.guard(url) as outcome:
+            start = time.monotonic()
+            try:
+                with metrics.upstream_call("images") as call:
+                    resp = await get_http_client().get(url, headers=headers, timeout=timeout)
+                    call.record(resp)
+            except httpx.TimeoutException:
+                self._observe(host, timeout)  # a lower bound, but it keeps a slowing host's quantiles honest
+                raise
+            outcome.record(resp)
+        outcome.raise_if_failed()
+        resp.raise_for_status()
+        self._observe(host, time.monotonic() - start)
+        return resp.content
+
+    async def fetch(self, url: str, headers: dict[str, str]) -> bytes:
+        """Download ``url``, hedging slow requests and failing over to mirrors."""
+        start = time.monotonic()
+        mirrors = self._mirror_urls(url)
+        running: dict[asyncio.Task, str] = {}
+
+        def launch(target: str, role: str) -> None:
+            task = asyncio.create_task(self._attempt(target, headers))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())  # losers' errors don't matter
+            running[task] = role
+
+        launch(url, "primary")
+        hedge_at = self.hedge_after(urlsplit(url).netloc)
+        error: BaseException | None = None
+        try:
+            while running:
+                wait = None if hedge_at is None else max(0.0, start + hedge_at - time.monotonic())
+                done, _ = await asyncio.wait(running, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedge_at = None
+                    metrics.IMAGE_HEDGES.labels("sent").inc()
+                    launch(mirrors.pop(0) if mirrors else url, "hedge")
+                    continue
+                for task in done:
+                    role = running.pop(task)
+                    if task.exception() is None:
+                        metrics.IMAGE_FETCH_DURATION.labels(role).observe(time.monotonic() - start)
+                        if role == "hedge":
+                            metrics.IMAGE_HEDGES.labels("won").inc()
+                        return task.result()
+                    error = task.exception()
+                    hedge_at = None  # after a failure, fail over instead of hedging
+                if not running and mirrors:
+                    launch(mirrors.pop(0), "mirror")
+            metrics.IMAGE_FETCH_DURATION.labels("failed").observe(time.monotonic() - start)
+            raise error
+        finally:
+            for task in running:
+                task.cancel()
+
+
+fetcher = HedgedFetcher(settings.image_timeout, settings.image_mirror_hosts)
@@ -0,0 +1,22 @@
+import httpx
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Lazy-initialize the shared outbound HTTP client on first use.
+
+    Building an ``httpx.AsyncClient`` loads the SSL context, which blocks the
+    event loop for ~100 ms, so every upstream call reuses one pooled client.
+    """
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(follow_redirects=True, timeout=30)
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
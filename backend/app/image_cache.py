@@ -0,0 +1,246 @@
+"""
+Cache of page images served through the image proxy.
+
+Images are kept in an in-memory LRU bounded by total size
+(``IMAGE_CACHE_MB``) and, when ``IMAGE_CACHE_DIR`` is set, in a directory
+on disk bounded by ``IMAGE_CACHE_DISK_MB``.  Chapter page URLs never change
+content, so entries don't expire; they are only evicted for space.
+
+Misses are downloaded once however many requests ask for the same image
+at the same time; see ``open_image``.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+from app import metrics, scraper
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _LRU:
+    """Byte-bounded LRU of key -> size; the caller stores the payload."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.sizes: OrderedDict[str, int] = OrderedDict()
+        self.total = 0
+
+    def touch(self, key: str) -> None:
+        self.sizes.move_to_end(key)
+
+    def add(self, key: str, size: int) -> list[str]:
+        """Record ``key`` and return the keys evicted to make room."""
+        if key in self.sizes:
+            self.total -= self.sizes.pop(key)
+        self.sizes[key] = size
+        self.total += size
+        evicted = []
+        while self.total > self.max_bytes and len(self.sizes) > 1:
+            old, old_size = self.sizes.popitem(last=False)
+            self.total -= old_size
+            evicted.append(old)
+        return evicted
+
+    def discard(self, key: str) -> None:
+        if key in self.sizes:
+            self.total -= self.sizes.pop(key)
+
+
+class ImageCache:
+    def __init__(self, memory_mb: float, directory: str, disk_mb: float):
+        self._memory: dict[str, bytes] = {}
+        self._memory_lru = _LRU(int(memory_mb * 1024 * 1024))
+        self._dir = Path(directory) if directory else None
+        self._disk_lru = _LRU(int(disk_mb * 1024 * 1024))
+        self._disk_loaded = False
+        self._disk_lock = threading.Lock()
+
+    @staticmethod
+    def _name(key: str) -> str:
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def _load_disk_index(self) -> None:
+        """Index existing cache files, oldest first, so eviction survives restarts."""
+        self._dir.mkdir(parents=True, exist_ok=True)
+        entries = sorted(
+            (e for e in os.scandir(self._dir) if e.is_file() and not e.name.endswith(".tmp")),
+            key=lambda e: e.stat().st_mtime,
+        )
+        for e in entries:
+            for old in self._disk_lru.add(e.name, e.stat().st_size):
+                (self._dir / old).unlink(missing_ok=True)
+        self._disk_loaded = True
+
+    def _disk_get(self, name: str) -> bytes | None:
+        with self._disk_lock:
+            if not self._disk_loaded:
+                self._load_disk_index()
+            if name not in self._disk_lru.sizes:
+                return None
+            try:
+                data = (self._dir / name).read_bytes()
+            except FileNotFoundError:
+                self._disk_lru.discard(name)
+                return None
+            self._disk_lru.touch(name)
+            return data
+
+    def _disk_put(self, name: str, data: bytes) -> None:
+        tmp = self._dir / f"{name}.{threading.get_ident()}.tmp"
+        with self._disk_lock:
+            if not self._disk_loaded:
+                self._load_disk_index()
+        tmp.write_bytes(data)
+        with self._disk_lock:
+            tmp.replace(self._dir / name)
+            for old in self._disk_lru.add(name, len(data)):
+                (self._dir / old).unlink(missing_ok=True)
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if self._memory_lru.max_bytes <= 0:
+            return
+        self._memory[key] = data
+        for old in self._memory_lru.add(key, len(data)):
+            self._memory.pop(old, None)
+        metrics.IMAGE_CACHE_BYTES.labels("memory").set(self._memory_lru.total)
+
+    async def get(self, key: str) -> bytes | None:
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory_lru.touch(key)
+            metrics.IMAGE_CACHE_REQUESTS.labels("memory_hit").inc()
+            return data
+        if self._dir:
+            data = await asyncio.to_thread(self._disk_get, self._name(key))
+            if data is not None:
+                self._remember(key, data)
+                metrics.IMAGE_CACHE_REQUESTS.labels("disk_hit").inc()
+                return data
+        metrics.IMAGE_CACHE_REQUESTS.labels("miss").inc()
+        return None
+
+    async def put(self, key: str, data: bytes) -> None:
+        self._remember(key, data)
+        if self._dir:
+            try:
+                await asyncio.to_thread(self._disk_put, self._name(key), data)
+            except OSError as e:
+                logger.warning(f"Image disk cache write failed: {e}")
+            metrics.IMAGE_CACHE_BYTES.labels("disk").set(self._disk_lru.total)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._memory or (
+            self._dir is not None and self._name(key) in self._disk_lru.sizes
+        )
+
+
+cache = ImageCache(settings.image_cache_mb, settings.image_cache_dir, settings.image_cache_disk_mb)
+
+
+class _Download:
+    """One upstream image download that any number of requests can follow.
+
+    Chunks are kept as they arrive, so a request that joins late replays
+    what it missed and then continues in step with the download.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.chunks: list[bytes] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self._progress = asyncio.Event()
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def _notify(self) -> None:
+        self._progress.set()
+        self._progress = asyncio.Event()
+
+    async def _run(self) -> None:
+        try:
+            async for chunk in scraper.stream_image_bytes(self.url):
+                self.chunks.append(chunk)
+                self._notify()
+            await cache.put(self.url, b"".join(self.chunks))
+        except BaseException as e:
+            self.error = e
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            self.done = True
+            self._notify()
+            _downloads.pop(self.url, None)
+
+    async def started(self) -> None:
+        """Wait for the first chunk; raises if the download failed before it."""
+        while not self.chunks and not self.done:
+            await self._progress.wait()
+        if self.error and not self.chunks:
+            raise self.error
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        i = 0
+        while True:
+            while i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+            if self.error:
+                raise self.error
+            if self.done:
+                return
+            await self._progress.wait()
+
+    async def read(self) -> bytes:
+        while not self.done:
+            await self._progress.wait()
+        if self.error:
+            raise self.error
+        return b"".join(self.chunks)
+
+
+_downloads: dict[str, _Download] = {}
+
+
+def _download(url: str) -> _Download:
+    """Join the in-flight download of ``url``, or start one."""
+    download = _downloads.get(url)
+    if download is None:
+        download = _downloads[url] = _Download(url)
+    else:
+        metrics.SINGLEFLIGHT_SHARED.labels("images").inc()
+    return download
+
+
+async def _single(data: bytes) -> AsyncIterator[bytes]:
+    yield data
+
+
+async def get_image(url: str) -> bytes:
+    """Return an image's bytes from the cache, downloading it on a miss."""
+    data = await cache.get(url)
+    if data is None:
+        data = await _download(url).read()
+    return data
+
+
+async def open_image(url: str) -> AsyncIterator[bytes]:
+    """Return an iterator over an image's bytes for streaming to a client.
+
+    Concurrent requests for the same URL share one upstream download and
+    each receive its bytes as they arrive.  Waits for the first chunk, so
+    upstream errors are raised here rather than mid-response.
+    """
+    data = await cache.get(url)
+    if data is not None:
+        return _single(data)
+    download = _download(url)
+    await download.started()
+    return download.stream()
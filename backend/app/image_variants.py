@@ -0,0 +1,107 @@
+"""
+Resized / transcoded variants of proxied images.
+
+``image-proxy?w=&q=&format=`` (or ``format=auto`` / no format with ``w``/``q``,
+which negotiates from the ``Accept`` header) re-encodes the original with
+Pillow in a process pool so the event loop and other requests aren't held
+by CPU-bound work.  Each variant is cached in the image cache under its own
+key, so it shares the cache's size bound and LRU eviction.
+
+If a transcode takes longer than ``IMAGE_TRANSCODE_TIMEOUT_MS`` the caller
+gets ``None`` and serves the original; the transcode keeps running and its
+result is cached for the next request.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app import image_cache, metrics, transcode
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUALITY = 75
+
+_pool: ProcessPoolExecutor | None = None
+_running: dict[str, asyncio.Task] = {}
+_avif = transcode.avif_supported()
+
+
+def negotiate(accept: str) -> str:
+    """Pick the most compact format the client accepts."""
+    accept = accept.lower()
+    if _avif and "image/avif" in accept:
+        return "avif"
+    if "image/webp" in accept:
+        return "webp"
+    return "jpeg"
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs threads can deadlock the child
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.image_transcode_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+
+
+async def _transcode_and_store(key: str, original: bytes, width: int | None, quality: int, fmt: str) -> bytes:
+    start = time.perf_counter()
+    try:
+        data = await asyncio.get_running_loop().run_in_executor(
+            _get_pool(), transcode.transcode, original, width, quality, fmt
+        )
+    finally:
+        metrics.IMAGE_TRANSCODE.labels(fmt).observe(time.perf_counter() - start)
+    metrics.IMAGE_TRANSCODE_SAVED.inc(max(0, len(original) - len(data)))
+    await image_cache.cache.put(key, data)
+    return data
+
+
+def _finished(key: str, task: asyncio.Task) -> None:
+    _running.pop(key, None)
+    if not task.cancelled() and task.exception():
+        # Nobody may be waiting any more (the caller timed out); log it here
+        logger.warning(f"Transcoding {key} failed: {task.exception()}")
+
+
+async def get_variant(url: str, original: bytes, width: int | None, quality: int | None, fmt: str) -> tuple[bytes, str] | None:
+    """Return ``(bytes, media_type)`` for the requested variant, or None to serve the original."""
+    if fmt == "avif" and not _avif:
+        fmt = "webp"
+    quality = quality or DEFAULT_QUALITY
+    key = f"{url}#w={width or ''}&q={quality}&f={fmt}"
+    media_type = transcode.MEDIA_TYPES[fmt]
+
+    cached = await image_cache.cache.get(key)
+    if cached is not None:
+        return cached, media_type
+
+    task = _running.get(key)
+    if task is None:
+        task = asyncio.get_running_loop().create_task(
+            _transcode_and_store(key, original, width, quality, fmt)
+        )
+        _running[key] = task
+        task.add_done_callback(lambda t: _finished(key, t))
+    try:
+        data = await asyncio.wait_for(asyncio.shield(task), settings.image_transcode_timeout_ms / 1000)
+    except asyncio.TimeoutError:
+        metrics.IMAGE_TRANSCODE_SLOW.inc()
+        return None
+    except Exception:
+        return None
+    return data, media_type
@@ -0,0 +1,147 @@
+"""
+Refresh-ahead snapshots of the popular and latest listings.
+
+The first ``LISTING_REFRESH_PAGES`` pages of each listing are re-scraped in
+the background every ``LISTING_REFRESH_INTERVAL`` seconds (with
+``LISTING_REFRESH_JITTER`` relative jitter, so workers and restarts don't
+synchronise).  A refresh builds a complete new snapshot and swaps it in as
+one reference assignment, so readers always see a consistent set of pages.
+Responses are pre-encoded JSON, so serving one doesn't touch the scraper.
+
+Each refresh is compared with the previous snapshot.  Manga that appear in,
+or move up, the latest feed have new chapters: their cached detail page and
+chapter list are dropped, and any listeners registered with ``subscribe``
+are told which manga changed.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import random
+from dataclasses import dataclass
+
+from app import metrics, scraper
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    data: dict[int, dict]
+    bodies: dict[int, tuple[bytes, str]]  # page -> (JSON body, ETag)
+
+
+def _encode(data: dict) -> tuple[bytes, str]:
+    body = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+    return body, f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+
+
+def _positions(data: dict[int, dict]) -> dict[str, int]:
+    """Manga URL -> overall position across the snapshot's pages."""
+    positions: dict[str, int] = {}
+    for page in sorted(data):
+        for manga in data[page]["mangas"]:
+            positions.setdefault(manga["url"], len(positions))
+    return positions
+
+
+class Listing:
+    def __init__(self, name: str, fetch, pages: int, track_moves: bool):
+        self.name = name
+        self.fetch = fetch
+        self.pages = pages
+        self.track_moves = track_moves
+        self.snapshot: Snapshot | None = None
+        self._listeners = []
+
+    def subscribe(self, callback) -> None:
+        """Call ``await callback(listing_name, changed_urls)`` after refreshes that change something."""
+        self._listeners.append(callback)
+
+    def get(self, page: int) -> tuple[bytes, str] | None:
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        return snapshot.bodies.get(page)
+
+    def _changes(self, old: Snapshot | None, new: dict[int, dict]) -> set[str]:
+        if old is None:
+            return set()
+        before, after = _positions(old.data), _positions(new)
+        if not self.track_moves:
+            return set(after) ^ set(before)
+        # In a recency-ordered feed, anything new or moved up has been updated
+        return {url for url, pos in after.items() if url not in before or pos < before[url]}
+
+    async def refresh(self) -> None:
+        old = self.snapshot
+        data = {}
+        for page in range(1, self.pages + 1):
+            try:
+                data[page] = await self.fetch(page, cached=False)
+            except Exception as e:
+                logger.warning(f"Refreshing {self.name} page {page} failed: {e}")
+                metrics.LISTING_REFRESHES.labels(self.name, "error").inc()
+                if old and page in old.data:
+                    data[page] = old.data[page]  # keep serving the previous copy
+                continue
+            if not data[page].get("has_next"):
+                break
+        if not data:
+            return
+        changed = self._changes(old, data)
+        self.snapshot = Snapshot(data, {page: _encode(d) for page, d in data.items()})
+        metrics.LISTING_REFRESHES.labels(self.name, "ok").inc()
+        if changed:
+            metrics.LISTING_CHANGES.labels(self.name).inc(len(changed))
+            for callback in self._listeners:
+                try:
+                    await callback(self.name, changed)
+                except Exception as e:
+                    logger.warning(f"{self.name} change listener failed: {e}")
+
+
+async def _invalidate(name: str, changed: set[str]) -> None:
+    for url in changed:
+        await scraper.invalidate_manga(url)
+
+
+popular = Listing("popular", scraper.get_popular, settings.listing_refresh_pages, track_moves=False)
+latest = Listing("latest", scraper.get_latest, settings.listing_refresh_pages, track_moves=True)
+latest.subscribe(_invalidate)
+
+
+class Refresher:
+    def __init__(self, listings: list[Listing], interval: float, jitter: float):
+        self.listings = listings
+        self.interval = interval
+        self.jitter = jitter
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            for listing in self.listings:
+                await listing.refresh()
+            spread = self.interval * self.jitter
+            await asyncio.sleep(self.interval + random.uniform(-spread, spread))
+
+    def start(self) -> None:
+        if settings.listing_refresh_pages <= 0:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run(), context=contextvars.Context())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+refresher = Refresher(
+    [popular, latest], settings.listing_refresh_interval, settings.listing_refresh_jitter
+)
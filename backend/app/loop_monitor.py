@@ -0,0 +1,93 @@
+"""
+Event-loop lag monitor and blocking-call detector.
+
+The lag monitor is a task that sleeps for a fixed interval and records how
+late it woke up; anything above a millisecond or two means some coroutine
+step held the loop.  It always runs and feeds ``fiebre_event_loop_lag_*``.
+
+With ``DEBUG_BLOCKING=true`` a watchdog thread also watches a heartbeat the
+loop bumps every few milliseconds.  When the heartbeat is older than
+``BLOCKING_THRESHOLD_MS`` the thread snapshots the loop thread's stack and
+logs it, which points straight at the blocking call.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from app import metrics
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    def __init__(self, interval: float, debug: bool, threshold_ms: float):
+        self.interval = interval
+        self.debug = debug
+        self.threshold = threshold_ms / 1000
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id = 0
+
+    async def _measure(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            metrics.EVENT_LOOP_LAG.observe(lag)
+            metrics.EVENT_LOOP_LAG_LAST.set(lag)
+
+    def _beat(self) -> None:
+        self._heartbeat = time.monotonic()
+        if not self._stop.is_set():
+            self._loop.call_later(self.threshold / 4, self._beat)
+
+    def _watch(self) -> None:
+        reported_beat = 0.0
+        while not self._stop.wait(self.threshold / 2):
+            beat = self._heartbeat
+            stalled = time.monotonic() - beat
+            if stalled < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            metrics.EVENT_LOOP_BLOCKED.inc()
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(
+                f"Event loop blocked for {stalled * 1000:.0f} ms (still running), stack:\n{stack}"
+            )
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._measure())
+        if self.debug:
+            self._loop_thread_id = threading.get_ident()
+            self._stop.clear()
+            self._beat()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+
+
+monitor = LoopMonitor(
+    settings.loop_monitor_interval, settings.debug_blocking, settings.blocking_threshold_ms
+)
@@ -1,9 +1,40 @@
-from fastapi import FastAPI
+import math
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from app import cache, image_variants, listings, metrics, scraper, tracing
 from app.config import settings
+from app.admission import Overloaded
+from app.governor import UpstreamUnavailable
+from app.http_client import close_http_client
+from app.loop_monitor import monitor
+from app.pdf_jobs import pdf_jobs
+from app.prefetch import prefetcher
 from app.routes import auth, manga, reader, library, anilist, chapters
 
-app = FastAPI(title="FiebreReader", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    cache.init_backend()
+    monitor.start()
+    await pdf_jobs.start()
+    scraper.session.start()
+    listings.refresher.start()
+    yield
+    await listings.refresher.stop()
+    await scraper.session.stop()
+    await chapters.progress_updates.drain(timeout=10)
+    await pdf_jobs.stop()
+    await prefetcher.stop()
+    await image_variants.shutdown()
+    await monitor.stop()
+    await cache.close_backend()
+    await close_http_client()
+
+
+app = FastAPI(title="FiebreReader", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,6 +43,27 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(tracing.TracingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+def _unavailable(detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=503,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable(request: Request, exc: UpstreamUnavailable):
+    return _unavailable(f"Upstream temporarily unavailable ({exc.reason}), try again later", exc.retry_after)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    return _unavailable(f"Server busy ({exc.reason}), try again later", exc.retry_after)
+
 
 app.include_router(auth.router)
 app.include_router(manga.router)
@@ -24,3 +76,9 @@ app.include_router(chapters.router)
 @app.get("/api/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
@@ -0,0 +1,345 @@
+"""
+Prometheus metrics for the API, its upstreams and the browser renderer.
+
+Exposed at ``GET /metrics``.  Everything here is a plain counter/gauge/
+histogram update so it is cheap enough to sit on every hot path.
+"""
+
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+from app import tracing
+
+SIZE_BUCKETS = (
+    16_384, 65_536, 262_144, 524_288, 1_048_576, 2_097_152,
+    4_194_304, 8_388_608, 16_777_216, 67_108_864,
+)
+
+REQUEST_DURATION = Histogram(
+    "fiebre_http_request_duration_seconds",
+    "Time spent handling an API request, until the response body is sent.",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "fiebre_http_requests_in_flight",
+    "API requests currently being handled.",
+)
+
+UPSTREAM_DURATION = Histogram(
+    "fiebre_upstream_request_duration_seconds",
+    "Latency of calls to upstream services.",
+    ["upstream"],
+)
+UPSTREAM_REQUESTS = Counter(
+    "fiebre_upstream_requests_total",
+    "Calls to upstream services by response status ('error' for transport failures).",
+    ["upstream", "status"],
+)
+UPSTREAM_BYTES = Counter(
+    "fiebre_upstream_response_bytes_total",
+    "Response body bytes received from upstream services.",
+    ["upstream"],
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "fiebre_upstream_requests_in_flight",
+    "Upstream calls currently waiting for a response.",
+    ["upstream"],
+)
+
+UPSTREAM_THROTTLED = Counter(
+    "fiebre_upstream_throttled_total",
+    "Upstream calls held back by the per-host rate limit ('delayed' waited, 'rejected' got a 503).",
+    ["host", "result"],
+)
+UPSTREAM_SHORT_CIRCUITED = Counter(
+    "fiebre_upstream_short_circuited_total",
+    "Upstream calls refused without being sent because the host's circuit was open.",
+    ["host"],
+)
+UPSTREAM_RETRIES = Counter(
+    "fiebre_upstream_retries_total",
+    "Upstream GETs retried after throttling or failure.",
+    ["host", "reason"],
+)
+UPSTREAM_BREAKER_STATE = Gauge(
+    "fiebre_upstream_circuit_state",
+    "Per-host circuit breaker state: 0 closed, 1 half-open, 2 open.",
+    ["host"],
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "fiebre_admission_queue_depth",
+    "Requests waiting for a slot in an admission-controlled pool.",
+    ["pool"],
+)
+ADMISSION_IN_USE = Gauge(
+    "fiebre_admission_in_use",
+    "Slots currently held in an admission-controlled pool.",
+    ["pool"],
+)
+ADMISSION_WAIT = Histogram(
+    "fiebre_admission_wait_seconds",
+    "Time spent queued before being admitted to a pool.",
+    ["pool", "priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30),
+)
+ADMISSION_REJECTED = Counter(
+    "fiebre_admission_rejected_total",
+    "Requests turned away by admission control (queue full, shed for higher priority, timeout).",
+    ["pool", "priority", "reason"],
+)
+
+PLAYWRIGHT_RENDER = Histogram(
+    "fiebre_playwright_render_seconds",
+    "Time to render a chapter page in headless Chromium and extract its images.",
+    buckets=(0.5, 1, 2, 3, 4, 5, 7.5, 10, 15, 20, 30, 45, 60),
+)
+PLAYWRIGHT_FAILURES = Counter(
+    "fiebre_playwright_failures_total",
+    "Chapter renders that raised an error.",
+)
+
+BROWSER_SESSION_REFRESHES = Counter(
+    "fiebre_browser_session_refreshes_total",
+    "Browser session harvests, by result.",
+    ["result"],
+)
+
+BROWSER_SESSION_EXPIRY = Gauge(
+    "fiebre_browser_session_expiry_timestamp_seconds",
+    "When the current browser session's cookies expire.",
+)
+
+RENDER_IMAGES_CAPTURED = Counter(
+    "fiebre_render_images_captured_total",
+    "Page images the browser downloaded during a render that were copied into the image cache.",
+)
+
+CHAPTER_IMAGES_STREAM = Counter(
+    "fiebre_chapter_images_stream_total",
+    "Streamed chapter image lists, by where the complete list came from (cache, html, render).",
+    ["source"],
+)
+
+IMAGE_BYTES = Histogram(
+    "fiebre_image_bytes",
+    "Size of page images downloaded from the image CDN.",
+    buckets=SIZE_BUCKETS,
+)
+IMAGE_FETCH_DURATION = Histogram(
+    "fiebre_image_fetch_duration_seconds",
+    "Time to download a page image with hedging, by which request delivered it (primary, hedge, mirror, failed).",
+    ["winner"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 8, 13, 20, 30),
+)
+IMAGE_HEDGES = Counter(
+    "fiebre_image_hedges_total",
+    "Hedged image requests sent, and how many of them finished first.",
+    ["result"],
+)
+IMAGE_HOST_LATENCY = Gauge(
+    "fiebre_image_host_latency_seconds",
+    "Recent image download time quantiles per host, as used for hedging and timeouts.",
+    ["host", "quantile"],
+)
+PDF_BYTES = Histogram(
+    "fiebre_pdf_bytes",
+    "Size of generated chapter PDFs.",
+    buckets=SIZE_BUCKETS,
+)
+
+PDF_JOBS = Counter(
+    "fiebre_pdf_jobs_total",
+    "PDF export jobs by event (submitted, deduplicated, done, failed).",
+    ["event"],
+)
+PDF_JOBS_QUEUED = Gauge(
+    "fiebre_pdf_jobs_queued",
+    "PDF export jobs waiting for a worker.",
+)
+PDF_JOB_DURATION = Histogram(
+    "fiebre_pdf_job_duration_seconds",
+    "Time to build a PDF export job once a worker picks it up.",
+    buckets=(1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600),
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "fiebre_event_loop_lag_seconds",
+    "How late the event loop woke up a periodic timer.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+EVENT_LOOP_LAG_LAST = Gauge(
+    "fiebre_event_loop_lag_last_seconds",
+    "Most recent event loop lag sample.",
+)
+EVENT_LOOP_BLOCKED = Counter(
+    "fiebre_event_loop_blocked_total",
+    "Times the blocking-call detector saw the loop stalled past its threshold.",
+)
+
+DEBOUNCE_RUNS = Counter(
+    "fiebre_debounced_runs_total",
+    "Debounced background jobs run, by job and result.",
+    ["job", "result"],
+)
+DEBOUNCE_COALESCED = Counter(
+    "fiebre_debounced_coalesced_total",
+    "Requests folded into an already pending debounced job.",
+    ["job"],
+)
+
+SINGLEFLIGHT_SHARED = Counter(
+    "fiebre_singleflight_shared_total",
+    "Calls that joined an identical call already in flight instead of starting their own.",
+    ["name"],
+)
+
+CACHE_REQUESTS = Counter(
+    "fiebre_cache_requests_total",
+    "Shared cache lookups by backend, namespace and result (hit, miss, error).",
+    ["backend", "namespace", "result"],
+)
+CACHE_EVICTIONS = Counter(
+    "fiebre_cache_evictions_total",
+    "Shared cache entries evicted for space.",
+    ["backend"],
+)
+
+SEARCH_CACHE = Counter(
+    "fiebre_search_cache_requests_total",
+    "Search lookups by result (hit, prefix_hit answered by filtering a shorter query, miss).",
+    ["result"],
+)
+
+IMAGE_CACHE_REQUESTS = Counter(
+    "fiebre_image_cache_requests_total",
+    "Image proxy cache lookups by result (memory_hit, disk_hit, miss).",
+    ["result"],
+)
+IMAGE_CACHE_BYTES = Gauge(
+    "fiebre_image_cache_bytes",
+    "Bytes held by the image proxy cache.",
+    ["tier"],
+)
+
+IMAGE_TRANSCODE = Histogram(
+    "fiebre_image_transcode_seconds",
+    "Time to resize/transcode a page image in the worker pool, by output format.",
+    ["format"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+IMAGE_TRANSCODE_SLOW = Counter(
+    "fiebre_image_transcode_slow_total",
+    "Variant requests answered with the original because transcoding took too long.",
+)
+IMAGE_TRANSCODE_SAVED = Counter(
+    "fiebre_image_transcode_saved_bytes_total",
+    "Bytes saved by transcoded variants compared to their originals.",
+)
+
+LISTING_REFRESHES = Counter(
+    "fiebre_listing_refreshes_total",
+    "Background refreshes of the popular/latest snapshots by result.",
+    ["listing", "result"],
+)
+LISTING_CHANGES = Counter(
+    "fiebre_listing_changes_total",
+    "Manga found added or updated between listing refreshes.",
+    ["listing"],
+)
+
+PREFETCH_JOBS = Counter(
+    "fiebre_prefetch_jobs_total",
+    "Chapter-ahead prefetch jobs by outcome.",
+    ["result"],
+)
+PREFETCH_IMAGES = Counter(
+    "fiebre_prefetch_images_total",
+    "Page images downloaded into the cache ahead of the reader.",
+)
+
+
+class _UpstreamCall:
+    __slots__ = ("status", "nbytes")
+
+    def __init__(self):
+        self.status = "error"
+        self.nbytes = 0
+
+    def record(self, resp) -> None:
+        """Record the status and body size of an httpx response."""
+        self.status = str(resp.status_code)
+        self.nbytes = len(resp.content)
+
+
+@contextmanager
+def upstream_call(upstream: str, **attrs):
+    """Time one upstream call; call ``.record(resp)`` on the yielded object.
+
+    Calls that leave the block without recording a response (timeouts,
+    connection errors, client exceptions) are counted with status ``error``;
+    callers that have no HTTP response set ``.status`` themselves.  The call
+    is also recorded as a trace span named after the upstream, with
+    ``attrs`` attached.
+    """
+    call = _UpstreamCall()
+    in_flight = UPSTREAM_IN_FLIGHT.labels(upstream)
+    in_flight.inc()
+    start = time.perf_counter()
+    try:
+        with tracing.span(upstream, **attrs):
+            yield call
+    finally:
+        in_flight.dec()
+        UPSTREAM_DURATION.labels(upstream).observe(time.perf_counter() - start)
+        UPSTREAM_REQUESTS.labels(upstream, call.status).inc()
+        if call.nbytes:
+            UPSTREAM_BYTES.labels(upstream).inc(call.nbytes)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request duration and in-flight requests.
+
+    The route label is the matched path template (``/api/manga/detail``),
+    never the raw URL, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            REQUEST_DURATION.labels(
+                scope["method"], route.path if route else "unmatched", status
+            ).observe(time.perf_counter() - start)
+
+
+def render() -> tuple[bytes, str]:
+    """Return the current metrics in the Prometheus text format."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,290 @@
+"""
+Background PDF export jobs.
+
+Building a PDF means rendering the chapter, downloading every page and
+running img2pdf, which can outlast proxy timeouts.  Instead a client submits
+a job, polls its progress and downloads the finished file (with ``Range``
+support, see ``routes/reader.py``).
+
+- At most ``PDF_WORKERS`` jobs build at once; the rest wait in a queue.
+- A reader may have ``PDF_JOBS_PER_USER`` unfinished jobs of their own.
+- A job's id is derived from its chapter list, so submitting the same
+  chapters again (by anyone) joins the existing job or reuses its file.
+  Each submitter gets their own random token, which the status and
+  download routes require, so knowing the chapter URLs isn't enough to
+  read someone else's job.
+- Pages are spilled to a scratch directory as they download and img2pdf
+  reads them back from there, so a build never holds every page in a list.
+- Job state is written next to the PDFs in ``PDF_JOBS_DIR`` and reloaded at
+  startup; jobs interrupted by a restart are queued again.  Finished jobs
+  are deleted ``PDF_JOB_TTL`` seconds after they complete.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import shutil
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import img2pdf
+
+from app import image_cache, metrics, scraper, tracing
+from app.admission import Overloaded, Priority
+from app.config import settings
+from app.governor import UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+MAX_CHAPTERS = 50
+ATTEMPTS = 3
+ACTIVE = ("queued", "running")
+
+
+class JobLimitExceeded(Exception):
+    pass
+
+
+def chapter_filename(url: str) -> str:
+    parts = url.rstrip("/").split("/")
+    return f"chapter-{parts[-1]}.pdf" if parts else "chapter.pdf"
+
+
+@dataclass
+class Job:
+    id: str
+    chapter_urls: list[str]
+    filename: str
+    owners: list[str] = field(default_factory=list)
+    tokens: dict[str, str] = field(default_factory=dict)  # owner -> access token
+    state: str = "queued"  # queued, running, done, failed
+    chapters_done: int = 0
+    pages_done: int = 0
+    pages_total: int = 0
+    size: int = 0
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def public(self) -> dict:
+        return {
+            "id": self.id,
+            "state": self.state,
+            "filename": self.filename,
+            "chapters_total": len(self.chapter_urls),
+            "chapters_done": self.chapters_done,
+            "pages_total": self.pages_total,
+            "pages_done": self.pages_done,
+            "size": self.size,
+            "error": self.error,
+        }
+
+
+class PdfJobs:
+    def __init__(self, directory: str, workers: int, per_user: int, ttl: float):
+        self.dir = Path(directory or Path(tempfile.gettempdir()) / "fiebrereader-pdf-jobs")
+        self.workers = workers
+        self.per_user = per_user
+        self.ttl = ttl
+        self._jobs: dict[str, Job] = {}
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+
+    def artifact(self, job: Job) -> Path:
+        return self.dir / f"{job.id}.pdf"
+
+    def _state_file(self, job_id: str) -> Path:
+        return self.dir / f"{job_id}.json"
+
+    def _load(self) -> list[Job]:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        jobs = []
+        for path in self.dir.glob("*.json"):
+            try:
+                jobs.append(Job(**json.loads(path.read_text())))
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning(f"Skipping unreadable PDF job {path.name}: {e}")
+        return jobs
+
+    def _write(self, job: Job) -> None:
+        tmp = self._state_file(job.id).with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(asdict(job)))
+        tmp.replace(self._state_file(job.id))
+
+    async def _save(self, job: Job) -> None:
+        job.updated_at = time.time()
+        try:
+            await asyncio.to_thread(self._write, job)
+        except OSError as e:
+            logger.warning(f"Could not persist PDF job {job.id}: {e}")
+
+    def _delete(self, job: Job) -> None:
+        self._state_file(job.id).unlink(missing_ok=True)
+        self.artifact(job).unlink(missing_ok=True)
+
+    async def _prune(self) -> None:
+        cutoff = time.time() - self.ttl
+        for job in [j for j in self._jobs.values() if j.state not in ACTIVE and j.updated_at < cutoff]:
+            del self._jobs[job.id]
+            await asyncio.to_thread(self._delete, job)
+
+    def _update_gauge(self) -> None:
+        metrics.PDF_JOBS_QUEUED.set(sum(j.state == "queued" for j in self._jobs.values()))
+
+    async def start(self) -> None:
+        for job in await asyncio.to_thread(self._load):
+            if job.state == "done" and not self.artifact(job).exists():
+                continue
+            if job.state == "running":
+                job.state = "queued"
+            self._jobs[job.id] = job
+            if job.state == "queued":
+                self._queue.put_nowait(job.id)
+        await self._prune()
+        self._update_gauge()
+        loop = asyncio.get_running_loop()
+        self._tasks = [
+            loop.create_task(self._worker(), context=contextvars.Context())
+            for _ in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Stop the workers; interrupted jobs stay queued on disk and resume at startup."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def get(self, job_id: str, token: str) -> Job | None:
+        """The job, if ``token`` was issued to one of its owners."""
+        job = self._jobs.get(job_id)
+        if job is None or not any(hmac.compare_digest(token, t) for t in job.tokens.values()):
+            return None
+        return job
+
+    async def submit(self, owner: str, chapter_urls: list[str], filename: str) -> tuple[Job, str]:
+        """Queue a PDF of ``chapter_urls``, or join the identical job if one exists.
+
+        Returns the job and ``owner``'s token for it.  Raises
+        ``JobLimitExceeded`` if ``owner`` already has the maximum number of
+        unfinished jobs.
+        """
+        job_id = hashlib.sha1("\n".join(chapter_urls).encode()).hexdigest()[:20]
+        job = self._jobs.get(job_id)
+        if job and (job.state in ACTIVE or job.state == "done" and self.artifact(job).exists()):
+            metrics.PDF_JOBS.labels("deduplicated").inc()
+            if owner not in job.tokens:
+                if owner not in job.owners:
+                    job.owners.append(owner)
+                job.tokens[owner] = secrets.token_urlsafe(16)
+                await self._save(job)
+            return job, job.tokens[owner]
+
+        active = sum(j.state in ACTIVE and owner in j.owners for j in self._jobs.values())
+        if active >= self.per_user:
+            raise JobLimitExceeded(f"At most {self.per_user} PDF jobs may be in progress at once")
+
+        await self._prune()
+        token = secrets.token_urlsafe(16)
+        job = self._jobs[job_id] = Job(job_id, chapter_urls, filename, owners=[owner], tokens={owner: token})
+        await self._save(job)
+        self._queue.put_nowait(job_id)
+        metrics.PDF_JOBS.labels("submitted").inc()
+        self._update_gauge()
+        return job, token
+
+    async def _worker(self) -> None:
+        while True:
+            job = self._jobs.get(await self._queue.get())
+            if job is None or job.state != "queued":
+                continue
+            job.state = "running"
+            self._update_gauge()
+            await self._save(job)
+            start = time.monotonic()
+            try:
+                await self._build(job)
+                job.state = "done"
+                metrics.PDF_JOBS.labels("done").inc()
+            except asyncio.CancelledError:
+                job.state = "queued"
+                await self._save(job)
+                raise
+            except Exception as e:
+                logger.warning(f"PDF job {job.id} failed: {e}")
+                job.state = "failed"
+                job.error = str(e)
+                metrics.PDF_JOBS.labels("failed").inc()
+            metrics.PDF_JOB_DURATION.observe(time.monotonic() - start)
+            await self._save(job)
+
+    @staticmethod
+    async def _patiently(fn, *args):
+        """Call ``fn``, waiting out upstream throttling and a saturated browser pool."""
+        for attempt in range(ATTEMPTS):
+            try:
+                return await fn(*args)
+            except (UpstreamUnavailable, Overloaded) as e:
+                if attempt == ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(min(e.retry_after, 60))
+
+    async def _page(self, url: str) -> bytes | None:
+        """Download one page; None if it can't be had."""
+        try:
+            return await self._patiently(image_cache.get_image, url)
+        except (UpstreamUnavailable, Overloaded):
+            raise
+        except Exception as e:
+            logger.info(f"Skipping PDF page {url}: {e}")
+            return None
+
+    def _scratch(self, job: Job) -> Path:
+        return self.dir / f"{job.id}.pages"
+
+    async def _build(self, job: Job) -> None:
+        job.chapters_done = job.pages_done = job.pages_total = 0
+        job.error = None
+        scratch = self._scratch(job)
+        await asyncio.to_thread(shutil.rmtree, scratch, True)
+        await asyncio.to_thread(scratch.mkdir, parents=True)
+        try:
+            pages: list[str] = []
+            for chapter_url in job.chapter_urls:
+                image_urls = await self._patiently(scraper.get_chapter_images, chapter_url, Priority.EXPORT)
+                job.pages_total += len(image_urls)
+                for image_url in image_urls:
+                    data = await self._page(image_url)
+                    if data:
+                        path = scratch / f"{len(pages):05d}"
+                        await asyncio.to_thread(path.write_bytes, data)
+                        pages.append(str(path))
+                    job.pages_done += 1
+                job.chapters_done += 1
+                await self._save(job)
+            if not pages:
+                raise ValueError("No images found for this chapter")
+
+            tmp = self.artifact(job).with_suffix(".pdf.tmp")
+            with tracing.span("img2pdf", pages=len(pages)):
+                await asyncio.to_thread(self._convert, pages, tmp)
+            job.size = tmp.stat().st_size
+            metrics.PDF_BYTES.observe(job.size)
+            await asyncio.to_thread(tmp.replace, self.artifact(job))
+        finally:
+            await asyncio.to_thread(shutil.rmtree, scratch, True)
+
+    @staticmethod
+    def _convert(pages: list[str], out: Path) -> None:
+        with open(out, "wb") as f:
+            img2pdf.convert(pages, outputstream=f)
+
+
+pdf_jobs = PdfJobs(
+    settings.pdf_jobs_dir, settings.pdf_workers, settings.pdf_jobs_per_user, settings.pdf_job_ttl
+)
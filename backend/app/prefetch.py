@@ -0,0 +1,100 @@
+"""
+Chapter-ahead prefetching (opt-in with ``PREFETCH_ENABLED=true``).
+
+When a reader opens or finishes a chapter, the next chapter's image list is
+rendered in the background and its first ``PREFETCH_PAGES`` pages are
+downloaded into the image proxy cache, so moving on to the next chapter is
+served from memory instead of waiting for Playwright and the CDN.
+
+Each reader has at most one prefetch in flight; a trigger for a different
+chapter cancels the previous one.  At most ``PREFETCH_CONCURRENCY``
+prefetches run at once across all readers; triggers beyond that budget are
+dropped rather than queued, since a late prefetch is worthless.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import logging
+
+from fastapi import Request
+
+from app import image_cache, metrics, scraper
+from app.admission import Overloaded, Priority
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def reader_key(request: Request) -> str:
+    """Identify a reader without an auth round-trip (token if sent, else client address)."""
+    auth = request.headers.get("authorization")
+    if auth:
+        return hashlib.sha1(auth.encode()).hexdigest()
+    return request.client.host if request.client else "anonymous"
+
+
+class Prefetcher:
+    def __init__(self, enabled: bool, pages: int, concurrency: int):
+        self.enabled = enabled
+        self.pages = pages
+        self.concurrency = concurrency
+        self._jobs: dict[str, tuple[str, asyncio.Task]] = {}
+
+    def trigger(self, reader: str, manga_url: str, chapter_url: str) -> None:
+        """Prefetch the chapter after ``chapter_url`` for ``reader``."""
+        if not self.enabled or self.pages <= 0:
+            return
+        current = self._jobs.get(reader)
+        if current:
+            if current[0] == chapter_url:
+                return
+            current[1].cancel()
+            del self._jobs[reader]
+        elif len(self._jobs) >= self.concurrency:
+            metrics.PREFETCH_JOBS.labels("over_budget").inc()
+            return
+        task = asyncio.get_running_loop().create_task(
+            self._run(manga_url, chapter_url), context=contextvars.Context()
+        )
+        self._jobs[reader] = (chapter_url, task)
+        task.add_done_callback(lambda t: self._forget(reader, t))
+
+    def _forget(self, reader: str, task: asyncio.Task) -> None:
+        current = self._jobs.get(reader)
+        if current and current[1] is task:
+            del self._jobs[reader]
+
+    async def _run(self, manga_url: str, chapter_url: str) -> None:
+        try:
+            chapters = await scraper.get_chapters(manga_url)
+            urls = [scraper._abs_url(ch["url"]) for ch in chapters]
+            current = scraper._abs_url(chapter_url)
+            if current not in urls or urls[-1] == current:
+                metrics.PREFETCH_JOBS.labels("no_next").inc()
+                return
+            next_url = urls[urls.index(current) + 1]
+
+            images = await scraper.get_chapter_images(next_url, Priority.BACKGROUND)
+            for image_url in images[: self.pages]:
+                if image_url not in image_cache.cache:
+                    await image_cache.get_image(image_url)
+                    metrics.PREFETCH_IMAGES.inc()
+            metrics.PREFETCH_JOBS.labels("done").inc()
+        except asyncio.CancelledError:
+            metrics.PREFETCH_JOBS.labels("cancelled").inc()
+            raise
+        except Overloaded:
+            metrics.PREFETCH_JOBS.labels("shed").inc()
+        except Exception as e:
+            logger.info(f"Prefetch after {chapter_url} failed: {e}")
+            metrics.PREFETCH_JOBS.labels("error").inc()
+
+    async def stop(self) -> None:
+        tasks = [task for _, task in self._jobs.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+prefetcher = Prefetcher(settings.prefetch_enabled, settings.prefetch_pages, settings.prefetch_concurrency)
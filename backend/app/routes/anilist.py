@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from app.dependencies import get_current_user
-from app.supabase_client import get_supabase
+from app.supabase_client import execute, get_supabase
 from app import anilist
 from app import scraper
 
@@ -39,15 +39,17 @@ async def exchange_code(req: ExchangeCodeRequest, user=Depends(get_current_user)
         viewer = await anilist.get_viewer(access_token)
 
         # Store in Supabase
-        get_supabase().table("anilist_tokens").upsert(
-            {
-                "user_id": str(user.id),
-                "access_token": access_token,
-                "anilist_user_id": viewer["id"],
-                "anilist_username": viewer["name"],
-            },
-            on_conflict="user_id",
-        ).execute()
+        await execute(
+            get_supabase().table("anilist_tokens").upsert(
+                {
+                    "user_id": str(user.id),
+                    "access_token": access_token,
+                    "anilist_user_id": viewer["id"],
+                    "anilist_username": viewer["name"],
+                },
+                on_conflict="user_id",
+            )
+        )
 
         return {
             "anilist_user": {
@@ -63,12 +65,11 @@ async def exchange_code(req: ExchangeCodeRequest, user=Depends(get_current_user)
 @router.get("/status")
 async def anilist_status(user=Depends(get_current_user)):
     """Check if the user has linked their Anilist account."""
-    result = (
+    result = await execute(
         get_supabase()
         .table("anilist_tokens")
         .select("anilist_user_id, anilist_username")
         .eq("user_id", str(user.id))
-        .execute()
     )
     if result.data:
         return {"linked": True, **result.data[0]}
@@ -78,7 +79,7 @@ async def anilist_status(user=Depends(get_current_user)):
 @router.delete("/unlink")
 async def unlink_anilist(user=Depends(get_current_user)):
     """Remove the Anilist connection."""
-    get_supabase().table("anilist_tokens").delete().eq("user_id", str(user.id)).execute()
+    await execute(get_supabase().table("anilist_tokens").delete().eq("user_id", str(user.id)))
     return {"unlinked": True}
 
 
@@ -87,7 +88,7 @@ async def search_anilist(
     title: str = Query(...), user=Depends(get_current_user)
 ):
     """Search Anilist for a manga to link."""
-    token_row = _get_token(user)
+    token_row = await _get_token(user)
     results = await anilist.search_manga(title, token_row["access_token"])
     return {"results": results}
 
@@ -101,7 +102,7 @@ class SyncProgressRequest(BaseModel):
 @router.post("/sync")
 async def sync_progress(req: SyncProgressRequest, user=Depends(get_current_user)):
     """Push reading progress to Anilist."""
-    token_row = _get_token(user)
+    token_row = await _get_token(user)
     result = await anilist.update_progress(
         req.anilist_media_id, req.chapter, req.status, token_row["access_token"]
     )
@@ -111,7 +112,7 @@ async def sync_progress(req: SyncProgressRequest, user=Depends(get_current_user)
 @router.get("/manga-list")
 async def get_anilist_manga_list(user=Depends(get_current_user)):
     """Fetch the user's full Anilist manga list."""
-    token_row = _get_token(user)
+    token_row = await _get_token(user)
     entries = await anilist.get_user_manga_list(token_row["access_token"])
     return {"entries": entries}
 
@@ -119,7 +120,7 @@ async def get_anilist_manga_list(user=Depends(get_current_user)):
 @router.post("/import")
 async def import_from_anilist(user=Depends(get_current_user)):
     """Import Anilist manga list into the user's library by searching leercapitulo."""
-    token_row = _get_token(user)
+    token_row = await _get_token(user)
     entries = await anilist.get_user_manga_list(token_row["access_token"])
 
     status_map = {
@@ -159,18 +160,20 @@ async def import_from_anilist(user=Depends(get_current_user)):
         lib_status = status_map.get(al_status, "reading")
         cover = match.get("thumbnail") or (media.get("coverImage") or {}).get("large", "")
 
-        get_supabase().table("library").upsert(
-            {
-                "user_id": str(user.id),
-                "manga_url": match["url"],
-                "manga_title": match["title"],
-                "cover_url": cover,
-                "status": lib_status,
-                "current_chapter": entry.get("progress", 0),
-                "anilist_media_id": media.get("id"),
-            },
-            on_conflict="user_id,manga_url",
-        ).execute()
+        await execute(
+            get_supabase().table("library").upsert(
+                {
+                    "user_id": str(user.id),
+                    "manga_url": match["url"],
+                    "manga_title": match["title"],
+                    "cover_url": cover,
+                    "status": lib_status,
+                    "current_chapter": entry.get("progress", 0),
+                    "anilist_media_id": media.get("id"),
+                },
+                on_conflict="user_id,manga_url",
+            )
+        )
 
         imported.append(match["title"])
 
@@ -182,13 +185,12 @@ async def import_from_anilist(user=Depends(get_current_user)):
     }
 
 
-def _get_token(user) -> dict:
-    result = (
+async def _get_token(user) -> dict:
+    result = await execute(
         get_supabase()
         .table("anilist_tokens")
         .select("access_token")
         .eq("user_id", str(user.id))
-        .execute()
     )
     if not result.data:
         raise HTTPException(status_code=400, detail="Anilist account not linked")
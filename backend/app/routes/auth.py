@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from app.supabase_client import get_supabase
@@ -18,7 +20,9 @@ class LoginRequest(BaseModel):
 @router.post("/signup")
 async def signup(req: SignupRequest):
     try:
-        result = get_supabase().auth.sign_up({"email": req.email, "password": req.password})
+        result = await asyncio.to_thread(
+            get_supabase().auth.sign_up, {"email": req.email, "password": req.password}
+        )
         if result.user:
             return {"user": {"id": str(result.user.id), "email": result.user.email}}
         raise HTTPException(status_code=400, detail="Signup failed")
@@ -31,8 +35,9 @@ async def signup(req: SignupRequest):
 @router.post("/login")
 async def login(req: LoginRequest):
     try:
-        result = get_supabase().auth.sign_in_with_password(
-            {"email": req.email, "password": req.password}
+        result = await asyncio.to_thread(
+            get_supabase().auth.sign_in_with_password,
+            {"email": req.email, "password": req.password},
         )
         if result.session:
             return {
@@ -50,7 +55,7 @@ async def login(req: LoginRequest):
 @router.post("/refresh")
 async def refresh(refresh_token: str):
     try:
-        result = get_supabase().auth.refresh_session(refresh_token)
+        result = await asyncio.to_thread(get_supabase().auth.refresh_session, refresh_token)
         if result.session:
             return {
                 "access_token": result.session.access_token,
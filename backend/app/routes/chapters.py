@@ -1,33 +1,59 @@
+import hashlib
 import logging
 import re
+from datetime import datetime, timedelta
+from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
+from app.config import settings
+from app.debounce import KeyedDebouncer
 from app.dependencies import get_current_user
-from app.supabase_client import get_supabase
-from app import anilist, scraper
+from app.prefetch import prefetcher, reader_key
+from app.supabase_client import execute, fetch_all_rows, get_supabase, iter_pages, upsert_chunked
+from app import anilist, chapter_catalog, scraper
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/chapters", tags=["chapters"])
 
+# updated_at is the writing transaction's start time, so a row can commit
+# with a timestamp older than a cursor handed out meanwhile.  Delta syncs
+# look back this far before the cursor; clients merge by chapter_url, so the
+# repeats are harmless.
+CURSOR_OVERLAP = timedelta(seconds=10)
+
 CHAPTER_NUM_RE = re.compile(
     r"(?:Cap[ií]tulo|Cap\.?|Chapter|Ch\.?)\s*(\d+(?:\.\d+)?)", re.IGNORECASE
 )
 
 
-async def _recalc_progress(user_id: str, manga_url: str):
-    """Recalculate the highest read chapter from the DB, update library + Anilist."""
-    sb = get_supabase()
+async def _max_read_chapter(user_id: str, manga_url: str) -> float:
+    """Highest read chapter number for one manga.
 
-    # Get all read chapter URLs for this manga (paginated)
-    read_rows = _fetch_all_rows(
-        lambda: sb.table("chapter_status")
-        .select("chapter_url")
-        .eq("user_id", user_id)
-        .eq("manga_url", manga_url)
-        .eq("is_read", True)
-    )
+    Read from the trigger-maintained ``chapter_progress`` summary (a single
+    primary-key lookup).  Falls back to fetching every read row and mapping
+    URLs to numbers through the scraper when the summary can't be read, or
+    when any read row's chapter number was never recorded (its
+    ``max_read_chapter`` only covers the numbered ones).
+    """
+    sb = get_supabase()
+    max_chapter = 0
+    try:
+        result = await execute(
+            sb.table("chapter_progress")
+            .select("max_read_chapter, unnumbered_count")
+            .eq("user_id", user_id)
+            .eq("manga_url", manga_url)
+        )
+        if not result.data:
+            return 0  # the triggers keep a row for every manga with read rows
+        progress = result.data[0]
+        if not progress["unnumbered_count"]:
+            return progress["max_read_chapter"]
+        max_chapter = progress["max_read_chapter"]
+    except Exception as e:
+        logger.warning(f"chapter_progress lookup failed: {e}")
 
     # To get accurate chapter numbers, fetch the chapter list from the scraper
     # and build a URL -> chapter_number map
@@ -35,23 +61,44 @@ async def _recalc_progress(user_id: str, manga_url: str):
         chapters = await scraper.get_chapters(manga_url)
         url_to_num = {ch["url"]: ch["chapter_number"] for ch in chapters}
     except Exception:
-        url_to_num = {}
+        chapters, url_to_num = [], {}
+    if chapters:
+        # Storing the catalog numbers the unnumbered rows in the database
+        # (chapter_status_number_from_catalog), so next time the summary holds
+        try:
+            await chapter_catalog.ensure(manga_url, chapters)
+        except Exception as e:
+            logger.warning(f"Failed to store chapter catalog for {manga_url}: {e}")
 
-    # Find the highest read chapter number
-    max_chapter = 0
-    read_urls = {row["chapter_url"] for row in read_rows}
-    for url in read_urls:
-        num = url_to_num.get(url, -1)
-        if num > max_chapter:
-            max_chapter = num
+    # Stream the read rows and keep the highest number seen, preferring the
+    # recorded one
+    async for page in iter_pages(
+        lambda: sb.table("chapter_status")
+        .select("chapter_url, chapter_number")
+        .eq("user_id", user_id)
+        .eq("manga_url", manga_url)
+        .eq("is_read", True),
+        key="chapter_url",
+    ):
+        for row in page:
+            number = row.get("chapter_number", -1)
+            if number < 0:
+                number = url_to_num.get(row["chapter_url"], -1)
+            max_chapter = max(max_chapter, number)
+    return max_chapter
+
+
+async def _recalc_progress(user_id: str, manga_url: str):
+    """Recalculate the highest read chapter from the DB, update library + Anilist."""
+    sb = get_supabase()
+    max_chapter = await _max_read_chapter(user_id, manga_url)
 
     # Check if library entry exists
-    lib_result = (
+    lib_result = await execute(
         sb.table("library")
         .select("id, anilist_media_id, current_chapter, status")
         .eq("user_id", user_id)
         .eq("manga_url", manga_url)
-        .execute()
     )
 
     if lib_result.data:
@@ -64,7 +111,7 @@ async def _recalc_progress(user_id: str, manga_url: str):
         if old_status == "completed" and max_chapter < old_chapter:
             updates["status"] = "reading"
 
-        sb.table("library").update(updates).eq("id", entry["id"]).execute()
+        await execute(sb.table("library").update(updates).eq("id", entry["id"]))
 
         # Sync to Anilist if linked
         if entry.get("anilist_media_id") and max_chapter > 0:
@@ -85,27 +132,28 @@ async def _recalc_progress(user_id: str, manga_url: str):
             title = manga_url
             cover = ""
 
-        sb.table("library").upsert(
-            {
-                "user_id": user_id,
-                "manga_url": manga_url,
-                "manga_title": title,
-                "cover_url": cover,
-                "status": "reading",
-                "current_chapter": max_chapter,
-            },
-            on_conflict="user_id,manga_url",
-        ).execute()
+        await execute(
+            sb.table("library").upsert(
+                {
+                    "user_id": user_id,
+                    "manga_url": manga_url,
+                    "manga_title": title,
+                    "cover_url": cover,
+                    "status": "reading",
+                    "current_chapter": max_chapter,
+                },
+                on_conflict="user_id,manga_url",
+            )
+        )
 
 
 async def _sync_anilist(sb, user_id: str, media_id: int, progress: int, status: str = "reading"):
     """Push progress and status to Anilist."""
     try:
-        token_result = (
+        token_result = await execute(
             sb.table("anilist_tokens")
             .select("access_token")
             .eq("user_id", user_id)
-            .execute()
         )
         if token_result.data:
             await anilist.update_progress(
@@ -116,6 +164,12 @@ async def _sync_anilist(sb, user_id: str, media_id: int, progress: int, status:
         logger.warning(f"Anilist sync failed: {e}")
 
 
+# Clicks within the quiet window collapse into one recalculation per manga
+progress_updates = KeyedDebouncer(
+    "progress_recalc", _recalc_progress, settings.progress_debounce_seconds
+)
+
+
 class MarkReadRequest(BaseModel):
     manga_url: str
     chapter_url: str
@@ -131,70 +185,139 @@ class BookmarkRequest(BaseModel):
 
 class MarkPreviousReadRequest(BaseModel):
     manga_url: str
-    chapter_urls: list[str]
+    chapter_urls: list[str] = []
     max_chapter_number: float = -1
     is_read: bool = True
 
 
-def _fetch_all_rows(query_fn, page_size=1000):
-    """Fetch all rows from a Supabase query, paginating past the default limit."""
-    all_data = []
-    offset = 0
-    while True:
-        result = query_fn().range(offset, offset + page_size - 1).execute()
-        all_data.extend(result.data)
-        if len(result.data) < page_size:
-            break
-        offset += page_size
-    return all_data
+def _ranges(flags: list[bool]) -> list[list[int]]:
+    """Run-length encode the set positions of ``flags`` as inclusive [start, end] pairs."""
+    ranges = []
+    start = None
+    for i, flag in enumerate(flags):
+        if flag and start is None:
+            start = i
+        elif not flag and start is not None:
+            ranges.append([start, i - 1])
+            start = None
+    if start is not None:
+        ranges.append([start, len(flags) - 1])
+    return ranges
+
+
+async def _compact_statuses(manga_url: str, rows: list[dict]) -> dict:
+    """Encode statuses as index ranges over the chapter order of /api/manga/chapters."""
+    chapters = await scraper.get_chapters(manga_url)
+    urls = [ch["url"] for ch in chapters]
+    by_url = {row["chapter_url"]: row for row in rows}
+    known = set(urls)
+    return {
+        "chapters": len(urls),
+        "order_hash": hashlib.sha1("\n".join(urls).encode()).hexdigest()[:12],
+        "read": _ranges([by_url.get(u, {}).get("is_read", False) for u in urls]),
+        "bookmarked": _ranges([by_url.get(u, {}).get("is_bookmarked", False) for u in urls]),
+        # Rows for chapters the site no longer lists (renamed or removed)
+        "extra": {url: row for url, row in by_url.items() if url not in known},
+    }
 
 
 @router.get("/status")
 async def get_chapter_statuses(
-    manga_url: str = Query(...), user=Depends(get_current_user)
+    manga_url: str = Query(...),
+    format: Literal["full", "compact"] = Query("full"),
+    since: datetime | None = Query(None, description="Only rows changed after this cursor"),
+    user=Depends(get_current_user),
 ):
-    """Get read/bookmark status for all chapters of a manga."""
+    """Get read/bookmark status for all chapters of a manga.
+
+    ``format=compact`` returns read/bookmarked chapters as run-length index
+    ranges over the chapter list order instead of one object per URL.
+    ``since=<cursor>`` returns rows changed after a previous response's
+    ``cursor`` (and, see ``CURSOR_OVERLAP``, some shortly before it) so
+    clients can keep a cached copy up to date by merging on chapter URL.
+    """
     user_id = str(user.id)
-    rows = _fetch_all_rows(
-        lambda: get_supabase()
-        .table("chapter_status")
-        .select("chapter_url, is_read, is_bookmarked")
-        .eq("user_id", user_id)
-        .eq("manga_url", manga_url)
-    )
-    return {"statuses": {row["chapter_url"]: row for row in rows}}
+
+    def query():
+        q = (
+            get_supabase()
+            .table("chapter_status")
+            .select("chapter_url, is_read, is_bookmarked, updated_at")
+            .eq("user_id", user_id)
+            .eq("manga_url", manga_url)
+        )
+        return q.gt("updated_at", (since - CURSOR_OVERLAP).isoformat()) if since else q
+
+    rows = await fetch_all_rows(query, key="chapter_url")
+    cursor = max((row["updated_at"] for row in rows), default=since.isoformat() if since else None)
+
+    if since:
+        return {"since": since.isoformat(), "cursor": cursor, "statuses": {row["chapter_url"]: row for row in rows}}
+    if format == "compact":
+        return {"cursor": cursor, **await _compact_statuses(manga_url, rows)}
+    return {"cursor": cursor, "statuses": {row["chapter_url"]: row for row in rows}}
+
+
+@router.get("/progress")
+async def get_progress_state(
+    manga_url: str = Query(...),
+    wait: float = Query(0, ge=0, le=30, description="Seconds to wait for pending updates"),
+    user=Depends(get_current_user),
+):
+    """State of the background progress update for a manga.
+
+    Mark-read returns before library progress and AniList are updated;
+    ``wait=<seconds>`` blocks until that update has finished (or the
+    timeout expires) so clients that need fresh progress can wait for it.
+    """
+    user_id = str(user.id)
+    if wait:
+        await progress_updates.wait(user_id, manga_url, timeout=wait)
+    return {"state": progress_updates.status(user_id, manga_url)}
 
 
 @router.post("/mark-read")
-async def mark_read(req: MarkReadRequest, user=Depends(get_current_user)):
-    """Mark a single chapter as read or unread."""
+async def mark_read(req: MarkReadRequest, request: Request, user=Depends(get_current_user)):
+    """Mark a single chapter as read or unread.
+
+    Library progress and AniList are updated in the background; see
+    ``GET /progress``.
+    """
     user_id = str(user.id)
     logger.info(f"mark-read: user={user_id}, manga={req.manga_url}, chapter={req.chapter_url}, is_read={req.is_read}")
-    get_supabase().table("chapter_status").upsert(
-        {
-            "user_id": user_id,
-            "manga_url": req.manga_url,
-            "chapter_url": req.chapter_url,
-            "is_read": req.is_read,
-        },
-        on_conflict="user_id,chapter_url",
-    ).execute()
-    await _recalc_progress(user_id, req.manga_url)
-    return {"ok": True}
+    await execute(
+        get_supabase().table("chapter_status").upsert(
+            {
+                "user_id": user_id,
+                "manga_url": req.manga_url,
+                "chapter_url": req.chapter_url,
+                "is_read": req.is_read,
+                # Unknown numbers are filled in from the chapter catalog
+                **({"chapter_number": req.chapter_number} if req.chapter_number >= 0 else {}),
+            },
+            on_conflict="user_id,chapter_url",
+        )
+    )
+    progress_updates.schedule(user_id, req.manga_url)
+    if req.is_read:
+        prefetcher.trigger(reader_key(request), req.manga_url, req.chapter_url)
+    return {"ok": True, "progress": progress_updates.status(user_id, req.manga_url)}
 
 
 @router.post("/bookmark")
 async def bookmark(req: BookmarkRequest, user=Depends(get_current_user)):
     """Bookmark or unbookmark a chapter."""
-    get_supabase().table("chapter_status").upsert(
-        {
-            "user_id": str(user.id),
-            "manga_url": req.manga_url,
-            "chapter_url": req.chapter_url,
-            "is_bookmarked": req.is_bookmarked,
-        },
-        on_conflict="user_id,chapter_url",
-    ).execute()
+    await execute(
+        get_supabase().table("chapter_status").upsert(
+            {
+                "user_id": str(user.id),
+                "manga_url": req.manga_url,
+                "chapter_url": req.chapter_url,
+                "is_bookmarked": req.is_bookmarked,
+            },
+            on_conflict="user_id,chapter_url",
+        )
+    )
     return {"ok": True}
 
 
@@ -202,19 +325,36 @@ async def bookmark(req: BookmarkRequest, user=Depends(get_current_user)):
 async def mark_previous_read(
     req: MarkPreviousReadRequest, user=Depends(get_current_user)
 ):
-    """Mark or unmark multiple chapters as read (all previous chapters)."""
-    rows = [
-        {
-            "user_id": str(user.id),
-            "manga_url": req.manga_url,
-            "chapter_url": url,
-            "is_read": req.is_read,
-        }
-        for url in req.chapter_urls
-    ]
-    if rows:
-        get_supabase().table("chapter_status").upsert(
-            rows, on_conflict="user_id,chapter_url"
-        ).execute()
-    await _recalc_progress(str(user.id), req.manga_url)
-    return {"ok": True, "count": len(rows)}
+    """Mark or unmark all chapters up to ``max_chapter_number`` as read.
+
+    The range is marked in the database from the stored chapter catalog, so
+    clients only need to send the chapter number.  Without a number (or if
+    the catalog can't be used) ``chapter_urls``, or the scraped chapters in
+    range, are upserted in chunks.
+    """
+    user_id = str(user.id)
+    count = None
+    if req.max_chapter_number >= 0 and await chapter_catalog.ensure(req.manga_url):
+        try:
+            count = await chapter_catalog.mark_read_up_to(
+                user_id, req.manga_url, req.max_chapter_number, req.is_read
+            )
+        except Exception as e:
+            logger.warning(f"mark_chapters_read failed, falling back to upserts: {e}")
+
+    if count is None:
+        row = {"user_id": user_id, "manga_url": req.manga_url, "is_read": req.is_read}
+        rows = [{**row, "chapter_url": url} for url in req.chapter_urls]
+        if not rows and req.max_chapter_number >= 0:
+            # Same range as mark_chapters_read: unnumbered chapters are never in it
+            chapters = await scraper.get_chapters(req.manga_url)
+            rows = [
+                {**row, "chapter_url": ch["url"], "chapter_number": ch["chapter_number"]}
+                for ch in chapters
+                if 0 <= ch["chapter_number"] <= req.max_chapter_number
+            ]
+        await upsert_chunked("chapter_status", rows, on_conflict="user_id,chapter_url")
+        count = len(rows)
+
+    progress_updates.schedule(user_id, req.manga_url)
+    return {"ok": True, "count": count, "progress": progress_updates.status(user_id, req.manga_url)}
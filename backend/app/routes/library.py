@@ -1,10 +1,17 @@
+import asyncio
+import base64
+import binascii
+import hashlib
 import logging
+import uuid
+from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from app.dependencies import get_current_user
-from app.supabase_client import get_supabase
-from app import scraper, anilist
+from app.supabase_client import execute, get_supabase, upsert_chunked
+from app import chapter_catalog, scraper, anilist
 
 logger = logging.getLogger(__name__)
 
@@ -24,23 +31,141 @@ class UpdateLibraryRequest(BaseModel):
     anilist_media_id: int | None = None
 
 
+PAGE_SIZE = 500  # default and maximum; below PostgREST's max-rows, so pages are never cut short
+PROGRESS_BATCH = 100  # manga URLs per chapter_progress lookup
+
+LIBRARY_FIELDS = {
+    "id", "manga_url", "manga_title", "cover_url", "status",
+    "current_chapter", "anilist_media_id", "created_at", "updated_at",
+}
+
+
+def _encode_cursor(entry: dict) -> str:
+    return base64.urlsafe_b64encode(f"{entry['updated_at']}|{entry['id']}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    """The ``(updated_at, id)`` of a cursor, re-serialized so only a valid
+    timestamp and UUID ever reach the PostgREST filter."""
+    try:
+        updated_at, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(updated_at).isoformat(), str(uuid.UUID(entry_id))
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def _library_etag(user_id: str, request: Request) -> str:
+    """Weak ETag from the newest library/progress change and the entry count.
+
+    Two indexed single-row lookups; the count catches deletions, which
+    don't move max(updated_at).
+    """
+    sb = get_supabase()
+    library, progress = await asyncio.gather(
+        execute(
+            sb.table("library")
+            .select("updated_at", count="exact")
+            .eq("user_id", user_id)
+            .order("updated_at", desc=True)
+            .limit(1)
+        ),
+        execute(
+            sb.table("chapter_progress")
+            .select("updated_at")
+            .eq("user_id", user_id)
+            .order("updated_at", desc=True)
+            .limit(1)
+        ),
+        return_exceptions=True,
+    )
+    if isinstance(library, BaseException):
+        raise library
+    parts = [
+        library.data[0]["updated_at"] if library.data else "",
+        str(library.count or 0),
+        progress.data[0]["updated_at"] if not isinstance(progress, BaseException) and progress.data else "",
+        str(request.query_params),
+    ]
+    return 'W/"' + hashlib.sha1("|".join(parts).encode()).hexdigest()[:20] + '"'
+
+
 @router.get("")
-async def get_library(user=Depends(get_current_user)):
-    result = (
-        get_supabase()
-        .table("library")
-        .select("*")
-        .eq("user_id", str(user.id))
+async def get_library(
+    request: Request,
+    limit: int = Query(PAGE_SIZE, ge=1, le=PAGE_SIZE, description="Page size"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    status: list[str] | None = Query(None, description="Only entries with these statuses"),
+    fields: str | None = Query(None, description="Comma-separated columns, plus 'progress'"),
+    user=Depends(get_current_user),
+):
+    """List the user's library, newest first, with reading progress per entry.
+
+    Pages are keyed on ``(updated_at, id)``: pass ``next_cursor`` back as
+    ``cursor`` for the next page.  Responses carry a weak ETag, so an
+    unchanged library revalidates with ``If-None-Match`` and gets a 304
+    without any rows being read.
+    """
+    sb = get_supabase()
+    user_id = str(user.id)
+
+    etag = await _library_etag(user_id, request)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    wanted = {f.strip() for f in fields.split(",") if f.strip()} if fields else LIBRARY_FIELDS | {"progress"}
+    unknown = wanted - LIBRARY_FIELDS - {"progress"}
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    columns = (wanted & LIBRARY_FIELDS) | {"id", "updated_at"}
+    if "progress" in wanted:
+        columns.add("manga_url")
+
+    query = (
+        sb.table("library")
+        .select(",".join(sorted(columns)))
+        .eq("user_id", user_id)
         .order("updated_at", desc=True)
-        .execute()
+        .order("id", desc=True)
     )
-    return {"entries": result.data}
+    if status:
+        query = query.in_("status", status)
+    if cursor:
+        updated_at, entry_id = _decode_cursor(cursor)
+        query = query.or_(f'updated_at.lt."{updated_at}",and(updated_at.eq."{updated_at}",id.lt.{entry_id})')
+    query = query.limit(limit)
+    entries = await execute(query)
+
+    if "progress" in wanted:
+        # Only this page's manga, in URL-length-friendly batches
+        urls = list({entry["manga_url"] for entry in entries.data})
+        by_manga = {}
+        try:
+            batches = await asyncio.gather(*(
+                execute(
+                    sb.table("chapter_progress")
+                    .select("manga_url, max_read_chapter, read_count, last_read_at")
+                    .eq("user_id", user_id)
+                    .in_("manga_url", urls[i:i + PROGRESS_BATCH])
+                )
+                for i in range(0, len(urls), PROGRESS_BATCH)
+            ))
+            by_manga = {row.pop("manga_url"): row for batch in batches for row in batch.data}
+        except Exception as e:
+            logger.warning(f"chapter_progress lookup failed: {e}")
+        for entry in entries.data:
+            entry["progress"] = by_manga.get(entry["manga_url"])
+
+    next_cursor = None
+    if len(entries.data) == limit:
+        next_cursor = _encode_cursor(entries.data[-1])
+    return JSONResponse({"entries": entries.data, "next_cursor": next_cursor}, headers=headers)
 
 
 @router.post("")
 async def add_to_library(req: AddToLibraryRequest, user=Depends(get_current_user)):
     try:
-        result = (
+        result = await execute(
             get_supabase()
             .table("library")
             .upsert(
@@ -53,7 +178,6 @@ async def add_to_library(req: AddToLibraryRequest, user=Depends(get_current_user
                 },
                 on_conflict="user_id,manga_url",
             )
-            .execute()
         )
         return {"entry": result.data[0] if result.data else None}
     except Exception as e:
@@ -70,13 +194,12 @@ async def update_library_entry(
 
     updates["updated_at"] = "now()"
 
-    result = (
+    result = await execute(
         get_supabase()
         .table("library")
         .update(updates)
         .eq("id", entry_id)
         .eq("user_id", str(user.id))
-        .execute()
     )
     if not result.data:
         raise HTTPException(status_code=404, detail="Entry not found")
@@ -96,12 +219,11 @@ async def change_status(
     user_id = str(user.id)
 
     # Get the library entry
-    lib_result = (
+    lib_result = await execute(
         sb.table("library")
         .select("*")
         .eq("id", entry_id)
         .eq("user_id", user_id)
-        .execute()
     )
     if not lib_result.data:
         raise HTTPException(status_code=404, detail="Entry not found")
@@ -110,33 +232,40 @@ async def change_status(
     manga_url = entry["manga_url"]
 
     # Update status
-    sb.table("library").update(
-        {"status": req.status, "updated_at": "now()"}
-    ).eq("id", entry_id).execute()
+    await execute(
+        sb.table("library").update(
+            {"status": req.status, "updated_at": "now()"}
+        ).eq("id", entry_id)
+    )
 
     if req.status == "completed":
         # Fetch all chapters and mark them all as read
         try:
             chapters = await scraper.get_chapters(manga_url)
             if chapters:
-                rows = [
-                    {
-                        "user_id": user_id,
-                        "manga_url": manga_url,
-                        "chapter_url": ch["url"],
-                        "is_read": True,
-                    }
-                    for ch in chapters
-                ]
-                sb.table("chapter_status").upsert(
-                    rows, on_conflict="user_id,chapter_url"
-                ).execute()
+                try:
+                    await chapter_catalog.ensure(manga_url, chapters)
+                    await chapter_catalog.mark_read_up_to(user_id, manga_url, None)
+                except Exception as e:
+                    logger.warning(f"mark_chapters_read failed, falling back to upserts: {e}")
+                    rows = [
+                        {
+                            "user_id": user_id,
+                            "manga_url": manga_url,
+                            "chapter_url": ch["url"],
+                            "is_read": True,
+                        }
+                        for ch in chapters
+                    ]
+                    await upsert_chunked("chapter_status", rows, on_conflict="user_id,chapter_url")
 
                 # Update current_chapter to the highest
                 max_ch = max(ch["chapter_number"] for ch in chapters)
-                sb.table("library").update(
-                    {"current_chapter": max_ch}
-                ).eq("id", entry_id).execute()
+                await execute(
+                    sb.table("library").update(
+                        {"current_chapter": max_ch, "updated_at": "now()"}
+                    ).eq("id", entry_id)
+                )
 
                 # Sync completed status to Anilist
                 if entry.get("anilist_media_id"):
@@ -168,11 +297,10 @@ async def change_status(
 async def _sync_anilist_status(sb, user_id: str, media_id: int, progress: int, status: str):
     """Push status and progress to Anilist."""
     try:
-        token_result = (
+        token_result = await execute(
             sb.table("anilist_tokens")
             .select("access_token")
             .eq("user_id", user_id)
-            .execute()
         )
         if token_result.data:
             await anilist.update_progress(
@@ -185,12 +313,11 @@ async def _sync_anilist_status(sb, user_id: str, media_id: int, progress: int, s
 
 @router.delete("/{entry_id}")
 async def remove_from_library(entry_id: str, user=Depends(get_current_user)):
-    result = (
+    result = await execute(
         get_supabase()
         .table("library")
         .delete()
         .eq("id", entry_id)
         .eq("user_id", str(user.id))
-        .execute()
     )
     return {"deleted": bool(result.data)}
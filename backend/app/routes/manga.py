@@ -1,17 +1,35 @@
-from fastapi import APIRouter, Query
-from app import scraper
+import asyncio
+import json
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from app import listings, scraper
+from app.config import settings
+from app.prefetch import prefetcher, reader_key
 
 router = APIRouter(prefix="/api/manga", tags=["manga"])
 
 
+def _from_snapshot(listing: listings.Listing, page: int, request: Request) -> Response | None:
+    """Serve ``page`` from the refresh-ahead snapshot, if it has it."""
+    cached = listing.get(page)
+    if cached is None:
+        return None
+    body, etag = cached
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
 @router.get("/popular")
-async def popular(page: int = Query(1, ge=1)):
-    return await scraper.get_popular(page)
+async def popular(request: Request, page: int = Query(1, ge=1)):
+    return _from_snapshot(listings.popular, page, request) or await scraper.get_popular(page)
 
 
 @router.get("/latest")
-async def latest(page: int = Query(1, ge=1)):
-    return await scraper.get_latest(page)
+async def latest(request: Request, page: int = Query(1, ge=1)):
+    return _from_snapshot(listings.latest, page, request) or await scraper.get_latest(page)
 
 
 @router.get("/search")
@@ -24,12 +42,126 @@ async def detail(url: str = Query(...)):
     return await scraper.get_manga_detail(url)
 
 
+class BatchDetailRequest(BaseModel):
+    urls: list[str]
+
+
+async def _batch_details(urls: list[str]):
+    """Yield details for ``urls``: cached ones first, then the rest as each scrape finishes."""
+    pending = []
+    for url in urls:
+        detail = await scraper.cached_manga_detail(url)
+        if detail is not None:
+            yield {"url": url, "detail": detail}
+        else:
+            pending.append(url)
+
+    limit = asyncio.Semaphore(settings.batch_detail_concurrency)
+
+    async def fetch(url: str) -> dict:
+        async with limit:
+            try:
+                return {"url": url, "detail": await scraper.get_manga_detail(url)}
+            except Exception as e:
+                return {"url": url, "error": str(e)}
+
+    tasks = [asyncio.create_task(fetch(url)) for url in pending]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _stream(request: Request, items) -> StreamingResponse:
+    """Send dicts from ``items`` as NDJSON, or as SSE with ``Accept: text/event-stream``."""
+    sse = "text/event-stream" in request.headers.get("accept", "")
+
+    async def body():
+        async for item in items:
+            line = json.dumps(item, ensure_ascii=False)
+            yield f"data: {line}\n\n" if sse else line + "\n"
+        if sse:
+            yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/batch-detail")
+async def batch_detail(req: BatchDetailRequest, request: Request):
+    """Details for many manga at once, streamed as NDJSON (or SSE with ``Accept: text/event-stream``).
+
+    Each item is ``{"url", "detail"}`` or ``{"url", "error"}``, in completion order.
+    """
+    urls = list(dict.fromkeys(req.urls))
+    if not urls or len(urls) > settings.batch_detail_max:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {settings.batch_detail_max} URLs")
+    return _stream(request, _batch_details(urls))
+
+
 @router.get("/chapters")
 async def chapters(url: str = Query(...)):
     return await scraper.get_chapters(url)
 
 
 @router.get("/chapter-images")
-async def chapter_images(url: str = Query(...)):
+async def chapter_images(
+    request: Request,
+    url: str = Query(...),
+    manga_url: str | None = Query(None, description="Enables prefetching the next chapter"),
+):
     images = await scraper.get_chapter_images(url)
+    if manga_url:
+        prefetcher.trigger(reader_key(request), manga_url, url)
     return {"images": images}
+
+
+async def _chapter_image_events(request: Request, url: str, manga_url: str | None, images, first):
+    sent: list[str] = []
+    try:
+        item = first
+        while True:
+            found, complete = item
+            start = len(sent) if found[: len(sent)] == sent else 0
+            if found[start:]:
+                yield {"start": start, "images": found[start:]}
+            sent = found
+            if complete:
+                yield {"done": True, "total": len(found)}
+                break
+            item = await anext(images)
+        if manga_url:
+            # Only now, so the next chapter's render doesn't compete with this one
+            prefetcher.trigger(reader_key(request), manga_url, url)
+    except Exception as e:
+        yield {"error": str(e), "retry_after": getattr(e, "retry_after", None)}
+    finally:
+        await images.aclose()
+
+
+@router.get("/chapter-images/stream")
+async def chapter_images_stream(
+    request: Request,
+    url: str = Query(...),
+    manga_url: str | None = Query(None, description="Enables prefetching the next chapter"),
+):
+    """Chapter image URLs streamed as NDJSON (or SSE) as soon as each is known.
+
+    ``{"start", "images"}`` items set the URLs from position ``start`` on
+    (usually appending); the stream ends with ``{"done", "total"}`` or
+    ``{"error", "retry_after"}``.  Nothing is sent until the first images
+    are known, so a saturated browser pool or an unavailable site is still
+    a plain 503 with ``Retry-After``.
+    """
+    images = scraper.stream_chapter_images(url)
+    try:
+        first = await anext(images)
+    except BaseException:
+        await images.aclose()
+        raise
+    return _stream(request, _chapter_image_events(request, url, manga_url, images, first))
@@ -1,35 +1,73 @@
+import asyncio
 import io
+from typing import Literal
+
 import img2pdf
-from fastapi import APIRouter, Query
-from fastapi.responses import StreamingResponse
-from app import scraper
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from app import admission, image_cache, image_variants, metrics, scraper, tracing
+from app.admission import Priority
+from app.governor import UpstreamUnavailable
+from app.pdf_jobs import MAX_CHAPTERS, JobLimitExceeded, chapter_filename, pdf_jobs
+from app.prefetch import reader_key
 
 router = APIRouter(prefix="/api/reader", tags=["reader"])
 
+FILE_CHUNK_SIZE = 256 * 1024
 
-@router.get("/image-proxy")
-async def image_proxy(url: str = Query(...)):
-    """Proxy a manga image to avoid CORS issues in the frontend."""
-    image_bytes = await scraper.fetch_image_bytes(url)
 
-    # Detect content type from URL
+def _media_type(url: str) -> str:
+    """Detect content type from URL"""
     lower = url.lower()
     if ".png" in lower:
-        media_type = "image/png"
+        return "image/png"
     elif ".webp" in lower:
-        media_type = "image/webp"
+        return "image/webp"
     elif ".gif" in lower:
-        media_type = "image/gif"
-    else:
-        media_type = "image/jpeg"
+        return "image/gif"
+    return "image/jpeg"
+
 
-    return StreamingResponse(io.BytesIO(image_bytes), media_type=media_type)
+@router.get("/image-proxy")
+async def image_proxy(
+    request: Request,
+    url: str = Query(...),
+    w: int | None = Query(None, ge=16, le=4096, description="Scale down to this width"),
+    q: int | None = Query(None, ge=1, le=100, description="Encoder quality"),
+    format: Literal["auto", "webp", "avif", "jpeg", "png"] | None = Query(None),
+):
+    """Proxy a manga image to avoid CORS issues in the frontend.
+
+    With ``w``, ``q`` or ``format`` the image is resized/re-encoded;
+    ``format=auto`` (the default when only ``w``/``q`` are given) picks the
+    best format from the ``Accept`` header.
+    """
+    headers = {}
+    if w or q or format:
+        image_bytes = await image_cache.get_image(url)
+        fmt = format or "auto"
+        if fmt == "auto":
+            fmt = image_variants.negotiate(request.headers.get("accept", ""))
+            headers["Vary"] = "Accept"
+        variant = await image_variants.get_variant(url, image_bytes, w, q, fmt)
+        if variant:
+            data, media_type = variant
+            return Response(data, media_type=media_type, headers=headers)
+        return Response(image_bytes, media_type=_media_type(url), headers=headers)
+
+    return StreamingResponse(await image_cache.open_image(url), media_type=_media_type(url))
 
 
 @router.get("/download-pdf")
 async def download_pdf(url: str = Query(..., description="Chapter URL")):
     """Download a chapter as a PDF file."""
-    image_urls = await scraper.get_chapter_images(url)
+    async with admission.pdf_exports.admit(Priority.EXPORT):
+        return await _build_pdf(url)
+
+
+async def _build_pdf(url: str):
+    image_urls = await scraper.get_chapter_images(url, Priority.EXPORT)
     if not image_urls:
         return {"error": "No images found for this chapter"}
 
@@ -37,9 +75,11 @@ async def download_pdf(url: str = Query(..., description="Chapter URL")):
     image_data = []
     for img_url in image_urls:
         try:
-            data = await scraper.fetch_image_bytes(img_url)
+            data = await image_cache.get_image(img_url)
             if data:
                 image_data.append(data)
+        except UpstreamUnavailable:
+            raise
         except Exception:
             continue
 
@@ -47,14 +87,126 @@ async def download_pdf(url: str = Query(..., description="Chapter URL")):
         return {"error": "Failed to download chapter images"}
 
     # Convert to PDF
-    pdf_bytes = img2pdf.convert(image_data)
-
-    # Extract a filename from the URL
-    parts = url.rstrip("/").split("/")
-    filename = f"chapter-{parts[-1]}.pdf" if parts else "chapter.pdf"
+    with tracing.span("img2pdf", pages=len(image_data)):
+        pdf_bytes = await asyncio.to_thread(img2pdf.convert, image_data)
+    metrics.PDF_BYTES.observe(len(pdf_bytes))
 
     return StreamingResponse(
         io.BytesIO(pdf_bytes),
         media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        headers={"Content-Disposition": f'attachment; filename="{chapter_filename(url)}"'},
+    )
+
+
+class PdfJobRequest(BaseModel):
+    url: str | None = None  # a single chapter...
+    manga_url: str | None = None  # ...or this manga's chapters in [from_chapter, to_chapter]
+    from_chapter: float | None = None
+    to_chapter: float | None = None
+
+
+@router.post("/pdf-jobs", status_code=202)
+async def submit_pdf_job(req: PdfJobRequest, request: Request):
+    """Start building a PDF in the background; poll ``/pdf-jobs/{id}?token=`` for progress.
+
+    The response's ``token`` is this caller's key to the job's status and
+    download (a query parameter, so the download works as a plain link).
+    """
+    if req.url:
+        urls, filename = [req.url], chapter_filename(req.url)
+    elif req.manga_url:
+        low = req.from_chapter if req.from_chapter is not None else float("-inf")
+        high = req.to_chapter if req.to_chapter is not None else float("inf")
+        chapters = await scraper.get_chapters(req.manga_url)
+        urls = [ch["url"] for ch in chapters if low <= ch["chapter_number"] <= high]
+        slug = req.manga_url.rstrip("/").split("/")[-1] or "manga"
+        numbers = [ch["chapter_number"] for ch in chapters if ch["url"] in urls]
+        filename = f"{slug}-{min(numbers, default=0):g}-{max(numbers, default=0):g}.pdf"
+    else:
+        raise HTTPException(status_code=400, detail="Either url or manga_url is required")
+    if not urls:
+        raise HTTPException(status_code=404, detail="No chapters in that range")
+    if len(urls) > MAX_CHAPTERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_CHAPTERS} chapters per PDF")
+    urls = [scraper._abs_url(u) for u in urls]
+
+    try:
+        job, token = await pdf_jobs.submit(reader_key(request), urls, filename)
+    except JobLimitExceeded as e:
+        return JSONResponse({"detail": str(e)}, status_code=429, headers={"Retry-After": "10"})
+    return {**job.public(), "token": token}
+
+
+def _owned_job(job_id: str, token: str):
+    job = pdf_jobs.get(job_id, token)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/pdf-jobs/{job_id}")
+async def pdf_job_status(job_id: str, token: str = Query(..., description="token from the submit response")):
+    return _owned_job(job_id, token).public()
+
+
+def _byte_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Parse a single-range ``Range`` header into inclusive offsets (None = whole file)."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header.removeprefix("bytes=").strip().partition("-")
+    try:
+        if start:
+            first, last = int(start), int(end) if end else size - 1
+        else:
+            first, last = max(0, size - int(end)), size - 1
+    except ValueError:
+        return None
+    if first >= size or first > last:
+        raise HTTPException(
+            status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"}
+        )
+    return first, min(last, size - 1)
+
+
+async def _file_chunks(path, first: int, last: int):
+    with open(path, "rb") as f:
+        await asyncio.to_thread(f.seek, first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(FILE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@router.get("/pdf-jobs/{job_id}/download")
+async def download_pdf_job(
+    job_id: str, request: Request, token: str = Query(..., description="token from the submit response")
+):
+    """Download a finished job's PDF; supports ``Range`` to resume interrupted downloads."""
+    job = _owned_job(job_id, token)
+    path = pdf_jobs.artifact(job)
+    if job.state != "done" or not path.exists():
+        raise HTTPException(status_code=409, detail=f"Job is {job.state}")
+
+    size = job.size
+    etag = f'"{job.id}-{size}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": f'attachment; filename="{job.filename}"',
+    }
+    if_range = request.headers.get("if-range")
+    byte_range = None
+    if if_range is None or if_range == etag:
+        byte_range = _byte_range(request.headers.get("range"), size)
+    if byte_range is None:
+        first, last, status = 0, size - 1, 200
+    else:
+        (first, last), status = byte_range, 206
+        headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    headers["Content-Length"] = str(last - first + 1)
+    return StreamingResponse(
+        _file_chunks(path, first, last), status_code=status, media_type="application/pdf", headers=headers
     )
@@ -3,15 +3,26 @@ LeerCapitulo scraper — ported from the Kotlin/Tachiyomi extension.
 Uses BeautifulSoup + httpx to parse manga, chapters, and images.
 """
 
+import asyncio
 import re
 import json
+import time
+from collections.abc import AsyncIterator
 from datetime import datetime, timedelta
 from urllib.parse import quote, urljoin
 
-import httpx
 from bs4 import BeautifulSoup
 
-BASE_URL = "https://www.leercapitulo.co"
+from app import admission, autocomplete, hedging, metrics, tracing
+from app.admission import Priority
+from app.browser_session import BrowserSession
+from app.cache import Cache
+from app.config import settings
+from app.governor import UpstreamUnavailable, governor
+from app.http_client import get_http_client
+from app.singleflight import SingleFlight
+
+BASE_URL = settings.leercapitulo_url.rstrip("/")
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
@@ -28,6 +39,13 @@ IMAGE_HEADERS = {
     "Accept": "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8",
 }
 
+session = BrowserSession(
+    BASE_URL,
+    HEADERS["User-Agent"],
+    settings.browser_session_ttl,
+    settings.browser_session_refresh_margin,
+)
+
 CHAPTER_NUMBER_RE = re.compile(
     r"(?:Cap[ií]tulo|Cap\.?|Chapter|Ch\.?)\s*(\d+(?:\.\d+)?)", re.IGNORECASE
 )
@@ -102,12 +120,47 @@ def _parse_date(date_str: str) -> str | None:
         return None
 
 
-async def _fetch(url: str) -> BeautifulSoup:
-    """Fetch a URL and return a BeautifulSoup document."""
-    async with httpx.AsyncClient(headers=HEADERS, follow_redirects=True, timeout=30) as client:
-        resp = await client.get(url)
-        resp.raise_for_status()
-        return BeautifulSoup(resp.text, "lxml")
+# Parsed listing/detail pages, shared across workers through app.cache
+_pages = Cache("pages", settings.page_cache_ttl)
+
+
+def _page_key(url: str, parse, *args) -> str:
+    return f"{parse.__name__}:{url}:{json.dumps(args)}"
+
+
+async def _fetch(url: str, parse, *args, cached: bool = True):
+    """Fetch a URL and return ``parse(soup, *args)`` for its HTML.
+
+    Results are cached for ``PAGE_CACHE_TTL`` seconds; ``cached=False``
+    skips the lookup (the fresh result is still stored).
+
+    Building the soup and walking it takes hundreds of milliseconds on long
+    chapter lists, so both happen in a worker thread to keep the event loop
+    free for other requests.
+    """
+    key = _page_key(url, parse, *args)
+    if cached and (result := await _pages.get(key)) is not None:
+        return result
+    resp = await _site_get(url)
+    resp.raise_for_status()
+    with tracing.span("html_parse"):
+        result = await asyncio.to_thread(_parse_html, resp.text, parse, *args)
+    await _pages.set(key, result)
+    return result
+
+
+async def _site_get(url: str, **kwargs):
+    """GET a page of the site, with the browser session's identity if there is one."""
+    try:
+        return await governor.get(url, "leercapitulo", headers=session.headers(HEADERS), **kwargs)
+    except UpstreamUnavailable as e:
+        if e.reason == "forbidden":
+            session.expire()
+        raise
+
+
+def _parse_html(html: str, parse, *args):
+    return parse(BeautifulSoup(html, "lxml"), *args)
 
 
 def _parse_manga_list(soup: BeautifulSoup) -> list[dict]:
@@ -151,9 +204,12 @@ def _parse_manga_list(soup: BeautifulSoup) -> list[dict]:
     return mangas
 
 
-async def get_popular(page: int = 1) -> dict:
+async def get_popular(page: int = 1, cached: bool = True) -> dict:
     """Fetch popular (ongoing) manga."""
-    soup = await _fetch(f"{BASE_URL}/status/ongoing/?page={page}")
+    return await _fetch(f"{BASE_URL}/status/ongoing/?page={page}", _parse_popular, page, cached=cached)
+
+
+def _parse_popular(soup: BeautifulSoup, page: int) -> dict:
     mangas = _parse_manga_list(soup)
 
     current_page = page
@@ -164,10 +220,13 @@ async def get_popular(page: int = 1) -> dict:
     return {"mangas": mangas, "page": current_page, "has_next": has_next}
 
 
-async def get_latest(page: int = 1) -> dict:
+async def get_latest(page: int = 1, cached: bool = True) -> dict:
     """Fetch latest updated manga."""
     url = BASE_URL if page == 1 else f"{BASE_URL}/?page={page}"
-    soup = await _fetch(url)
+    return await _fetch(url, _parse_latest, page, cached=cached)
+
+
+def _parse_latest(soup: BeautifulSoup, page: int) -> dict:
     mangas = _parse_manga_list(soup)
 
     has_next = soup.select_one("a[href*='page=2'], a.next") is not None and page == 1
@@ -176,15 +235,19 @@ async def get_latest(page: int = 1) -> dict:
 
 
 async def search_manga(query: str, page: int = 1) -> dict:
-    """Search for manga using the site's autocomplete JSON endpoint."""
-    async with httpx.AsyncClient(headers=HEADERS, follow_redirects=True, timeout=30) as client:
-        resp = await client.get(
-            f"{BASE_URL}/search-autocomplete",
-            params={"term": query},
-        )
-        resp.raise_for_status()
-        results = resp.json()
+    """Search for manga using the site's autocomplete JSON endpoint (see ``app.autocomplete``)."""
+    mangas = await autocomplete.searches.search(query, _search_upstream)
+    return {"mangas": mangas, "page": page, "has_next": False}
+
+
+async def _search_upstream(term: str) -> list[dict]:
+    resp = await _site_get(f"{BASE_URL}/search-autocomplete", params={"term": term})
+    resp.raise_for_status()
+    return _parse_search_results(resp.json())
 
+
+def _parse_search_results(results: list[dict]) -> list[dict]:
+    """Convert autocomplete JSON items into manga list entries."""
     mangas = []
     for item in results:
         link = item.get("link", "")
@@ -194,8 +257,7 @@ async def search_manga(query: str, page: int = 1) -> dict:
             "title": _clean_title(item.get("label", item.get("value", ""))),
             "thumbnail": _abs_url(thumbnail) if thumbnail else "",
         })
-
-    return {"mangas": mangas, "page": page, "has_next": False}
+    return mangas
 
 
 async def get_manga_detail(manga_url: str) -> dict:
@@ -213,9 +275,16 @@ async def get_manga_detail(manga_url: str) -> dict:
 
     We parse each ``<span>`` label to extract the structured fields.
     """
-    url = _abs_url(manga_url)
-    soup = await _fetch(url)
+    return await _fetch(_abs_url(manga_url), _parse_manga_detail, manga_url)
+
 
+async def cached_manga_detail(manga_url: str) -> dict | None:
+    """Return a manga's details if a recent scrape is cached."""
+    return await _pages.get(_page_key(_abs_url(manga_url), _parse_manga_detail, manga_url))
+
+
+def _parse_manga_detail(soup: BeautifulSoup, manga_url: str) -> dict:
+    """Parse the metadata block of a manga page."""
     # --- Title ---
     title_el = soup.select_one("h1.title-manga, h1, meta[property='og:title']")
     title = ""
@@ -354,9 +423,19 @@ async def get_manga_detail(manga_url: str) -> dict:
 
 async def get_chapters(manga_url: str) -> list[dict]:
     """Fetch the chapter list for a manga."""
+    return await _fetch(_abs_url(manga_url), _parse_chapters)
+
+
+async def invalidate_manga(manga_url: str) -> None:
+    """Drop the cached detail page and chapter list of a manga that changed upstream."""
     url = _abs_url(manga_url)
-    soup = await _fetch(url)
+    await _pages.delete(_page_key(url, _parse_chapters))
+    for arg in {manga_url, url}:
+        await _pages.delete(_page_key(url, _parse_manga_detail, arg))
+
 
+def _parse_chapters(soup: BeautifulSoup) -> list[dict]:
+    """Parse the chapter list of a manga page, oldest chapter first."""
     elements = soup.select('h4 > a[href*="/leer/"]')
     if not elements:
         elements = [
@@ -389,16 +468,123 @@ async def get_chapters(manga_url: str) -> list[dict]:
     return chapters
 
 
-async def get_chapter_images(chapter_url: str) -> list[str]:
+# Rendered image lists by chapter URL
+_image_lists = Cache("chapter_images", settings.chapter_images_ttl)
+_image_list_renders = SingleFlight("chapter_images")
+
+
+async def cached_chapter_images(chapter_url: str) -> list[str] | None:
+    """Return a chapter's image URLs if a recent render is cached."""
+    return await _image_lists.get(_abs_url(chapter_url))
+
+
+async def get_chapter_images(
+    chapter_url: str, priority: Priority = Priority.INTERACTIVE
+) -> list[str]:
     """
     Fetch chapter page images using a headless browser (Playwright).
     The site renders a <select> dropdown where each <option> contains the
     image URL as its value and the page number as text (e.g. "1/15").
     We extract all image URLs from these option values.
-    """
-    from playwright.async_api import async_playwright
 
+    Results are cached for ``CHAPTER_IMAGES_TTL`` seconds, and concurrent
+    calls for the same chapter share one render.  Renders go through
+    admission control at ``priority`` and raise ``Overloaded`` when the
+    browser pool is saturated.
+    """
     url = _abs_url(chapter_url)
+    cached = await cached_chapter_images(url)
+    if cached is not None:
+        return cached
+    return await _image_list_renders.do(url, _render_and_cache, url, priority)
+
+
+class _RenderProgress:
+    """Image URLs an in-flight render has found so far, for streaming readers."""
+
+    def __init__(self):
+        self.urls: list[str] = []
+        self.changed = asyncio.get_running_loop().create_future()
+
+    def publish(self, urls: list[str]) -> None:
+        if len(urls) > len(self.urls):
+            self.urls = urls
+            self.changed.set_result(None)
+            self.changed = asyncio.get_running_loop().create_future()
+
+
+_render_progress: dict[str, _RenderProgress] = {}
+
+
+async def _render_and_cache(url: str, priority: Priority) -> list[str]:
+    progress = _render_progress.setdefault(url, _RenderProgress())
+    try:
+        async with admission.renders.admit(priority):
+            start = time.perf_counter()
+            try:
+                with tracing.span("playwright", url=url):
+                    image_urls = await _render_chapter_images(url, progress.publish)
+            except Exception:
+                metrics.PLAYWRIGHT_FAILURES.inc()
+                raise
+            finally:
+                metrics.PLAYWRIGHT_RENDER.observe(time.perf_counter() - start)
+    finally:
+        if _render_progress.get(url) is progress:
+            del _render_progress[url]
+
+    if image_urls:
+        await _image_lists.set(url, image_urls)
+    return image_urls
+
+
+# Image URLs from the page selector <select> options.
+# The site has select dropdowns where options with image URLs as values
+# contain page numbers like "1/15", "2/15", etc.
+_OPTION_IMAGES_JS = """
+    () => {
+        const urls = [];
+        const selects = document.querySelectorAll('select');
+        for (const sel of selects) {
+            for (const opt of sel.options) {
+                const val = opt.value.trim();
+                if (val.match(/\\.(jpg|jpeg|png|webp|gif)/i) && val.startsWith('http')) {
+                    if (!urls.includes(val)) urls.push(val);
+                }
+            }
+        }
+        return urls;
+    }
+"""
+
+# Fallback: any manga images loaded on the page
+_IMG_IMAGES_JS = """
+    () => {
+        const urls = [];
+        const imgs = document.querySelectorAll('img');
+        for (const img of imgs) {
+            const src = img.dataset.src || img.dataset.original || img.src || '';
+            if (src.match(/\\.(jpg|jpeg|png|webp|gif)/i) && !src.includes('/assets/')) {
+                if (!urls.includes(src)) urls.push(src);
+            }
+        }
+        return urls;
+    }
+"""
+
+
+async def _extract_image_urls(page) -> list[str]:
+    return await page.evaluate(_OPTION_IMAGES_JS) or await page.evaluate(_IMG_IMAGES_JS)
+
+
+async def _render_chapter_images(url: str, on_early=None) -> list[str]:
+    """Render ``url`` in headless Chromium and extract the page image URLs.
+
+    If given, ``on_early(urls)`` is called with whatever images the DOM
+    already shows once it has loaded, before waiting for the network to
+    settle.
+    """
+    from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError, async_playwright
 
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
@@ -406,58 +592,182 @@ async def get_chapter_images(chapter_url: str) -> list[str]:
             user_agent=HEADERS["User-Agent"],
             extra_http_headers={"Referer": BASE_URL},
         )
-
-        await page.goto(url, wait_until="networkidle", timeout=30000)
+        if session.cookies:
+            await page.context.add_cookies(session.cookies)
+        bodies: dict[str, asyncio.Task] = {}
+        if settings.capture_render_images:
+            page.on("response", lambda resp: _capture_response(resp, bodies))
+
+        with tracing.span("playwright_goto"):
+            async with governor.guard(url) as outcome:
+                try:
+                    resp = await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+                    if resp is not None:
+                        outcome.status = resp.status
+                    outcome.raise_if_failed()
+                    if on_early:
+                        try:
+                            on_early(await _extract_image_urls(page))
+                        except PlaywrightError:
+                            pass  # the page navigated away mid-evaluation; the final pass will tell
+                    await page.wait_for_load_state("networkidle", timeout=30000)
+                except PlaywrightTimeoutError:
+                    outcome.status = 504
+                    raise
         await page.wait_for_timeout(3000)
 
-        # Extract image URLs from the page selector <select> options
-        # The site has select dropdowns where options with image URLs as values
-        # contain page numbers like "1/15", "2/15", etc.
-        image_urls = await page.evaluate("""
-            () => {
-                const urls = [];
-                const selects = document.querySelectorAll('select');
-                for (const sel of selects) {
-                    for (const opt of sel.options) {
-                        const val = opt.value.trim();
-                        if (val.match(/\\.(jpg|jpeg|png|webp|gif)/i) && val.startsWith('http')) {
-                            if (!urls.includes(val)) urls.push(val);
-                        }
-                    }
-                }
-                return urls;
-            }
-        """)
-
-        # Fallback: also collect any manga images loaded on the page
-        if not image_urls:
-            image_urls = await page.evaluate("""
-                () => {
-                    const urls = [];
-                    const imgs = document.querySelectorAll('img');
-                    for (const img of imgs) {
-                        const src = img.dataset.src || img.dataset.original || img.src || '';
-                        if (src.match(/\\.(jpg|jpeg|png|webp|gif)/i) && !src.includes('/assets/')) {
-                            if (!urls.includes(src)) urls.push(src);
-                        }
-                    }
-                    return urls;
-                }
-            """)
+        image_urls = await _extract_image_urls(page)
+        if bodies:
+            await _prime_image_cache(image_urls, bodies)
 
         await browser.close()
 
     return image_urls
 
 
+def _capture_response(resp, bodies: dict[str, asyncio.Task]) -> None:
+    """Start reading the body of an image the browser downloaded, in case it's a chapter page."""
+    if resp.request.resource_type == "image" and resp.status == 200 and resp.url not in bodies:
+        task = bodies[resp.url] = asyncio.create_task(resp.body())
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())  # failures are fine
+
+
+async def _prime_image_cache(image_urls: list[str], bodies: dict[str, asyncio.Task]) -> None:
+    """Copy chapter pages the browser already downloaded into the image proxy's cache."""
+    from app import image_cache
+
+    wanted = {url: bodies.pop(url) for url in image_urls if url in bodies}
+    for task in bodies.values():
+        task.cancel()
+    for url, task in wanted.items():
+        try:
+            data = await task
+        except Exception:
+            continue  # the body was no longer available
+        if data and url not in image_cache.cache:
+            await image_cache.cache.put(url, data)
+            metrics.RENDER_IMAGES_CAPTURED.inc()
+
+
+def _parse_chapter_images(soup: BeautifulSoup) -> dict:
+    """Image URLs already present in a chapter page's HTML, before any script runs.
+
+    ``total`` is the page count from the selector's "1/15" labels, or 0 if unknown.
+    """
+    images: list[str] = []
+    total = 0
+    for option in soup.select("select option"):
+        value = (option.get("value") or "").strip()
+        if value.startswith("http") and _is_image_url(value) and value not in images:
+            images.append(value)
+            if match := re.search(r"/\s*(\d+)", option.get_text()):
+                total = max(total, int(match.group(1)))
+    if not images:
+        for img in soup.select("img"):
+            src = _get_img_src(img)
+            if _is_image_url(src) and "/assets/" not in src and src not in images:
+                images.append(src)
+        total = 0
+    return {"images": images, "total": total}
+
+
+async def stream_chapter_images(
+    chapter_url: str, priority: Priority = Priority.INTERACTIVE
+) -> AsyncIterator[tuple[list[str], bool]]:
+    """
+    Yield ``(image_urls, complete)`` as a chapter's images become known, so
+    a reader can start loading the first page before the render finishes.
+
+    A cached list is yielded at once.  Otherwise the chapter page's plain
+    HTML is fetched while the browser render (shared with
+    ``get_chapter_images``) starts: whatever images either finds first are
+    yielded early, and if the HTML already lists every page the render is
+    called off.  Each yield is the whole list known so far; the last one
+    has ``complete=True``.
+    """
+    url = _abs_url(chapter_url)
+    cached = await cached_chapter_images(url)
+    if cached is not None:
+        metrics.CHAPTER_IMAGES_STREAM.labels("cache").inc()
+        yield cached, True
+        return
+
+    progress = _render_progress.setdefault(url, _RenderProgress())
+    render = asyncio.create_task(get_chapter_images(url, priority))
+    static = asyncio.create_task(_fetch(url, _parse_chapter_images))
+    sent: list[str] = []
+    try:
+        while not render.done():
+            waiting = {render, progress.changed}
+            if static:
+                waiting.add(static)
+            await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+            if static and static.done():
+                found = static.result() if static.exception() is None else {"images": [], "total": 0}
+                static = None
+                images = found["images"]
+                if images and found["total"] and len(images) >= found["total"]:
+                    metrics.CHAPTER_IMAGES_STREAM.labels("html").inc()
+                    await _image_lists.set(url, images)
+                    yield images, True
+                    return
+                progress.publish(images)
+
+            if len(progress.urls) > len(sent) and not render.done():
+                sent = progress.urls
+                yield sent, False
+
+        metrics.CHAPTER_IMAGES_STREAM.labels("render").inc()
+        yield render.result(), True
+    finally:
+        render.cancel()
+        if static:
+            static.cancel()
+        if _render_progress.get(url) is progress and url not in _image_list_renders:
+            del _render_progress[url]
+
+
 def _is_image_url(url: str) -> bool:
     lower = url.lower()
     return any(ext in lower for ext in (".jpg", ".jpeg", ".png", ".webp", ".gif"))
 
 
 async def fetch_image_bytes(image_url: str) -> bytes:
-    """Download a single image and return its bytes."""
-    async with httpx.AsyncClient(headers=IMAGE_HEADERS, follow_redirects=True, timeout=30) as client:
-        resp = await client.get(image_url)
-        resp.raise_for_status()
-        return resp.content
+    """Download a single image and return its bytes.
+
+    With ``IMAGE_HEDGING`` on, slow downloads are hedged and failed ones
+    retried on mirror hosts; see ``app.hedging``.
+    """
+    if settings.image_hedging:
+        data = await hedging.fetcher.fetch(image_url, session.headers(IMAGE_HEADERS))
+        metrics.IMAGE_BYTES.observe(len(data))
+        return data
+    resp = await governor.get(image_url, "images", headers=session.headers(IMAGE_HEADERS))
+    resp.raise_for_status()
+    metrics.IMAGE_BYTES.observe(len(resp.content))
+    return resp.content
+
+
+async def stream_image_bytes(image_url: str) -> AsyncIterator[bytes]:
+    """Download a single image, yielding its body in chunks as they arrive.
+
+    HTTP errors are raised before the first chunk.  Not retried: the
+    caller may already have forwarded part of the body.  With
+    ``IMAGE_HEDGING`` on, the image is fetched whole (hedged, see
+    ``fetch_image_bytes``) and yielded as one chunk.
+    """
+    if settings.image_hedging:
+        yield await fetch_image_bytes(image_url)
+        return
+    async with governor.guard(image_url) as outcome:
+        with metrics.upstream_call("images") as call:
+            async with get_http_client().stream("GET", image_url, headers=session.headers(IMAGE_HEADERS)) as resp:
+                call.status = str(resp.status_code)
+                outcome.record(resp)
+                outcome.raise_if_failed()
+                resp.raise_for_status()
+                async for chunk in resp.aiter_bytes():
+                    call.nbytes += len(chunk)
+                    yield chunk
+    metrics.IMAGE_BYTES.observe(call.nbytes)
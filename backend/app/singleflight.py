@@ -0,0 +1,47 @@
+"""
+Single-flight: concurrent callers asking for the same key share one call.
+
+The call runs in its own task, so a caller that disconnects doesn't cancel
+it for the others; it is only cancelled once every caller has given up.
+"""
+
+import asyncio
+from dataclasses import dataclass
+
+from app import metrics
+
+
+@dataclass
+class _Call:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[object, _Call] = {}
+
+    def __contains__(self, key) -> bool:
+        return key in self._calls
+
+    async def do(self, key, fn, *args):
+        """Return ``await fn(*args)``, joining an in-flight call for ``key`` if any."""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.get_running_loop().create_task(fn(*args)))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            metrics.SINGLEFLIGHT_SHARED.labels(self.name).inc()
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.task.done():
+                call.task.cancel()
+
+    def _forget(self, key, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
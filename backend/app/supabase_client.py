@@ -1,4 +1,8 @@
+import asyncio
+from collections.abc import AsyncIterator
+
 from supabase import create_client, Client
+from app import metrics
 from app.config import settings
 
 _client: Client | None = None
@@ -14,3 +18,67 @@ def get_supabase() -> Client:
             )
         _client = create_client(settings.supabase_url, settings.supabase_service_key)
     return _client
+
+
+async def execute(query):
+    """Execute a PostgREST query builder in a worker thread.
+
+    The supabase client is synchronous, so running ``.execute()`` directly
+    in a handler would block the event loop for the whole round-trip.
+    """
+    table = getattr(query, "path", "").lstrip("/")
+    method = getattr(query, "http_method", "")
+    with metrics.upstream_call("supabase", table=table, method=method) as call:
+        result = await asyncio.to_thread(query.execute)
+        call.status = "ok"
+    return result
+
+
+UPSERT_CHUNK_SIZE = 500
+
+
+async def upsert_chunked(table: str, rows: list[dict], on_conflict: str, chunk_size: int = UPSERT_CHUNK_SIZE):
+    """Upsert ``rows`` in batches so no single PostgREST request grows unbounded.
+
+    One request per few hundred rows keeps each statement well under the
+    API's statement timeout even for series with thousands of chapters.
+    """
+    sb = get_supabase()
+    for start in range(0, len(rows), chunk_size):
+        await execute(
+            sb.table(table).upsert(rows[start:start + chunk_size], on_conflict=on_conflict)
+        )
+
+
+async def iter_pages(query_fn, key: str, page_size: int | None = None) -> AsyncIterator[list[dict]]:
+    """Stream the rows of a query page by page using keyset pagination.
+
+    ``query_fn()`` must return a fresh filtered select that includes ``key``,
+    a column that is unique within the result and indexed together with the
+    filters (e.g. ``chapter_url`` under the ``(user_id, chapter_url)``
+    unique index).  Each page continues with ``key > last seen`` instead of
+    an OFFSET, so every page is an index range scan whatever its depth.
+    ``page_size`` is capped at ``SUPABASE_MAX_ROWS``, PostgREST's
+    ``max-rows`` (1000 on Supabase): the server truncates larger pages, and a
+    short page would be taken for the last one.
+    """
+    page_size = min(page_size or settings.supabase_page_size, settings.supabase_max_rows)
+    last = None
+    while True:
+        query = query_fn().order(key)
+        if last is not None:
+            query = query.gt(key, last)
+        result = await execute(query.limit(page_size))
+        if result.data:
+            yield result.data
+        if len(result.data) < page_size:
+            return
+        last = result.data[-1][key]
+
+
+async def fetch_all_rows(query_fn, key: str, page_size: int | None = None) -> list[dict]:
+    """Collect every row of a query; see ``iter_pages``."""
+    rows = []
+    async for page in iter_pages(query_fn, key, page_size):
+        rows.extend(page)
+    return rows
@@ -0,0 +1,204 @@
+"""
+Lightweight per-request tracing.
+
+Code wraps interesting work in ``with tracing.span("name"):``.  Spans are
+collected on the current request's trace (a contextvar, so background tasks
+spawned from a request are attributed to it) and reported three ways:
+
+- a ``Server-Timing`` response header with the total time per span name,
+- a structured JSON log line on the ``app.trace`` logger for sampled requests,
+- optionally, OTLP/HTTP JSON export of sampled traces to a local collector.
+
+Outside a request ``span()`` is a no-op, so it is safe to use anywhere.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+import httpx
+
+from app.config import settings
+from app.http_client import get_http_client
+
+logger = logging.getLogger("app.trace")
+
+
+@dataclass
+class Span:
+    name: str
+    start_ns: int
+    end_ns: int = 0
+    attrs: dict = field(default_factory=dict)
+    span_id: str = field(default_factory=lambda: os.urandom(8).hex())
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+@dataclass
+class Trace:
+    name: str
+    sampled: bool
+    trace_id: str = field(default_factory=lambda: os.urandom(16).hex())
+    span_id: str = field(default_factory=lambda: os.urandom(8).hex())
+    start_ns: int = field(default_factory=time.time_ns)
+    spans: list[Span] = field(default_factory=list)
+
+    def server_timing(self) -> str:
+        """Summarize finished spans as a Server-Timing header value."""
+        totals: dict[str, list[float]] = {}
+        for s in self.spans:
+            if s.end_ns:
+                totals.setdefault(s.name, []).append(s.duration_ms)
+        parts = []
+        for name, durations in totals.items():
+            entry = f"{name};dur={sum(durations):.1f}"
+            if len(durations) > 1:
+                entry += f';desc="{len(durations)} calls"'
+            parts.append(entry)
+        parts.append(f"total;dur={(time.time_ns() - self.start_ns) / 1e6:.1f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Trace | None] = ContextVar("trace", default=None)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Record the enclosed block as a span of the current request's trace."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    s = Span(name, time.time_ns(), attrs=attrs)
+    try:
+        yield s
+    except BaseException as e:
+        s.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        trace.spans.append(s)
+
+
+def _log_trace(trace: Trace, end_ns: int, status: int) -> None:
+    logger.info(json.dumps({
+        "trace_id": trace.trace_id,
+        "name": trace.name,
+        "status": status,
+        "duration_ms": round((end_ns - trace.start_ns) / 1e6, 2),
+        "spans": [
+            {
+                "name": s.name,
+                "offset_ms": round((s.start_ns - trace.start_ns) / 1e6, 2),
+                "duration_ms": round(s.duration_ms, 2),
+                **s.attrs,
+            }
+            for s in trace.spans
+        ],
+    }, default=str))
+
+
+def _otlp_attrs(attrs: dict) -> list[dict]:
+    return [{"key": k, "value": {"stringValue": str(v)}} for k, v in attrs.items()]
+
+
+def _otlp_payload(trace: Trace, end_ns: int, status: int) -> dict:
+    root = {
+        "traceId": trace.trace_id,
+        "spanId": trace.span_id,
+        "name": trace.name,
+        "kind": 2,  # SERVER
+        "startTimeUnixNano": str(trace.start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": _otlp_attrs({"http.status_code": status}),
+    }
+    children = [
+        {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "parentSpanId": trace.span_id,
+            "name": s.name,
+            "kind": 3,  # CLIENT
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": _otlp_attrs(s.attrs),
+        }
+        for s in trace.spans
+    ]
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attrs({"service.name": "fiebrereader-backend"})},
+        "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": [root, *children]}],
+    }]}
+
+
+_export_tasks: set[asyncio.Task] = set()
+
+
+async def _export(payload: dict) -> None:
+    url = settings.trace_otlp_endpoint.rstrip("/") + "/v1/traces"
+    try:
+        await get_http_client().post(url, json=payload, timeout=5)
+    except httpx.HTTPError as e:
+        logger.debug(f"OTLP export failed: {e}")
+
+
+def _finish(trace: Trace, status: int) -> None:
+    end_ns = time.time_ns()
+    _log_trace(trace, end_ns, status)
+    if settings.trace_otlp_endpoint:
+        task = asyncio.get_running_loop().create_task(_export(_otlp_payload(trace, end_ns, status)))
+        _export_tasks.add(task)
+        task.add_done_callback(_export_tasks.discard)
+
+
+class TracingMiddleware:
+    """ASGI middleware that opens a trace per request and adds Server-Timing."""
+
+    def __init__(self, app):
+        self.app = app
+        if settings.trace_sample_rate > 0 and not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sampled = random.random() < settings.trace_sample_rate
+        trace = Trace(f"{scope['method']} {scope['path']}", sampled)
+        token = _current.set(trace)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.server_timing_enabled:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                    headers.append((b"timing-allow-origin", b"*"))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if sampled:
+                route = scope.get("route")
+                if route:
+                    trace.name = f"{scope['method']} {route.path}"
+                _finish(trace, status)
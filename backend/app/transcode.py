@@ -0,0 +1,48 @@
+"""
+Pillow resize/transcode of page images.
+
+Runs in worker processes (see ``image_variants``), so this module only
+imports Pillow.
+"""
+
+import io
+
+from PIL import Image, features
+
+PIL_FORMATS = {"webp": "WEBP", "avif": "AVIF", "jpeg": "JPEG", "png": "PNG"}
+MEDIA_TYPES = {"webp": "image/webp", "avif": "image/avif", "jpeg": "image/jpeg", "png": "image/png"}
+
+
+def avif_supported() -> bool:
+    """AVIF needs Pillow 11.2+ built with libavif."""
+    try:
+        return bool(features.check("avif"))
+    except ValueError:
+        return False
+
+
+def transcode(data: bytes, width: int | None, quality: int, fmt: str) -> bytes:
+    """Scale ``data`` down to ``width`` (never up) and encode it as ``fmt``."""
+    with Image.open(io.BytesIO(data)) as im:
+        if width and im.format == "JPEG":
+            # Let libjpeg decode at a reduced scale when we're shrinking a lot
+            im.draft("RGB", (width, im.height * width // im.width))
+        if width and im.width > width:
+            im = im.resize((width, max(1, round(im.height * width / im.width))), Image.Resampling.LANCZOS)
+
+        has_alpha = im.mode in ("RGBA", "LA", "PA") or "transparency" in im.info
+        if fmt == "jpeg" or not has_alpha:
+            im = im.convert("L" if im.mode in ("L", "1") else "RGB")
+        elif im.mode != "RGBA":
+            im = im.convert("RGBA")
+
+        out = io.BytesIO()
+        options = {"quality": quality}
+        if fmt == "jpeg":
+            options.update(optimize=True, progressive=True)
+        elif fmt == "webp":
+            options["method"] = 4
+        elif fmt == "png":
+            options = {"optimize": True}
+        im.save(out, PIL_FORMATS[fmt], **options)
+        return out.getvalue()
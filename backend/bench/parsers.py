@@ -0,0 +1,185 @@
+"""
+Offline micro-benchmarks for the leercapitulo parsers.
+
+    python -m bench.parsers                  # run and compare to baseline.json
+    python -m bench.parsers --save-baseline  # run and overwrite baseline.json
+    python -m bench.parsers -k chapters      # only cases whose name contains "chapters"
+
+Every case starts from the raw recorded text (HTML or JSON), so the timings
+include the BeautifulSoup/lxml parse that ``_fetch`` pays in production.
+The corpus lives in ``bench/fixtures`` (see ``bench.record``).
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable
+
+from bs4 import BeautifulSoup
+
+from app import scraper
+
+BENCH_DIR = Path(__file__).parent
+FIXTURES_DIR = BENCH_DIR / "fixtures"
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+
+DATE_SAMPLES = [
+    "hace 3 horas", "hace 1 día", "hace 2 semanas", "hace 4 meses",
+    "12/05/2023", "01/01/2019", "31/12/2024", "", "ayer", "2023-05-12",
+]
+
+TITLE_SAMPLES = [
+    "One Piece - Read Manga Online leercapitulo.co",
+    "Solo Leveling - Leer Manga Online leercapitulo.co",
+    "Tower of God - leercapitulo.co",
+    "  Berserk  ",
+    "Vagabond",
+]
+
+
+@dataclass
+class Result:
+    name: str
+    iterations: int
+    ops_per_sec: float
+    p50_us: float
+    p95_us: float
+    p99_us: float
+    alloc_peak_kb: float
+    alloc_blocks: int
+
+
+def _fixture(name: str) -> str:
+    path = FIXTURES_DIR / name
+    if not path.exists():
+        sys.exit(f"missing fixture {path}; run `python -m bench.record --synthetic` first")
+    return path.read_text(encoding="utf-8")
+
+
+def _soup(html: str) -> BeautifulSoup:
+    return BeautifulSoup(html, "lxml")
+
+
+def build_cases() -> dict[str, Callable[[], object]]:
+    """Return the benchmark cases keyed by ``function[fixture]``."""
+    popular = _fixture("popular.html")
+    latest = _fixture("latest.html")
+    autocomplete = _fixture("autocomplete.json")
+    manga = {size: _fixture(f"manga_{size}.html") for size in ("small", "medium", "huge")}
+
+    cases: dict[str, Callable[[], object]] = {
+        "_parse_manga_list[popular]": lambda: scraper._parse_manga_list(_soup(popular)),
+        "_parse_manga_list[latest]": lambda: scraper._parse_manga_list(_soup(latest)),
+        "search_manga[autocomplete]": lambda: scraper._parse_search_results(json.loads(autocomplete)),
+        "get_manga_detail[medium]": lambda: scraper._parse_manga_detail(_soup(manga["medium"]), "/manga/x/"),
+        "_parse_date[mixed]": lambda: [scraper._parse_date(d) for d in DATE_SAMPLES],
+        "_clean_title[mixed]": lambda: [scraper._clean_title(t) for t in TITLE_SAMPLES],
+    }
+    for size, html in manga.items():
+        cases[f"get_chapters[{size}]"] = lambda html=html: scraper._parse_chapters(_soup(html))
+    return cases
+
+
+def run_case(name: str, fn: Callable[[], object], min_time: float, min_iters: int) -> Result:
+    """Time ``fn`` repeatedly, then measure its allocations on one extra call."""
+    for _ in range(3):
+        fn()
+
+    samples: list[int] = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < min_iters or time.perf_counter() < deadline:
+        start = time.perf_counter_ns()
+        fn()
+        samples.append(time.perf_counter_ns() - start)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(max(stat.count_diff, 0) for stat in after.compare_to(before, "filename"))
+
+    samples.sort()
+    quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+    return Result(
+        name=name,
+        iterations=len(samples),
+        ops_per_sec=1e9 / statistics.fmean(samples),
+        p50_us=quantiles[49] / 1000,
+        p95_us=quantiles[94] / 1000,
+        p99_us=quantiles[98] / 1000,
+        alloc_peak_kb=peak / 1024,
+        alloc_blocks=blocks,
+    )
+
+
+def compare(results: list[Result], baseline: dict, tolerance: float) -> list[str]:
+    """Return a message for every case whose p50 regressed beyond ``tolerance``."""
+    regressions = []
+    for r in results:
+        base = baseline.get(r.name)
+        if not base:
+            continue
+        limit = base["p50_us"] * (1 + tolerance)
+        if r.p50_us > limit:
+            regressions.append(
+                f"{r.name}: p50 {r.p50_us:.1f}us > baseline {base['p50_us']:.1f}us (+{tolerance:.0%})"
+            )
+    return regressions
+
+
+def _print_table(results: list[Result], baseline: dict) -> None:
+    header = f"{'case':32} {'ops/s':>10} {'p50 us':>10} {'p95 us':>10} {'p99 us':>10} {'peak KB':>9} {'blocks':>7} {'vs base':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        base = baseline.get(r.name)
+        delta = f"{(r.p50_us / base['p50_us'] - 1):+.0%}" if base else "new"
+        print(
+            f"{r.name:32} {r.ops_per_sec:10.1f} {r.p50_us:10.1f} {r.p95_us:10.1f} "
+            f"{r.p99_us:10.1f} {r.alloc_peak_kb:9.1f} {r.alloc_blocks:7d} {delta:>8}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="pattern", default="", help="only run cases containing this string")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds to spend per case")
+    parser.add_argument("--min-iters", type=int, default=20, help="minimum timed iterations per case")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown vs baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--json", type=Path, help="also write results to this file")
+    args = parser.parse_args()
+
+    cases = {name: fn for name, fn in build_cases().items() if args.pattern in name}
+    results = [run_case(name, fn, args.min_time, args.min_iters) for name, fn in cases.items()]
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    _print_table(results, baseline)
+
+    payload = {r.name: asdict(r) for r in results}
+    if args.json:
+        args.json.write_text(json.dumps(payload, indent=2) + "\n")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({**baseline, **payload}, indent=2) + "\n")
+        print(f"\nbaseline saved to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nregressions:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
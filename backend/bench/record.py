@@ -0,0 +1,180 @@
+"""
+Record the fixture corpus used by the parser benchmarks.
+
+    python -m bench.record --manga-small /manga/... --manga-medium /manga/... --manga-huge /manga/...
+    python -m bench.record --synthetic
+
+Live mode downloads real leercapitulo pages once so the benchmarks can run
+offline afterwards.  Synthetic mode writes a deterministic corpus that mirrors
+the site's markup, for machines that cannot reach the site.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from pathlib import Path
+
+import httpx
+
+from app.scraper import BASE_URL, HEADERS
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+CHAPTER_SIZES = {"small": 25, "medium": 300, "huge": 1500}
+
+GENRES = ["Acción", "Aventura", "Comedia", "Drama", "Fantasía", "Romance", "Shounen"]
+WORDS = [
+    "one", "piece", "tower", "god", "solo", "leveling", "hunter", "blade",
+    "dragon", "academy", "return", "sword", "king", "night", "moon", "shadow",
+]
+
+
+def _title(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(2, 4)))
+
+
+def _slug(title: str) -> str:
+    return title.lower().replace(" ", "-")
+
+
+def _date(rng: random.Random, i: int) -> str:
+    if i < 5:
+        return f"hace {rng.randint(1, 23)} horas"
+    if i < 15:
+        return f"hace {rng.randint(1, 6)} días"
+    return f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2015, 2025)}"
+
+
+def _page(body: str, title: str) -> str:
+    return (
+        "<!DOCTYPE html><html lang=\"es\"><head><meta charset=\"utf-8\">"
+        f"<title>{title} - Leer Manga Online leercapitulo.co</title>"
+        f"<meta property=\"og:title\" content=\"{title}\">"
+        "<link rel=\"stylesheet\" href=\"/assets/css/style.css\"></head><body>"
+        "<nav class=\"navbar\"><a href=\"/\">LeerCapitulo</a>"
+        "<a href=\"/status/ongoing/\">En curso</a><a href=\"/genre/accion/\">Acción</a></nav>"
+        f"<div class=\"container\">{body}</div>"
+        "<footer><p>LeerCapitulo.co &copy;</p></footer></body></html>"
+    )
+
+
+def _manga_page(rng: random.Random, n_chapters: int) -> str:
+    title = _title(rng)
+    slug = _slug(title)
+    genres = ", ".join(
+        f"<a href=\"/genre/{_slug(g)}/\">{g}</a>" for g in rng.sample(GENRES, 3)
+    )
+    chapters = "".join(
+        f"<div class=\"chapter-list\"><h4><a href=\"/leer/{slug}/{n}/\" "
+        f"title=\"{title} Capítulo {n}\">Capítulo {n}</a>"
+        f"<span class=\"time\">{_date(rng, i)}</span></h4></div>"
+        for i, n in enumerate(range(n_chapters, 0, -1))
+    )
+    body = (
+        f"<meta property=\"og:image\" content=\"/uploads/covers/{slug}.jpg\">"
+        "<div class=\"media\"><div class=\"cover\">"
+        f"<img src=\"/uploads/covers/{slug}.jpg\" alt=\"{title}\"></div>"
+        f"<div class=\"media-body\"><h1 class=\"title-manga\">{title}</h1>"
+        "<p class=\"description-update\">"
+        f"<span>Títulos Alternativos: </span>{_title(rng)}, {_title(rng)}<br/>"
+        f"<span>Géneros: </span>{genres}<br/>"
+        "<span>Escribe: Manga</span><br/>"
+        "<span>Estado: </span>Ongoing<br/>"
+        f"<span>Autor: </span>{_title(rng)}<br/>"
+        f"<span>Artista: </span>{_title(rng)}<br/>"
+        "</p></div></div>"
+        "<h3>Sinopsis</h3>"
+        f"<p>{' '.join(rng.choice(WORDS) for _ in range(80))}</p>"
+        f"<div class=\"chapters\">{chapters}</div>"
+    )
+    return _page(body, title)
+
+
+def _listing_page(rng: random.Random, n_items: int, page: int) -> str:
+    items = []
+    for _ in range(n_items):
+        title = _title(rng)
+        slug = _slug(title)
+        items.append(
+            "<div class=\"mainholder\">"
+            f"<a href=\"/manga/{rng.randint(1000, 9999)}/{slug}/\" class=\"thumb\">"
+            f"<img data-src=\"/uploads/covers/{slug}.jpg\" src=\"/assets/img/lazy.gif\"></a>"
+            f"<h3><a href=\"/manga/{rng.randint(1000, 9999)}/{slug}/\">{title}</a></h3>"
+            f"<a href=\"/leer/{slug}/{rng.randint(1, 900)}/\">Capítulo {rng.randint(1, 900)}</a>"
+            "</div>"
+        )
+    pager = f"<ul class=\"pagination\"><li><a href=\"?page={page + 1}\">Siguiente</a></li></ul>"
+    return _page("".join(items) + pager, "Manga en curso")
+
+
+def _autocomplete(rng: random.Random, n_items: int) -> list[dict]:
+    results = []
+    for _ in range(n_items):
+        title = _title(rng)
+        slug = _slug(title)
+        results.append({
+            "label": title,
+            "value": title,
+            "link": f"/manga/{rng.randint(1000, 9999)}/{slug}/",
+            "thumbnail": f"/uploads/covers/{slug}.jpg",
+        })
+    return results
+
+
+def write_synthetic() -> None:
+    """Write the deterministic synthetic corpus."""
+    rng = random.Random(20260210)
+    FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+    for size, n in CHAPTER_SIZES.items():
+        (FIXTURES_DIR / f"manga_{size}.html").write_text(_manga_page(rng, n), encoding="utf-8")
+    (FIXTURES_DIR / "popular.html").write_text(_listing_page(rng, 24, 1), encoding="utf-8")
+    (FIXTURES_DIR / "latest.html").write_text(_listing_page(rng, 40, 1), encoding="utf-8")
+    (FIXTURES_DIR / "autocomplete.json").write_text(
+        json.dumps(_autocomplete(rng, 10), ensure_ascii=False), encoding="utf-8"
+    )
+
+
+async def record_live(args: argparse.Namespace) -> None:
+    """Download real pages from the site into the fixture directory."""
+    targets = {
+        "popular.html": f"{BASE_URL}/status/ongoing/?page=1",
+        "latest.html": BASE_URL,
+    }
+    for size in CHAPTER_SIZES:
+        manga = getattr(args, f"manga_{size}")
+        if manga:
+            targets[f"manga_{size}.html"] = manga if manga.startswith("http") else BASE_URL + manga
+
+    FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+    async with httpx.AsyncClient(headers=HEADERS, follow_redirects=True, timeout=30) as client:
+        for name, url in targets.items():
+            resp = await client.get(url)
+            resp.raise_for_status()
+            (FIXTURES_DIR / name).write_text(resp.text, encoding="utf-8")
+            print(f"recorded {name} <- {url} ({len(resp.content)} bytes)")
+
+        resp = await client.get(f"{BASE_URL}/search-autocomplete", params={"term": args.query})
+        resp.raise_for_status()
+        (FIXTURES_DIR / "autocomplete.json").write_text(resp.text, encoding="utf-8")
+        print(f"recorded autocomplete.json <- term={args.query!r}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", action="store_true", help="write the synthetic corpus instead")
+    parser.add_argument("--manga-small", help="manga URL with a short chapter list")
+    parser.add_argument("--manga-medium", help="manga URL with a few hundred chapters")
+    parser.add_argument("--manga-huge", help="manga URL with 1000+ chapters")
+    parser.add_argument("--query", default="one", help="autocomplete search term")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        write_synthetic()
+        print(f"wrote synthetic corpus to {FIXTURES_DIR}")
+    else:
+        asyncio.run(record_live(args))
+
+
+if __name__ == "__main__":
+    main()
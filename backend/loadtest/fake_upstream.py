@@ -0,0 +1,557 @@
+"""
+Local stand-in for every upstream the backend talks to, for load testing.
+
+    python -m loadtest.fake_upstream --port 9000 \\
+        --latency leercapitulo=80,images=40,anilist=120,supabase=15 \\
+        --error-rate leercapitulo=0.01,supabase=0.005
+
+Then start the backend against it::
+
+    LEERCAPITULO_URL=http://127.0.0.1:9000 \\
+    ANILIST_GRAPHQL_URL=http://127.0.0.1:9000/graphql \\
+    SUPABASE_URL=http://127.0.0.1:9000 SUPABASE_SERVICE_KEY=fake.fake.fake \\
+    uvicorn app.main:app --port 8000
+
+It serves four groups of routes:
+
+- ``leercapitulo``: listing, manga and chapter pages replayed from
+  ``bench/fixtures`` (chapter pages carry the ``<select>`` of image URLs
+  that ``get_chapter_images`` reads) plus ``/search-autocomplete``.
+- ``images``: ``/cdn/...`` pages, replayed from ``loadtest/recordings`` when
+  present, otherwise a generated JPEG.
+- ``anilist``: ``POST /graphql`` answering the queries in ``app/anilist.py``
+  with AniList's rate-limit headers and 429 + ``Retry-After`` when exhausted.
+- ``supabase``: ``/auth/v1/user`` and an in-memory PostgREST (``/rest/v1``)
+  supporting the filters, ordering, ranges, upserts and RPCs the routes use.
+
+Every response is delayed by the group's configured latency (plus
+exponential jitter) and fails with the group's error rate.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import random
+import re
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import HTMLResponse, JSONResponse
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent / "bench" / "fixtures"
+RECORDINGS_DIR = Path(__file__).parent / "recordings"
+
+PAGES_PER_CHAPTER = 18
+ANILIST_RATE_LIMIT = 90
+
+GROUPS = ("leercapitulo", "images", "anilist", "supabase")
+
+
+class Injection:
+    """Per-group latency and error-rate configuration."""
+
+    def __init__(self, latency_ms: dict[str, float], error_rate: dict[str, float], jitter: float):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.jitter = jitter
+
+    async def apply(self, group: str) -> bool:
+        """Sleep for the group's latency; return True if this call should fail."""
+        base = self.latency_ms.get(group, 0) / 1000
+        if base:
+            extra = random.expovariate(1 / (base * self.jitter)) if self.jitter else 0
+            await asyncio.sleep(base + extra)
+        return random.random() < self.error_rate.get(group, 0)
+
+
+def _group_for(path: str) -> str:
+    if path.startswith(("/rest/", "/auth/")):
+        return "supabase"
+    if path.startswith("/graphql"):
+        return "anilist"
+    if path.startswith("/cdn/"):
+        return "images"
+    return "leercapitulo"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# ---------------------------------------------------------------------------
+# leercapitulo
+# ---------------------------------------------------------------------------
+
+def _load_fixtures() -> dict[str, str]:
+    fixtures = {}
+    for path in FIXTURES_DIR.glob("*"):
+        fixtures[path.name] = path.read_text(encoding="utf-8")
+    return fixtures
+
+
+def _manga_fixture(fixtures: dict[str, str], slug: str) -> str:
+    """Pick a manga page for ``slug``; most series are short, a few are huge."""
+    bucket = int(hashlib.md5(slug.encode()).hexdigest(), 16) % 10
+    size = "huge" if bucket == 0 else "medium" if bucket < 4 else "small"
+    return fixtures[f"manga_{size}.html"]
+
+
+def _chapter_page(base: str, slug: str, number: str) -> str:
+    options = "".join(
+        f'<option value="{base}/cdn/{slug}/{number}/{p:03d}.jpg">{p}/{PAGES_PER_CHAPTER}</option>'
+        for p in range(1, PAGES_PER_CHAPTER + 1)
+    )
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+        f"<title>{slug} {number} - leercapitulo.co</title></head><body>"
+        f"<select class=\"loadImgType\">{options}</select>"
+        f"<img id=\"page\" src=\"{base}/cdn/{slug}/{number}/001.jpg\">"
+        "</body></html>"
+    )
+
+
+_image_cache: dict[int, bytes] = {}
+
+
+def _image_bytes(path: str, size_kb: int) -> bytes:
+    recorded = RECORDINGS_DIR / "images" / Path(path).name
+    if recorded.exists():
+        return recorded.read_bytes()
+    if size_kb not in _image_cache:
+        from PIL import Image
+
+        # Noise compresses poorly, so the JPEG lands near the requested size.
+        side = max(64, int((size_kb * 1024 / 1.2) ** 0.5))
+        img = Image.frombytes("L", (side, side), random.Random(size_kb).randbytes(side * side))
+        buf = io.BytesIO()
+        img.convert("RGB").save(buf, "JPEG", quality=85)
+        _image_cache[size_kb] = buf.getvalue()
+    return _image_cache[size_kb]
+
+
+# ---------------------------------------------------------------------------
+# AniList
+# ---------------------------------------------------------------------------
+
+class AniListLimiter:
+    """AniList's fixed one-minute window, keyed by access token."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.windows: dict[str, tuple[int, int]] = {}
+
+    def hit(self, token: str) -> tuple[int, int]:
+        """Return (remaining, reset_epoch) after counting one request."""
+        window = int(time.time() // 60)
+        start, used = self.windows.get(token, (window, 0))
+        if start != window:
+            start, used = window, 0
+        used += 1
+        self.windows[token] = (start, used)
+        return self.limit - used, (start + 1) * 60
+
+
+def _anilist_media(media_id: int) -> dict:
+    return {
+        "id": media_id,
+        "title": {"romaji": f"Manga {media_id}", "english": None, "native": None},
+        "coverImage": {"large": f"https://example.invalid/cover/{media_id}.jpg"},
+        "chapters": None,
+        "status": "RELEASING",
+    }
+
+
+def _anilist_answer(query: str, variables: dict) -> dict:
+    if "SaveMediaListEntry" in query:
+        return {"SaveMediaListEntry": {
+            "id": variables.get("mediaId", 0),
+            "status": variables.get("status", "CURRENT"),
+            "progress": variables.get("progress", 0),
+        }}
+    if "MediaListCollection" in query:
+        entries = [
+            {"id": i, "mediaId": i, "status": "CURRENT", "progress": i % 50, "media": _anilist_media(i)}
+            for i in range(1, 21)
+        ]
+        return {"MediaListCollection": {"lists": [{"name": "Reading", "entries": entries}]}}
+    if "Page" in query:
+        seed = int(hashlib.md5(str(variables.get("search", "")).encode()).hexdigest()[:6], 16)
+        return {"Page": {"media": [_anilist_media(seed + i) for i in range(10)]}}
+    return {"Viewer": {"id": 4242, "name": "loadtest", "avatar": {"large": None}}}
+
+
+# ---------------------------------------------------------------------------
+# Supabase (auth + PostgREST)
+# ---------------------------------------------------------------------------
+
+FILTER_RE = re.compile(r"^(not\.)?(eq|neq|gt|gte|lt|lte|in|is)\.(.*)$", re.S)
+
+
+def _coerce(raw: str, sample):
+    if isinstance(sample, bool):
+        return raw.lower() == "true"
+    if isinstance(sample, (int, float)) and not isinstance(sample, bool):
+        try:
+            return type(sample)(float(raw)) if isinstance(sample, float) else int(float(raw))
+        except ValueError:
+            return raw
+    return raw
+
+
+def _matches(row: dict, column: str, expr: str) -> bool:
+    m = FILTER_RE.match(expr)
+    if not m:
+        return True
+    negate, op, raw = m.groups()
+    raw = raw.strip('"')
+    value = row.get(column)
+    if op == "is":
+        result = value is None if raw.lower() == "null" else value == (raw.lower() == "true")
+    elif op == "in":
+        items = [v.strip().strip('"') for v in raw.strip("()").split(",")]
+        result = str(value) in items or value in [_coerce(v, value) for v in items]
+    else:
+        target = _coerce(raw, value)
+        if value is None:
+            result = False
+        elif op == "eq":
+            result = value == target
+        elif op == "neq":
+            result = value != target
+        else:
+            try:
+                result = {"gt": value > target, "gte": value >= target,
+                          "lt": value < target, "lte": value <= target}[op]
+            except TypeError:
+                result = False
+    return not result if negate else result
+
+
+def _split_top(expr: str) -> list[str]:
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(expr):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(expr[start:i])
+            start = i + 1
+    parts.append(expr[start:])
+    return parts
+
+
+def _matches_logic(row: dict, op: str, expr: str) -> bool:
+    """Evaluate an ``or=(...)``/``and(...)`` filter tree."""
+    results = []
+    for part in _split_top(expr.strip()[1:-1]):
+        name, _, rest = part.partition("(")
+        if name in ("and", "or") and rest:
+            results.append(_matches_logic(row, name, "(" + rest))
+        else:
+            column, _, condition = part.partition(".")
+            results.append(_matches(row, column, condition))
+    return any(results) if op == "or" else all(results)
+
+
+class PostgREST:
+    """An in-memory PostgREST good enough for the backend's query builders."""
+
+    RESERVED = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+    def __init__(self, max_rows: int):
+        self.tables: dict[str, list[dict]] = defaultdict(list)
+        self.max_rows = max_rows
+
+    def _filtered(self, table: str, params) -> list[dict]:
+        rows = self.tables[table]
+        filters = [(k, v) for k, v in params.multi_items() if k not in self.RESERVED]
+        return [
+            r for r in rows
+            if all(_matches_logic(r, k, v) if k in ("or", "and") else _matches(r, k, v) for k, v in filters)
+        ]
+
+    @staticmethod
+    def _project(rows: list[dict], select: str | None) -> list[dict]:
+        if not select or select.strip() == "*":
+            return [dict(r) for r in rows]
+        cols = [c.strip() for c in select.split(",") if c.strip()]
+        return [{c: r.get(c) for c in cols} for r in rows]
+
+    @staticmethod
+    def _order(rows: list[dict], order: str | None) -> list[dict]:
+        if not order:
+            return rows
+        for part in reversed(order.split(",")):
+            col, _, direction = part.partition(".")
+            desc = direction.startswith("desc")
+            rows = sorted(rows, key=lambda r: (r.get(col) is None, r.get(col)), reverse=desc)
+        return rows
+
+    def select(self, table: str, request: Request) -> Response:
+        params = request.query_params
+        rows = self._order(self._filtered(table, params), params.get("order"))
+        total = len(rows)
+
+        offset, limit = int(params.get("offset", 0)), params.get("limit")
+        range_header = request.headers.get("range")
+        if range_header and "-" in range_header:
+            start, end = range_header.split("-", 1)
+            offset, limit = int(start), int(end) - int(start) + 1
+        # Like PostgREST's max-rows: no response holds more, whatever the limit
+        limit = min(int(limit), self.max_rows) if limit is not None else self.max_rows
+        rows = rows[offset: offset + limit]
+
+        headers = {}
+        if "count=" in request.headers.get("prefer", ""):
+            end = offset + len(rows) - 1
+            headers["Content-Range"] = f"{offset}-{end}/{total}" if rows else f"*/{total}"
+        return JSONResponse(self._project(rows, params.get("select")), headers=headers)
+
+    def upsert(self, table: str, request: Request, payload) -> Response:
+        rows = payload if isinstance(payload, list) else [payload]
+        conflict = [c for c in request.query_params.get("on_conflict", "").split(",") if c]
+        merge = "merge-duplicates" in request.headers.get("prefer", "")
+        written = []
+        for incoming in rows:
+            existing = None
+            if conflict and merge:
+                existing = next(
+                    (r for r in self.tables[table] if all(r.get(c) == incoming.get(c) for c in conflict)),
+                    None,
+                )
+            if existing is not None:
+                existing.update(incoming)
+                existing["updated_at"] = _now()
+                written.append(existing)
+            else:
+                row = {"id": str(uuid.uuid4()), "created_at": _now(), "updated_at": _now(), **incoming}
+                self.tables[table].append(row)
+                written.append(row)
+        self._triggers(table, written)
+        return JSONResponse([dict(r) for r in written], status_code=201)
+
+    def update(self, table: str, request: Request, payload: dict) -> Response:
+        rows = self._filtered(table, request.query_params)
+        for row in rows:
+            row.update({k: (_now() if v == "now()" else v) for k, v in payload.items()})
+        self._triggers(table, rows)
+        return JSONResponse([dict(r) for r in rows])
+
+    def delete(self, table: str, request: Request) -> Response:
+        doomed = self._filtered(table, request.query_params)
+        ids = {id(r) for r in doomed}
+        self.tables[table] = [r for r in self.tables[table] if id(r) not in ids]
+        if table == "chapter_status":  # manga_chapters has no delete trigger
+            self._triggers(table, doomed)
+        return JSONResponse([dict(r) for r in doomed])
+
+    def _triggers(self, table: str, rows: list[dict]) -> None:
+        """Emulate the chapter_status/manga_chapters triggers of the chapter_progress migration.
+
+        A Python re-implementation of their effect on one connection, not the
+        SQL: the trigger functions themselves, and their behaviour under
+        concurrent transactions, are not exercised by anything that runs
+        against this server.
+        """
+        if table == "manga_chapters":
+            numbered = {(c["manga_url"], c["chapter_url"]): c["chapter_number"] for c in rows}
+            rows = [
+                r for r in self.tables["chapter_status"]
+                if r.get("chapter_number", -1) < 0 and numbered.get((r["manga_url"], r["chapter_url"]), -1) >= 0
+            ]
+            for row in rows:
+                row["chapter_number"] = numbered[(row["manga_url"], row["chapter_url"])]
+                row["updated_at"] = _now()
+            table = "chapter_status"
+        if table != "chapter_status":
+            return
+        numbers = {(c["manga_url"], c["chapter_url"]): c["chapter_number"] for c in self.tables["manga_chapters"]}
+        for row in rows:
+            if row.get("chapter_url") and row.get("chapter_number", -1) < 0:
+                row["chapter_number"] = numbers.get((row["manga_url"], row["chapter_url"]), -1)
+        for user_id, manga_url in {(r["user_id"], r["manga_url"]) for r in rows}:
+            read = [
+                r for r in self.tables["chapter_status"]
+                if r["user_id"] == user_id and r["manga_url"] == manga_url and r.get("is_read")
+            ]
+            summary = {
+                "user_id": user_id,
+                "manga_url": manga_url,
+                "max_read_chapter": max([0.0, *(r.get("chapter_number", -1) for r in read)]),
+                "read_count": len(read),
+                "unnumbered_count": sum(1 for r in read if r.get("chapter_number", -1) < 0),
+                "last_read_at": max((r["updated_at"] for r in read), default=None),
+                "updated_at": _now(),
+            }
+            progress = self.tables["chapter_progress"]
+            existing = next((p for p in progress if p["user_id"] == user_id and p["manga_url"] == manga_url), None)
+            if existing:
+                existing.update(summary)
+            else:
+                progress.append(summary)
+
+    def rpc(self, fn: str, params: dict) -> Response:
+        if fn != "mark_chapters_read":
+            return JSONResponse({"message": f"function {fn} not found"}, status_code=404)
+        max_chapter = params.get("p_max_chapter")
+        in_range = {
+            c["chapter_url"]: c["chapter_number"] for c in self.tables["manga_chapters"]
+            if c["manga_url"] == params["p_manga_url"]
+            and (max_chapter is None or 0 <= c["chapter_number"] <= max_chapter)
+        }
+        existing = {
+            r["chapter_url"]: r for r in self.tables["chapter_status"]
+            if r["user_id"] == params["p_user_id"] and r["chapter_url"] in in_range
+        }
+        is_read = params.get("p_is_read", True)
+        changed = 0
+        for url, number in in_range.items():
+            row = existing.get(url)
+            if row is None and is_read:
+                self.tables["chapter_status"].append({
+                    "id": str(uuid.uuid4()), "created_at": _now(), "updated_at": _now(),
+                    "user_id": params["p_user_id"], "manga_url": params["p_manga_url"],
+                    "chapter_url": url, "chapter_number": number, "is_read": True, "is_bookmarked": False,
+                })
+                changed += 1
+            elif row is not None and row.get("is_read") != is_read:
+                row.update(is_read=is_read, updated_at=_now())
+                changed += 1
+        self._triggers("chapter_status", [{"user_id": params["p_user_id"], "manga_url": params["p_manga_url"]}])
+        return JSONResponse(changed)
+
+
+def _user_for_token(token: str) -> dict:
+    return {
+        "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"loadtest:{token}")),
+        "aud": "authenticated",
+        "role": "authenticated",
+        "email": f"{hashlib.md5(token.encode()).hexdigest()[:10]}@loadtest.invalid",
+        "app_metadata": {},
+        "user_metadata": {},
+        "created_at": "2024-01-01T00:00:00+00:00",
+    }
+
+
+# ---------------------------------------------------------------------------
+# App
+# ---------------------------------------------------------------------------
+
+def create_app(injection: Injection, image_kb: int = 350, max_rows: int = 1000) -> FastAPI:
+    app = FastAPI(title="FiebreReader fake upstream")
+    fixtures = _load_fixtures()
+    db = PostgREST(max_rows)
+    limiter = AniListLimiter(ANILIST_RATE_LIMIT)
+
+    @app.middleware("http")
+    async def inject(request: Request, call_next):
+        if await injection.apply(_group_for(request.url.path)):
+            return JSONResponse({"message": "injected failure"}, status_code=503)
+        return await call_next(request)
+
+    # --- leercapitulo ---
+
+    @app.get("/", response_class=HTMLResponse)
+    async def home():
+        return fixtures["latest.html"]
+
+    @app.get("/status/ongoing/", response_class=HTMLResponse)
+    async def ongoing():
+        return fixtures["popular.html"]
+
+    @app.get("/search-autocomplete")
+    async def autocomplete(term: str = ""):
+        return JSONResponse(json.loads(fixtures["autocomplete.json"]))
+
+    @app.get("/manga/{path:path}", response_class=HTMLResponse)
+    async def manga_page(path: str):
+        return _manga_fixture(fixtures, path.strip("/").split("/")[-1])
+
+    @app.get("/leer/{slug}/{number}/", response_class=HTMLResponse)
+    async def chapter_page(slug: str, number: str, request: Request):
+        return _chapter_page(str(request.base_url).rstrip("/"), slug, number)
+
+    @app.get("/cdn/{path:path}")
+    async def image(path: str):
+        return Response(_image_bytes(path, image_kb), media_type="image/jpeg")
+
+    # --- AniList ---
+
+    @app.post("/graphql")
+    async def graphql(request: Request):
+        token = request.headers.get("authorization", "anonymous")
+        remaining, reset = limiter.hit(token)
+        headers = {"X-RateLimit-Limit": str(ANILIST_RATE_LIMIT), "X-RateLimit-Remaining": str(max(remaining, 0))}
+        if remaining < 0:
+            headers.update({"Retry-After": str(max(1, reset - int(time.time()))), "X-RateLimit-Reset": str(reset)})
+            return JSONResponse(
+                {"errors": [{"message": "Too Many Requests.", "status": 429}], "data": None},
+                status_code=429, headers=headers,
+            )
+        body = await request.json()
+        data = _anilist_answer(body.get("query", ""), body.get("variables") or {})
+        return JSONResponse({"data": data}, headers=headers)
+
+    # --- Supabase ---
+
+    @app.get("/auth/v1/user")
+    async def auth_user(request: Request):
+        token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        if not token:
+            return JSONResponse({"msg": "missing token"}, status_code=401)
+        return _user_for_token(token)
+
+    @app.post("/rest/v1/rpc/{fn}")
+    async def rpc(fn: str, request: Request):
+        return db.rpc(fn, await request.json())
+
+    @app.api_route("/rest/v1/{table}", methods=["GET", "HEAD", "POST", "PATCH", "DELETE"])
+    async def rest(table: str, request: Request):
+        if request.method in ("GET", "HEAD"):
+            return db.select(table, request)
+        if request.method == "DELETE":
+            return db.delete(table, request)
+        payload = await request.json()
+        if request.method == "PATCH":
+            return db.update(table, request, payload)
+        return db.upsert(table, request, payload)
+
+    return app
+
+
+def _parse_groups(spec: str) -> dict[str, float]:
+    values = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        group, _, value = part.partition("=")
+        if group not in GROUPS:
+            raise SystemExit(f"unknown group {group!r}; expected one of {', '.join(GROUPS)}")
+        values[group] = float(value)
+    return values
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", default="", help="per-group base latency in ms, e.g. supabase=20,anilist=100")
+    parser.add_argument("--error-rate", default="", help="per-group failure ratio, e.g. leercapitulo=0.01")
+    parser.add_argument("--jitter", type=float, default=0.5, help="mean extra latency as a fraction of the base")
+    parser.add_argument("--image-kb", type=int, default=350, help="size of generated page images")
+    parser.add_argument("--max-rows", type=int, default=1000, help="PostgREST max-rows (Supabase's default)")
+    args = parser.parse_args()
+
+    injection = Injection(_parse_groups(args.latency), _parse_groups(args.error_rate), args.jitter)
+    uvicorn.run(create_app(injection, args.image_kb, args.max_rows), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
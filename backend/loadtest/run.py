@@ -0,0 +1,181 @@
+"""
+Scripted load generator that drives realistic reader flows against the API.
+
+    python -m loadtest.run --base-url http://127.0.0.1:8000 --users 50 --duration 120
+
+Each virtual user loops through: browse popular/latest -> search -> manga
+detail + chapters + statuses -> chapter images -> first few pages through
+the image proxy -> mark-read -> library, and occasionally downloads the
+chapter as a PDF.  Users authenticate with ``Bearer loadtest-<n>`` tokens,
+which ``loadtest.fake_upstream`` accepts as distinct Supabase users.
+
+The report lists throughput, error count and latency percentiles per
+endpoint (query strings are stripped so results aggregate per route).
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import quote
+
+import httpx
+
+SEARCH_TERMS = ["one", "solo", "tower", "god", "blade", "dragon", "king", "moon"]
+ERROR_BACKOFF = 0.25  # minimum pause after a failed call, even with --think-ms 0
+
+
+@dataclass
+class Stats:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    flows: int = 0
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+
+class VirtualUser:
+    def __init__(self, n: int, client: httpx.AsyncClient, stats: Stats, args: argparse.Namespace):
+        self.client = client
+        self.stats = stats
+        self.args = args
+        self.rng = random.Random(n)
+        self.headers = {"Authorization": f"Bearer loadtest-{n}"}
+
+    async def call(self, method: str, path: str, **kwargs) -> httpx.Response | None:
+        endpoint = f"{method} {path.split('?', 1)[0]}"
+        start = time.perf_counter()
+        try:
+            resp = await self.client.request(method, path, headers=self.headers, **kwargs)
+            ok = resp.status_code < 400
+        except httpx.HTTPError:
+            resp, ok = None, False
+        self.stats.record(endpoint, time.perf_counter() - start, ok)
+        pause = self.rng.expovariate(1000 / self.args.think_ms) if self.args.think_ms else 0
+        if not ok:
+            # A refused connection fails without ever yielding; without a pause
+            # a flow that keeps failing spins and starves the other users
+            pause = max(pause, ERROR_BACKOFF)
+        if pause:
+            await asyncio.sleep(pause)
+        return resp if ok else None
+
+    async def flow(self) -> None:
+        listing = await self.call("GET", f"/api/manga/{self.rng.choice(['popular', 'latest'])}")
+        mangas = listing.json().get("mangas", []) if listing else []
+
+        search = await self.call("GET", f"/api/manga/search?q={self.rng.choice(SEARCH_TERMS)}")
+        if search and not mangas:
+            mangas = search.json().get("mangas", [])
+        if not mangas:
+            return
+
+        manga_url = self.rng.choice(mangas)["url"]
+        q = quote(manga_url, safe="")
+        await self.call("GET", f"/api/manga/detail?url={q}")
+        chapters_resp = await self.call("GET", f"/api/manga/chapters?url={q}")
+        await self.call("GET", f"/api/chapters/status?manga_url={q}")
+        chapters = chapters_resp.json() if chapters_resp else []
+        if not chapters:
+            return
+
+        chapter = self.rng.choice(chapters)
+        cq = quote(chapter["url"], safe="")
+        images_resp = await self.call("GET", f"/api/manga/chapter-images?url={cq}")
+        images = images_resp.json().get("images", []) if images_resp else []
+        for image_url in images[: self.args.pages]:
+            await self.call("GET", f"/api/reader/image-proxy?url={quote(image_url, safe='')}")
+
+        await self.call("POST", "/api/chapters/mark-read", json={
+            "manga_url": manga_url,
+            "chapter_url": chapter["url"],
+            "chapter_number": chapter.get("chapter_number", -1),
+            "is_read": True,
+        })
+        await self.call("GET", "/api/library")
+
+        if self.rng.random() < self.args.pdf_ratio:
+            await self.call("GET", f"/api/reader/download-pdf?url={cq}")
+
+    async def run(self, deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            await self.flow()
+            self.stats.flows += 1
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return statistics.quantiles(sorted_values, n=1000, method="inclusive")[int(pct * 10) - 1]
+
+
+def report(stats: Stats, elapsed: float) -> dict:
+    rows = {}
+    for endpoint, values in sorted(stats.latencies.items()):
+        values.sort()
+        rows[endpoint] = {
+            "count": len(values),
+            "errors": stats.errors.get(endpoint, 0),
+            "rps": len(values) / elapsed,
+            "p50_ms": _percentile(values, 50) * 1000,
+            "p95_ms": _percentile(values, 95) * 1000,
+            "p99_ms": _percentile(values, 99) * 1000,
+            "max_ms": values[-1] * 1000,
+        }
+
+    header = f"{'endpoint':42} {'count':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, r in rows.items():
+        print(
+            f"{endpoint:42} {r['count']:7d} {r['errors']:5d} {r['rps']:8.1f} "
+            f"{r['p50_ms']:9.1f} {r['p95_ms']:9.1f} {r['p99_ms']:9.1f} {r['max_ms']:9.1f}"
+        )
+    total = sum(r["count"] for r in rows.values())
+    print(f"\n{stats.flows} flows, {total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+    return rows
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    stats = Stats()
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        start = time.perf_counter()
+        deadline = start + args.duration
+        users = [VirtualUser(n, client, stats, args) for n in range(args.users)]
+        tasks = []
+        for user in users:
+            tasks.append(asyncio.create_task(user.run(deadline)))
+            await asyncio.sleep(args.ramp_up / max(args.users, 1))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    rows = report(stats, elapsed)
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, indent=2) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to run")
+    parser.add_argument("--ramp-up", type=float, default=5, help="seconds to start all users")
+    parser.add_argument("--think-ms", type=float, default=200, help="mean pause between calls (0 to disable; failed calls still back off)")
+    parser.add_argument("--pages", type=int, default=3, help="pages fetched through the image proxy per chapter")
+    parser.add_argument("--pdf-ratio", type=float, default=0.05, help="fraction of flows that download a PDF")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", help="write the per-endpoint report to this file")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Shared fixtures.
+
+Route tests call the real app, with ``loadtest.fake_upstream`` (Supabase
+auth and an in-memory PostgREST) served on a local port in a background
+thread, so no network or database is needed.  The fake emulates the
+database triggers in Python, so the SQL in ``supabase/`` is not tested.
+"""
+
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+UPSTREAM_PORT = _free_port()
+UPSTREAM = f"http://127.0.0.1:{UPSTREAM_PORT}"
+
+# app.config reads these when it is first imported
+os.environ.update({
+    "LEERCAPITULO_URL": UPSTREAM,
+    "ANILIST_GRAPHQL_URL": f"{UPSTREAM}/graphql",
+    "SUPABASE_URL": UPSTREAM,
+    "SUPABASE_SERVICE_KEY": "fake.fake.fake",
+})
+
+
+class FakeClock:
+    """Stands in for the ``time`` module where only ``monotonic`` is used."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(scope="session")
+def upstream():
+    import uvicorn
+
+    from loadtest.fake_upstream import Injection, create_app
+
+    config = uvicorn.Config(
+        create_app(Injection({}, {}, 0)), host="127.0.0.1", port=UPSTREAM_PORT, log_level="warning"
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("fake upstream did not start")
+        time.sleep(0.01)
+    yield UPSTREAM
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def client(upstream):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    # Not entered as a context manager: the routes under test don't need the
+    # lifespan's background workers
+    return TestClient(app)
+
+
+@pytest.fixture
+def user(request):
+    """Auth headers and id of a user unique to this test."""
+    from loadtest.fake_upstream import _user_for_token
+
+    token = f"test-{request.node.nodeid}"
+    return {"headers": {"Authorization": f"Bearer {token}"}, "id": _user_for_token(token)["id"]}
+
+
+@pytest.fixture
+def db(upstream):
+    from app.supabase_client import get_supabase
+
+    return get_supabase()
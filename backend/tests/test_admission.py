@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionController, Overloaded, Priority
+
+
+async def _settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class _Pool:
+    """Runs named jobs through a controller and records the order they got a slot."""
+
+    def __init__(self, controller: AdmissionController):
+        self.controller = controller
+        self.order: list[str] = []
+        self.gate = asyncio.Event()
+
+    async def job(self, name: str, priority: Priority, hold: bool = False) -> str:
+        async with self.controller.admit(priority):
+            self.order.append(name)
+            if hold:
+                await self.gate.wait()
+        return name
+
+
+def test_slots_go_to_waiters_by_priority_then_arrival():
+    async def scenario():
+        pool = _Pool(AdmissionController("test", capacity=1, queue_size=10, timeout=5))
+        holder = asyncio.create_task(pool.job("holder", Priority.INTERACTIVE, hold=True))
+        await _settle()
+        waiters = [
+            asyncio.create_task(pool.job(name, priority))
+            for name, priority in [
+                ("prefetch", Priority.BACKGROUND),
+                ("pdf", Priority.EXPORT),
+                ("read-1", Priority.INTERACTIVE),
+                ("read-2", Priority.INTERACTIVE),
+            ]
+        ]
+        await _settle()
+        pool.gate.set()
+        await asyncio.gather(holder, *waiters)
+
+        assert pool.order == ["holder", "read-1", "read-2", "pdf", "prefetch"]
+        assert pool.controller._in_use == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_sheds_a_lower_priority_waiter():
+    async def scenario():
+        pool = _Pool(AdmissionController("test", capacity=1, queue_size=2, timeout=5))
+        holder = asyncio.create_task(pool.job("holder", Priority.INTERACTIVE, hold=True))
+        await _settle()
+        prefetch = asyncio.create_task(pool.job("prefetch", Priority.BACKGROUND))
+        read_1 = asyncio.create_task(pool.job("read-1", Priority.INTERACTIVE))
+        await _settle()
+
+        # Ties don't shed: an equal-priority newcomer is turned away instead
+        with pytest.raises(Overloaded) as rejected:
+            await pool.job("prefetch-2", Priority.BACKGROUND)
+        assert rejected.value.reason == "queue full"
+        assert rejected.value.retry_after >= 1
+
+        read_2 = asyncio.create_task(pool.job("read-2", Priority.INTERACTIVE))
+        await _settle()
+        with pytest.raises(Overloaded) as shed:
+            await prefetch
+        assert shed.value.reason == "shed"
+
+        pool.gate.set()
+        assert await asyncio.gather(holder, read_1, read_2) == ["holder", "read-1", "read-2"]
+        assert pool.controller._in_use == 0
+
+    asyncio.run(scenario())
+
+
+def test_waiting_past_the_timeout_is_overloaded():
+    async def scenario():
+        pool = _Pool(AdmissionController("test", capacity=1, queue_size=2, timeout=0.05))
+        holder = asyncio.create_task(pool.job("holder", Priority.INTERACTIVE, hold=True))
+        await _settle()
+
+        with pytest.raises(Overloaded) as exc:
+            await pool.job("late", Priority.INTERACTIVE)
+        assert exc.value.reason == "timeout"
+        assert pool.controller._waiters == []
+
+        pool.gate.set()
+        await holder
+        assert pool.controller._in_use == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiters_do_not_leak_slots():
+    async def scenario():
+        pool = _Pool(AdmissionController("test", capacity=1, queue_size=2, timeout=5))
+        holder = asyncio.create_task(pool.job("holder", Priority.INTERACTIVE, hold=True))
+        await _settle()
+        waiter = asyncio.create_task(pool.job("gone", Priority.INTERACTIVE))
+        await _settle()
+
+        waiter.cancel()
+        await _settle()
+        pool.gate.set()
+        await holder
+
+        assert pool.order == ["holder"]
+        assert pool.controller._in_use == 0
+        assert await pool.job("next", Priority.BACKGROUND) == "next"
+
+    asyncio.run(scenario())
+
+
+def test_capacity_admits_without_queueing():
+    async def scenario():
+        pool = _Pool(AdmissionController("test", capacity=3, queue_size=0, timeout=5))
+        holders = [asyncio.create_task(pool.job(f"job-{i}", Priority.BACKGROUND, hold=True)) for i in range(3)]
+        await _settle()
+        assert pool.controller._in_use == 3
+
+        with pytest.raises(Overloaded):
+            await pool.job("extra", Priority.INTERACTIVE)  # nothing queued to shed
+
+        pool.gate.set()
+        await asyncio.gather(*holders)
+
+    asyncio.run(scenario())
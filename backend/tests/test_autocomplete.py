@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from app import autocomplete
+from app.autocomplete import SearchCache, normalize
+
+TITLES = ["One Piece", "One Punch-Man", "Óne Outs", "Solo Leveling"]
+
+
+class Site:
+    """Answers searches from ``TITLES``, at most ``cap`` results, counting calls."""
+
+    def __init__(self, cap: int):
+        self.cap = cap
+        self.queries: list[str] = []
+
+    async def search(self, query: str) -> list[dict]:
+        self.queries.append(query)
+        await asyncio.sleep(0.01)
+        matches = [t for t in TITLES if query in autocomplete._fold(t)]
+        return [{"title": t} for t in matches[: self.cap]]
+
+
+def _titles(mangas: list[dict]) -> list[str]:
+    return [m["title"] for m in mangas]
+
+
+def test_normalize_folds_case_and_whitespace():
+    assert normalize("  One   PIECE ") == "one piece"
+
+
+def test_longer_queries_filter_a_complete_prefix_result():
+    async def scenario():
+        site = Site(cap=10)
+        cache = SearchCache(max_entries=10, ttl=60, cap=10)
+
+        assert _titles(await cache.search("one", site.search)) == ["One Piece", "One Punch-Man", "Óne Outs"]
+        assert _titles(await cache.search("One P", site.search)) == ["One Piece", "One Punch-Man"]
+        assert _titles(await cache.search("one o", site.search)) == ["Óne Outs"]  # accents folded
+        assert _titles(await cache.search("ONE", site.search)) == ["One Piece", "One Punch-Man", "Óne Outs"]
+
+        assert site.queries == ["one"]
+
+    asyncio.run(scenario())
+
+
+def test_capped_results_are_not_used_as_a_prefix():
+    async def scenario():
+        site = Site(cap=2)
+        cache = SearchCache(max_entries=10, ttl=60, cap=2)
+
+        await cache.search("one", site.search)  # two results: possibly truncated
+        assert _titles(await cache.search("one o", site.search)) == ["Óne Outs"]
+        assert site.queries == ["one", "one o"]
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_identical_queries_share_one_fetch():
+    async def scenario():
+        site = Site(cap=10)
+        cache = SearchCache(max_entries=10, ttl=60, cap=10)
+
+        results = await asyncio.gather(*(cache.search("solo", site.search) for _ in range(4)))
+        assert all(_titles(r) == ["Solo Leveling"] for r in results)
+        assert site.queries == ["solo"]
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def clock(clock, monkeypatch):
+    monkeypatch.setattr(autocomplete, "time", clock)
+    return clock
+
+
+def test_entries_expire_after_the_ttl(clock):
+    async def scenario():
+        site = Site(cap=10)
+        cache = SearchCache(max_entries=10, ttl=60, cap=10)
+
+        await cache.search("solo", site.search)
+        clock.advance(59)
+        await cache.search("solo", site.search)
+        clock.advance(2)
+        await cache.search("solo", site.search)
+        assert site.queries == ["solo", "solo"]
+
+    asyncio.run(scenario())
+
+
+def test_least_recently_used_entries_are_dropped():
+    async def scenario():
+        site = Site(cap=10)
+        cache = SearchCache(max_entries=2, ttl=60, cap=10)
+
+        await cache.search("one", site.search)
+        await cache.search("solo", site.search)
+        await cache.search("one", site.search)  # refreshes "one"
+        await cache.search("piece", site.search)  # evicts "solo"
+        await cache.search("one", site.search)
+        await cache.search("solo", site.search)
+        assert site.queries == ["one", "solo", "piece", "solo"]
+
+    asyncio.run(scenario())
+
+
+def test_zero_ttl_disables_caching():
+    async def scenario():
+        site = Site(cap=10)
+        cache = SearchCache(max_entries=10, ttl=0, cap=10)
+
+        await cache.search("one", site.search)
+        await cache.search("one piece", site.search)
+        assert site.queries == ["one", "one piece"]
+
+    asyncio.run(scenario())
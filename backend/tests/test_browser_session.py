@@ -0,0 +1,128 @@
+import asyncio
+import sys
+import types
+
+import pytest
+
+from app import browser_session
+from app.browser_session import BrowserSession
+from app.governor import CircuitBreaker, Governor, UpstreamUnavailable
+
+URL = "http://site.test/"
+COOKIE = {"name": "cf", "value": "ok", "domain": "site.test", "path": "/", "expires": -1}
+
+
+class FakeTimeout(Exception):
+    pass
+
+
+class FakeResponse:
+    def __init__(self, status: int, frame):
+        self.status = status
+        self.frame = frame
+        self.request = self
+
+    def is_navigation_request(self) -> bool:
+        return True
+
+    async def all_headers(self) -> dict[str, str]:
+        return {"sec-ch-ua": '"Chromium"', "accept": "*/*"}
+
+
+class FakeBrowser:
+    """A browser whose first navigation answers each status in ``statuses`` in turn."""
+
+    def __init__(self, statuses: list[int] | None):
+        self.statuses = statuses
+        self.closed = False
+        self.main_frame = object()
+        self._listeners = []
+
+    # Browser
+    async def new_context(self, user_agent: str):
+        return self
+
+    async def close(self) -> None:
+        self.closed = True
+
+    # BrowserContext
+    async def new_page(self):
+        return self
+
+    async def cookies(self) -> list[dict]:
+        return [COOKIE]
+
+    # Page
+    def on(self, event: str, callback) -> None:
+        self._listeners.append(callback)
+
+    async def goto(self, url: str, wait_until: str, timeout: int):
+        if self.statuses is None:
+            raise FakeTimeout()
+        responses = [FakeResponse(status, self.main_frame) for status in self.statuses]
+        for response in responses:
+            for callback in self._listeners:
+                callback(response)
+        return responses[0]
+
+
+@pytest.fixture
+def browser(monkeypatch):
+    """Install a fake ``playwright.async_api``; set ``.statuses`` before harvesting."""
+    fake = FakeBrowser([200])
+
+    class Playwright:
+        async def __aenter__(self):
+            return types.SimpleNamespace(chromium=types.SimpleNamespace(launch=self.launch))
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def launch(self, headless: bool):
+            return fake
+
+    module = types.ModuleType("playwright.async_api")
+    module.async_playwright = Playwright
+    module.TimeoutError = FakeTimeout
+    monkeypatch.setitem(sys.modules, "playwright.async_api", module)
+    monkeypatch.setattr(browser_session, "governor", Governor())
+    return fake
+
+
+def _breaker() -> CircuitBreaker:
+    return browser_session.governor._host(URL).breaker
+
+
+def test_passed_challenge_applies_the_session(browser):
+    browser.statuses = [403, 200]  # the challenge redirects once it passes
+    session = BrowserSession(URL, "agent", ttl=600, margin=60)
+
+    asyncio.run(session.harvest())
+
+    assert session.cookies == [COOKIE]
+    assert session.headers({}) == {"sec-ch-ua": '"Chromium"'}
+    assert _breaker().failures == 0
+    assert browser.closed
+
+
+def test_challenge_that_never_passes_feeds_the_breaker(browser):
+    browser.statuses = [503]
+    session = BrowserSession(URL, "agent", ttl=600, margin=60)
+
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(session.harvest())
+
+    assert _breaker().failures == 1
+    assert session.cookies == []
+    assert browser.closed
+
+
+def test_timeout_closes_the_browser(browser):
+    browser.statuses = None
+    session = BrowserSession(URL, "agent", ttl=600, margin=60)
+
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(session.harvest())
+
+    assert _breaker().failures == 1
+    assert browser.closed
@@ -0,0 +1,66 @@
+import asyncio
+
+from app import chapter_catalog
+from app.routes import chapters
+
+MANGA = "http://fake/manga/catalog/"
+
+
+def _chapters(numbers) -> list[dict]:
+    return [{"url": f"{MANGA}{n}/", "chapter_number": n} for n in numbers]
+
+
+def _catalog(db) -> dict[str, float]:
+    rows = db.table("manga_chapters").select("chapter_url, chapter_number").eq("manga_url", MANGA).execute().data
+    return {row["chapter_url"]: row["chapter_number"] for row in rows}
+
+
+def test_store_replaces_chapters_the_site_no_longer_lists(db):
+    async def scenario():
+        await chapter_catalog.store(MANGA, _chapters([1, 2, 3]))
+        await asyncio.sleep(0.01)
+        await chapter_catalog.store(MANGA, _chapters([2, 3, 4]))
+
+    asyncio.run(scenario())
+
+    assert _catalog(db) == {f"{MANGA}{n}/": n for n in (2, 3, 4)}
+
+
+def test_empty_scrape_keeps_the_catalog(db):
+    async def scenario():
+        await chapter_catalog.store(MANGA, _chapters([1]))
+        assert not await chapter_catalog.ensure(MANGA, [])
+
+    asyncio.run(scenario())
+
+    assert _catalog(db) == {f"{MANGA}1/": 1}
+
+
+def test_fallback_marks_the_same_range_as_the_rpc(client, user, db, monkeypatch):
+    manga = f"{MANGA}fallback/"
+
+    async def ensure(url, chapters=None):
+        return False  # no usable catalog: upsert rows from the scraped list
+
+    async def get_chapters(url):
+        return [
+            {"url": f"{manga}extra/", "chapter_number": -1},
+            *({"url": f"{manga}{n}/", "chapter_number": n} for n in (1, 2, 3)),
+        ]
+
+    monkeypatch.setattr(chapter_catalog, "ensure", ensure)
+    monkeypatch.setattr(chapters.scraper, "get_chapters", get_chapters)
+    monkeypatch.setattr(chapters.progress_updates, "schedule", lambda *key: None)
+
+    resp = client.post(
+        "/api/chapters/mark-previous-read",
+        json={"manga_url": manga, "max_chapter_number": 2},
+        headers=user["headers"],
+    )
+
+    assert resp.json()["count"] == 2
+    rows = (
+        db.table("chapter_status").select("chapter_url, chapter_number, is_read")
+        .eq("user_id", user["id"]).eq("manga_url", manga).execute().data
+    )
+    assert {r["chapter_url"]: r["chapter_number"] for r in rows} == {f"{manga}1/": 1, f"{manga}2/": 2}
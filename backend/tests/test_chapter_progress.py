@@ -0,0 +1,105 @@
+"""
+``_max_read_chapter`` against the fake upstream.
+
+The chapter_progress triggers are emulated in Python by
+``loadtest.fake_upstream``; these tests check how the API uses the summary,
+not the migration's SQL, which (including its locking under concurrent
+writers) has no automated coverage here.
+"""
+
+import asyncio
+
+import pytest
+
+from app import chapter_catalog
+from app.routes import chapters
+from app.routes.chapters import _max_read_chapter
+
+MANGA = "http://fake/manga/progress/"
+
+
+@pytest.fixture
+def site(monkeypatch):
+    """The site's chapter list, as ``scraper.get_chapters`` returns it; records calls."""
+    listing = {"calls": 0, "chapters": []}
+
+    async def get_chapters(url):
+        listing["calls"] += 1
+        return listing["chapters"]
+
+    monkeypatch.setattr(chapters.scraper, "get_chapters", get_chapters)
+    return listing
+
+
+def _read(db, user_id: str, manga: str, *names: str) -> None:
+    db.table("chapter_status").upsert(
+        [{"user_id": user_id, "manga_url": manga, "chapter_url": f"{manga}{n}/", "is_read": True} for n in names],
+        on_conflict="user_id,chapter_url",
+    ).execute()
+
+
+def test_numbered_reads_come_from_the_summary(db, user, site):
+    manga = f"{MANGA}numbered/"
+    db.table("manga_chapters").upsert([
+        {"manga_url": manga, "chapter_url": f"{manga}{n}/", "chapter_number": n, "position": n} for n in (1, 2, 3)
+    ]).execute()
+    _read(db, user["id"], manga, "1", "3")
+
+    assert asyncio.run(_max_read_chapter(user["id"], manga)) == 3
+    assert site["calls"] == 0
+
+
+def test_unnumbered_reads_are_resolved_through_the_site(db, user, site):
+    manga = f"{MANGA}mixed/"
+    db.table("manga_chapters").upsert(
+        {"manga_url": manga, "chapter_url": f"{manga}2/", "chapter_number": 2, "position": 0}
+    ).execute()
+    _read(db, user["id"], manga, "2", "7")  # chapter 7 isn't catalogued yet
+    site["chapters"] = [{"url": f"{manga}7/", "chapter_number": 7}]
+
+    assert asyncio.run(_max_read_chapter(user["id"], manga)) == 7
+    assert site["calls"] == 1
+
+
+def test_recorded_numbers_survive_a_failed_lookup(db, user, monkeypatch):
+    manga = f"{MANGA}offline/"
+    db.table("manga_chapters").upsert(
+        {"manga_url": manga, "chapter_url": f"{manga}5/", "chapter_number": 5, "position": 0}
+    ).execute()
+    _read(db, user["id"], manga, "5", "gone")
+
+    async def get_chapters(url):
+        raise ConnectionError("site down")
+
+    monkeypatch.setattr(chapters.scraper, "get_chapters", get_chapters)
+    assert asyncio.run(_max_read_chapter(user["id"], manga)) == 5
+
+
+def test_nothing_read_is_zero(user, site, upstream):
+    assert asyncio.run(_max_read_chapter(user["id"], f"{MANGA}unread/")) == 0
+    assert site["calls"] == 0
+
+
+def test_storing_the_catalog_numbers_legacy_reads(db, user, site):
+    manga = f"{MANGA}legacy/"
+    _read(db, user["id"], manga, "1", "4")  # written before the catalog existed
+    summary = (
+        db.table("chapter_progress").select("unnumbered_count")
+        .eq("user_id", user["id"]).eq("manga_url", manga).execute().data
+    )
+    assert summary == [{"unnumbered_count": 2}]
+
+    asyncio.run(chapter_catalog.store(manga, [{"url": f"{manga}{n}/", "chapter_number": n} for n in (1, 4)]))
+
+    assert asyncio.run(_max_read_chapter(user["id"], manga)) == 4
+    assert site["calls"] == 0
+
+
+def test_fallback_stores_the_catalog_so_it_runs_once(db, user, site):
+    manga = f"{MANGA}self-heal/"
+    _read(db, user["id"], manga, "2", "9")
+    site["chapters"] = [{"url": f"{manga}{n}/", "chapter_number": n} for n in (2, 9)]
+
+    assert asyncio.run(_max_read_chapter(user["id"], manga)) == 9
+    assert asyncio.run(_max_read_chapter(user["id"], manga)) == 9
+    assert site["calls"] == 1
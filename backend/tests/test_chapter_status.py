@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+from app.routes.chapters import CURSOR_OVERLAP
+
+MANGA = "http://fake/manga/delta-sync/"
+
+
+def _seed(db, user_id: str, changed: dict[str, datetime]) -> None:
+    db.table("chapter_status").upsert([
+        {
+            "user_id": user_id,
+            "manga_url": MANGA,
+            "chapter_url": f"{MANGA}{name}/",
+            "is_read": True,
+            "is_bookmarked": False,
+            "updated_at": at.isoformat(),
+        }
+        for name, at in changed.items()
+    ]).execute()
+
+
+def _since(client, user, since: datetime) -> dict:
+    resp = client.get(
+        "/api/chapters/status",
+        params={"manga_url": MANGA, "since": since.isoformat()},
+        headers=user["headers"],
+    )
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def test_full_listing_returns_every_row_and_newest_cursor(client, user, db):
+    base = datetime(2026, 10, 19, 12, 0, 0, 500000, tzinfo=timezone.utc)
+    _seed(db, user["id"], {"1": base, "2": base + timedelta(seconds=3)})
+
+    resp = client.get("/api/chapters/status", params={"manga_url": MANGA}, headers=user["headers"])
+
+    body = resp.json()
+    assert set(body["statuses"]) == {f"{MANGA}1/", f"{MANGA}2/"}
+    assert body["cursor"] == (base + timedelta(seconds=3)).isoformat()
+
+
+def test_delta_includes_rows_committed_just_before_the_cursor(client, user, db):
+    cursor = datetime(2026, 10, 19, 12, 0, 0, 500000, tzinfo=timezone.utc)
+    _seed(db, user["id"], {
+        "old": cursor - CURSOR_OVERLAP - timedelta(seconds=50),
+        "late": cursor - CURSOR_OVERLAP / 2,  # committed after the cursor was read, stamped before it
+        "new": cursor + timedelta(seconds=1),
+    })
+
+    body = _since(client, user, cursor)
+
+    assert set(body["statuses"]) == {f"{MANGA}late/", f"{MANGA}new/"}
+    assert body["cursor"] == (cursor + timedelta(seconds=1)).isoformat()
+
+
+def test_delta_without_changes_keeps_the_cursor(client, user, db):
+    cursor = datetime(2026, 10, 19, 12, 0, 0, 500000, tzinfo=timezone.utc)
+    _seed(db, user["id"], {"old": cursor - timedelta(hours=1)})
+
+    body = _since(client, user, cursor)
+
+    assert body["statuses"] == {}
+    assert body["cursor"] == cursor.isoformat()
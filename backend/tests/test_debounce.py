@@ -0,0 +1,119 @@
+import asyncio
+
+from app.debounce import KeyedDebouncer
+
+DELAY = 0.05
+
+
+def test_burst_runs_once_after_the_quiet_window():
+    async def scenario():
+        runs = []
+
+        async def job(user, manga):
+            runs.append((user, manga))
+
+        debouncer = KeyedDebouncer("test", job, DELAY)
+        for _ in range(5):
+            debouncer.schedule("u1", "m1")
+            await asyncio.sleep(DELAY / 5)
+        assert debouncer.status("u1", "m1") == "pending"
+        assert runs == []
+
+        assert await debouncer.wait("u1", "m1", timeout=1)
+        assert runs == [("u1", "m1")]
+        assert debouncer.status("u1", "m1") == "idle"
+
+    asyncio.run(scenario())
+
+
+def test_keys_are_debounced_independently():
+    async def scenario():
+        runs = []
+
+        async def job(key):
+            runs.append(key)
+
+        debouncer = KeyedDebouncer("test", job, DELAY)
+        debouncer.schedule("a")
+        debouncer.schedule("b")
+        debouncer.schedule("a")
+        await debouncer.wait("a", timeout=1)
+        await debouncer.wait("b", timeout=1)
+        assert sorted(runs) == ["a", "b"]
+
+    asyncio.run(scenario())
+
+
+def test_calls_during_a_run_queue_exactly_one_follow_up():
+    async def scenario():
+        started = asyncio.Event()
+        release = asyncio.Event()
+        runs = 0
+
+        async def job(key):
+            nonlocal runs
+            runs += 1
+            started.set()
+            await release.wait()
+
+        debouncer = KeyedDebouncer("test", job, DELAY)
+        debouncer.schedule("k")
+        await started.wait()
+        assert debouncer.status("k") == "running"
+        for _ in range(3):
+            debouncer.schedule("k")
+        release.set()
+
+        assert await debouncer.wait("k", timeout=1)
+        assert runs == 2
+
+    asyncio.run(scenario())
+
+
+def test_failing_job_does_not_block_later_runs():
+    async def scenario():
+        calls = 0
+
+        async def job(key):
+            nonlocal calls
+            calls += 1
+            raise RuntimeError("boom")
+
+        debouncer = KeyedDebouncer("test", job, DELAY)
+        debouncer.schedule("k")
+        await debouncer.wait("k", timeout=1)
+        debouncer.schedule("k")
+        await debouncer.wait("k", timeout=1)
+        assert calls == 2
+        assert debouncer.status("k") == "idle"
+
+    asyncio.run(scenario())
+
+
+def test_wait_times_out_while_the_window_is_open():
+    async def scenario():
+        async def job(key):
+            pass
+
+        debouncer = KeyedDebouncer("test", job, 10)
+        debouncer.schedule("k")
+        assert not await debouncer.wait("k", timeout=DELAY)
+        await debouncer.drain(timeout=1)
+
+    asyncio.run(scenario())
+
+
+def test_drain_runs_pending_jobs_immediately():
+    async def scenario():
+        runs = []
+
+        async def job(key):
+            runs.append(key)
+
+        debouncer = KeyedDebouncer("test", job, 60)
+        debouncer.schedule("a")
+        debouncer.schedule("b")
+        await debouncer.drain(timeout=1)
+        assert sorted(runs) == ["a", "b"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,112 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import governor as governor_module
+from app.config import settings
+from app.governor import CircuitBreaker, Governor, TokenBucket, UpstreamUnavailable, _retry_after
+
+
+@pytest.fixture
+def clock(clock, monkeypatch):
+    monkeypatch.setattr(governor_module, "time", clock)
+    return clock
+
+
+def test_bucket_allows_a_burst_then_spaces_calls(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)  # queued behind the previous reservation
+
+
+def test_bucket_refills_up_to_the_burst(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.reserve()
+
+    clock.advance(60)
+
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve() > 0
+
+
+def test_breaker_opens_after_threshold_failures(clock):
+    breaker = CircuitBreaker(threshold=3, cooldown=10)
+
+    assert [breaker.failure() for _ in range(3)] == [False, False, True]
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() == pytest.approx(10)
+    assert not breaker.failure()  # already open
+
+
+def test_breaker_honours_a_longer_retry_after(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=10)
+    breaker.failure(retry_after=45)
+    assert breaker.allow() == pytest.approx(45)
+
+
+def test_breaker_lets_one_probe_through_after_the_cooldown(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=10)
+    breaker.failure()
+    clock.advance(10)
+
+    assert breaker.allow() == 0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow() > 0  # a second caller waits for the probe
+
+    breaker.success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() == 0
+
+
+def test_failed_probe_doubles_the_cooldown(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=10)
+    breaker.failure()
+    clock.advance(10)
+    breaker.allow()
+
+    assert breaker.failure()
+    assert breaker.allow() == pytest.approx(20)
+
+    clock.advance(20)
+    breaker.allow()
+    breaker.success()
+    assert breaker.cooldown == 10
+
+
+@pytest.mark.parametrize("value, expected", [("7", 7.0), ("-3", 0.0), ("soon", None)])
+def test_retry_after_parsing(value, expected):
+    assert _retry_after(httpx.Response(429, headers={"Retry-After": value})) == expected
+
+
+def test_guard_short_circuits_once_the_breaker_opens():
+    async def scenario():
+        gov = Governor()
+        url = "http://upstream.test/page"
+        for _ in range(settings.breaker_failures):
+            async with gov.guard(url) as outcome:
+                outcome.status = 503
+
+        with pytest.raises(UpstreamUnavailable) as exc:
+            async with gov.guard(url):
+                pass
+        assert exc.value.reason == "circuit open"
+        assert exc.value.retry_after == pytest.approx(settings.breaker_cooldown, abs=1)
+
+        async with gov.guard("http://other.test/page") as outcome:  # hosts are independent
+            outcome.status = 200
+
+    asyncio.run(scenario())
+
+
+def test_guard_turns_transport_errors_into_unavailable():
+    async def scenario():
+        with pytest.raises(UpstreamUnavailable) as exc:
+            async with Governor().guard("http://upstream.test/page"):
+                raise httpx.ConnectError("refused")
+        assert exc.value.reason == "connection error"
+
+    asyncio.run(scenario())
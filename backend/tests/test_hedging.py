@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+from app import hedging
+from app.hedging import MIN_SAMPLES, MIN_TIMEOUT, HedgedFetcher, LatencyWindow
+
+PRIMARY = "http://cdn.test/img/1.jpg"
+MIRROR = "http://mirror.test/img/1.jpg"
+
+
+class FakeHosts:
+    """Stands in for ``HedgedFetcher._attempt``: per-URL delay and outcome."""
+
+    def __init__(self, plan: dict[str, tuple[float, bytes | Exception]]):
+        self.plan = plan
+        self.started: list[str] = []
+        self.cancelled: list[str] = []
+
+    async def attempt(self, url: str, headers: dict[str, str]) -> bytes:
+        self.started.append(url)
+        delay, result = self.plan[url]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(url)
+            raise
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def _fetcher(plan, mirrors=None, samples: float | None = None) -> tuple[HedgedFetcher, FakeHosts]:
+    fetcher = HedgedFetcher(timeout=30, mirrors={"cdn.test": ["mirror.test"]} if mirrors is None else mirrors)
+    if samples is not None:
+        for _ in range(MIN_SAMPLES):
+            fetcher._observe("cdn.test", samples)
+    hosts = FakeHosts(plan)
+    fetcher._attempt = hosts.attempt
+    return fetcher, hosts
+
+
+def test_window_needs_enough_samples():
+    window = LatencyWindow(100)
+    for i in range(MIN_SAMPLES - 1):
+        window.add(i)
+    assert window.quantile(0.5) is None
+    window.add(MIN_SAMPLES - 1)
+    assert window.quantile(0.5) is not None
+
+
+def test_window_quantiles_track_recent_samples():
+    window = LatencyWindow(100)
+    for i in range(1, 101):
+        window.add(i / 100)
+    assert window.quantile(0.5) == pytest.approx(0.51)
+    assert window.quantile(0.95) == pytest.approx(0.96)
+    assert window.quantile(0.99) == pytest.approx(1.0)
+
+    for _ in range(100):
+        window.add(5.0)  # old samples fall out
+    assert window.quantile(0.5) == 5.0
+
+
+def test_timeout_follows_the_host_p99_within_bounds():
+    fetcher = HedgedFetcher(timeout=30, mirrors={})
+    assert fetcher.timeout_for("cdn.test") == 30
+    assert fetcher.hedge_after("cdn.test") is None
+
+    for _ in range(MIN_SAMPLES):
+        fetcher._observe("fast.test", 0.01)
+        fetcher._observe("medium.test", 2.0)
+        fetcher._observe("slow.test", 20.0)
+    assert fetcher.timeout_for("fast.test") == MIN_TIMEOUT
+    assert fetcher.timeout_for("medium.test") == pytest.approx(2.0 * hedging.TIMEOUT_FACTOR)
+    assert fetcher.timeout_for("slow.test") == 30
+    assert fetcher.hedge_after("medium.test") == pytest.approx(2.0)
+
+
+def test_no_hedge_until_the_host_has_history():
+    async def scenario():
+        fetcher, hosts = _fetcher({PRIMARY: (0.05, b"primary")})
+        assert await fetcher.fetch(PRIMARY, {}) == b"primary"
+        assert hosts.started == [PRIMARY]
+
+    asyncio.run(scenario())
+
+
+def test_slow_primary_is_hedged_to_the_mirror():
+    async def scenario():
+        fetcher, hosts = _fetcher({PRIMARY: (5, b"primary"), MIRROR: (0.01, b"mirror")}, samples=0.02)
+        assert await asyncio.wait_for(fetcher.fetch(PRIMARY, {}), 2) == b"mirror"
+        await asyncio.sleep(0)
+        assert hosts.started == [PRIMARY, MIRROR]
+        assert hosts.cancelled == [PRIMARY]
+
+    asyncio.run(scenario())
+
+
+def test_hedge_goes_to_the_same_host_without_mirrors():
+    async def scenario():
+        calls = 0
+
+        async def attempt(url, headers):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(5 if calls == 1 else 0.01)
+            return b"second"
+
+        fetcher = HedgedFetcher(timeout=30, mirrors={})
+        for _ in range(MIN_SAMPLES):
+            fetcher._observe("cdn.test", 0.02)
+        fetcher._attempt = attempt
+        assert await asyncio.wait_for(fetcher.fetch(PRIMARY, {}), 2) == b"second"
+        assert calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_fast_primary_is_not_hedged():
+    async def scenario():
+        fetcher, hosts = _fetcher({PRIMARY: (0.01, b"primary"), MIRROR: (0.01, b"mirror")}, samples=1.0)
+        assert await fetcher.fetch(PRIMARY, {}) == b"primary"
+        assert hosts.started == [PRIMARY]
+
+    asyncio.run(scenario())
+
+
+def test_failed_primary_fails_over_to_the_mirror():
+    async def scenario():
+        fetcher, hosts = _fetcher({PRIMARY: (0, ConnectionError("reset")), MIRROR: (0.01, b"mirror")})
+        assert await fetcher.fetch(PRIMARY, {}) == b"mirror"
+        assert hosts.started == [PRIMARY, MIRROR]
+
+    asyncio.run(scenario())
+
+
+def test_last_error_is_raised_when_every_host_fails():
+    async def scenario():
+        fetcher, hosts = _fetcher({PRIMARY: (0, ConnectionError("reset")), MIRROR: (0, TimeoutError("slow"))})
+        with pytest.raises(TimeoutError):
+            await fetcher.fetch(PRIMARY, {})
+        assert hosts.started == [PRIMARY, MIRROR]
+
+    asyncio.run(scenario())
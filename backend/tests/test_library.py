@@ -0,0 +1,140 @@
+import base64
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.routes import library
+from app.routes.library import _decode_cursor, _encode_cursor
+
+BASE = datetime(2026, 10, 19, 12, 0, 0, 500000, tzinfo=timezone.utc)
+
+
+def _seed(db, user_id: str, count: int, tied: int = 0) -> list[dict]:
+    """``count`` entries one second apart, the newest ``tied`` sharing one updated_at."""
+    rows = [
+        {
+            "user_id": user_id,
+            "manga_url": f"http://fake/manga/library-{i}/",
+            "manga_title": f"Manga {i}",
+            "status": "reading",
+            "updated_at": (BASE + timedelta(seconds=min(i, count - tied))).isoformat(),
+        }
+        for i in range(count)
+    ]
+    return db.table("library").upsert(rows).execute().data
+
+
+def _pages(client, user, **params) -> list[dict]:
+    pages, cursor = [], None
+    while True:
+        resp = client.get("/api/library", params={**params, **({"cursor": cursor} if cursor else {})},
+                          headers=user["headers"])
+        assert resp.status_code == 200
+        pages.append(resp.json())
+        cursor = pages[-1]["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    entry = {"updated_at": BASE.isoformat(), "id": "3f1c0a52-0000-4000-8000-000000000000"}
+    assert _decode_cursor(_encode_cursor(entry)) == (entry["updated_at"], entry["id"])
+
+
+def _raw_cursor(text: bytes) -> str:
+    return base64.urlsafe_b64encode(text).decode()
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    _raw_cursor(b"no-separator"),
+    _raw_cursor(b"\xff\xfe|x"),  # not UTF-8
+    _raw_cursor(b"yesterday|3f1c0a52-0000-4000-8000-000000000000"),
+    _raw_cursor(b"2026-10-19T12:00:00+00:00|42"),
+    _raw_cursor(b'2026-10-19T12:00:00+00:00|3f1c0a52-0000-4000-8000-000000000000),id.gt.0'),
+    _raw_cursor(b'2026-10-19T12:00:00"),user_id.neq.x|3f1c0a52-0000-4000-8000-000000000000'),
+    _raw_cursor(b"2026-10-19T12:00:00+00:00|3f1c0a52-0000-4000-8000-000000000000")[:-6],  # truncated
+])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        _decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+def test_tampered_cursor_is_rejected_by_the_route(client, user):
+    cursor = _raw_cursor(b'x",id.gt.0|1')
+    resp = client.get("/api/library", params={"cursor": cursor}, headers=user["headers"])
+    assert resp.status_code == 400
+
+
+def test_pages_cover_every_entry_once_newest_first(client, user, db):
+    rows = _seed(db, user["id"], 7, tied=3)
+
+    pages = _pages(client, user, limit=2)
+
+    assert [len(p["entries"]) for p in pages] == [2, 2, 2, 1]
+    entries = [e for p in pages for e in p["entries"]]
+    assert sorted(e["id"] for e in entries) == sorted(r["id"] for r in rows)
+    keys = [(e["updated_at"], e["id"]) for e in entries]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_full_last_page_still_returns_a_cursor(client, user, db):
+    _seed(db, user["id"], 4)
+
+    pages = _pages(client, user, limit=2)
+
+    assert [len(p["entries"]) for p in pages] == [2, 2, 0]
+
+
+def test_limit_is_capped_at_the_page_size(client, user):
+    resp = client.get("/api/library", params={"limit": library.PAGE_SIZE + 1}, headers=user["headers"])
+    assert resp.status_code == 422
+
+
+def test_progress_is_attached_per_page_in_batches(client, user, db, monkeypatch):
+    monkeypatch.setattr(library, "PROGRESS_BATCH", 2)
+    rows = _seed(db, user["id"], 5)
+    db.table("chapter_progress").upsert([
+        {"user_id": user["id"], "manga_url": row["manga_url"], "max_read_chapter": i, "read_count": i}
+        for i, row in enumerate(rows)
+    ]).execute()
+
+    resp = client.get("/api/library", headers=user["headers"])
+
+    progress = {e["manga_url"]: e["progress"]["max_read_chapter"] for e in resp.json()["entries"]}
+    assert progress == {row["manga_url"]: i for i, row in enumerate(rows)}
+
+
+def test_projection_rejects_unknown_fields(client, user):
+    resp = client.get("/api/library", params={"fields": "manga_title,password"}, headers=user["headers"])
+    assert resp.status_code == 400
+
+
+def test_unchanged_library_revalidates_with_304(client, user, db):
+    _seed(db, user["id"], 2)
+    first = client.get("/api/library", headers=user["headers"])
+    etag = first.headers["etag"]
+
+    again = client.get("/api/library", headers={**user["headers"], "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+
+    other_page = client.get("/api/library", params={"limit": 1}, headers={**user["headers"], "If-None-Match": etag})
+    assert other_page.status_code == 200
+
+
+def test_changes_move_the_etag(client, user, db):
+    _seed(db, user["id"], 2)
+    etag = client.get("/api/library", headers=user["headers"]).headers["etag"]
+
+    client.post(
+        "/api/library",
+        json={"manga_url": "http://fake/manga/library-new/", "manga_title": "New"},
+        headers=user["headers"],
+    )
+
+    resp = client.get("/api/library", headers={**user["headers"], "If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
@@ -0,0 +1,168 @@
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from app import image_cache, scraper
+from app.governor import UpstreamUnavailable
+from app.pdf_jobs import JobLimitExceeded, PdfJobs
+
+CHAPTERS = ["http://fake/leer/manga/1/", "http://fake/leer/manga/2/"]
+
+
+def _jpeg() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 12), "white").save(buf, "JPEG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    return PdfJobs(str(tmp_path), workers=1, per_user=2, ttl=3600)
+
+
+async def _finished(jobs: PdfJobs, job_id: str, token: str):
+    for _ in range(500):
+        job = jobs.get(job_id, token)
+        if job.state not in ("queued", "running"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_identical_submissions_share_a_job_with_separate_tokens(jobs):
+    async def scenario():
+        job, alice = await jobs.submit("alice", CHAPTERS, "a.pdf")
+        same, bob = await jobs.submit("bob", CHAPTERS, "a.pdf")
+        again, alice_again = await jobs.submit("alice", CHAPTERS, "a.pdf")
+
+        assert same is job and again is job
+        assert alice != bob
+        assert alice_again == alice
+        assert job.owners == ["alice", "bob"]
+
+    asyncio.run(scenario())
+
+
+def test_jobs_are_only_readable_with_an_issued_token(jobs):
+    async def scenario():
+        job, token = await jobs.submit("alice", CHAPTERS, "a.pdf")
+        assert jobs.get(job.id, token) is job
+        assert jobs.get(job.id, "guessed") is None
+        assert jobs.get("missing", token) is None
+
+    asyncio.run(scenario())
+
+
+def test_unfinished_jobs_per_user_are_limited(jobs):
+    async def scenario():
+        await jobs.submit("alice", CHAPTERS[:1], "1.pdf")
+        await jobs.submit("alice", CHAPTERS[1:], "2.pdf")
+        with pytest.raises(JobLimitExceeded):
+            await jobs.submit("alice", CHAPTERS, "3.pdf")
+
+        await jobs.submit("bob", CHAPTERS, "3.pdf")
+        await jobs.submit("alice", CHAPTERS[:1], "1.pdf")  # joining an existing job is still allowed
+
+    asyncio.run(scenario())
+
+
+def test_build_writes_the_pdf_and_removes_scratch_pages(jobs, monkeypatch):
+    async def get_chapter_images(url, priority):
+        return [f"{url}page-{i}.jpg" for i in range(3)]
+
+    async def get_image(url):
+        if url.endswith("page-1.jpg"):
+            raise ValueError("404")  # a missing page is skipped, not fatal
+        return _jpeg()
+
+    monkeypatch.setattr(scraper, "get_chapter_images", get_chapter_images)
+    monkeypatch.setattr(image_cache, "get_image", get_image)
+
+    async def scenario():
+        await jobs.start()
+        try:
+            job, token = await jobs.submit("alice", CHAPTERS, "a.pdf")
+            job = await _finished(jobs, job.id, token)
+        finally:
+            await jobs.stop()
+
+        assert job.state == "done", job.error
+        assert (job.chapters_done, job.pages_done, job.pages_total) == (2, 6, 6)
+        pdf = jobs.artifact(job).read_bytes()
+        assert pdf.startswith(b"%PDF") and len(pdf) == job.size
+        assert not jobs._scratch(job).exists()
+
+        # A finished job with its file still present is reused
+        again, _ = await jobs.submit("bob", CHAPTERS, "a.pdf")
+        assert again is job
+
+    asyncio.run(scenario())
+
+
+def test_build_fails_when_no_page_downloads(jobs, monkeypatch):
+    async def get_chapter_images(url, priority):
+        return [f"{url}page-0.jpg"]
+
+    async def get_image(url):
+        raise ValueError("404")
+
+    monkeypatch.setattr(scraper, "get_chapter_images", get_chapter_images)
+    monkeypatch.setattr(image_cache, "get_image", get_image)
+
+    async def scenario():
+        await jobs.start()
+        try:
+            job, token = await jobs.submit("alice", CHAPTERS[:1], "a.pdf")
+            job = await _finished(jobs, job.id, token)
+        finally:
+            await jobs.stop()
+        assert job.state == "failed"
+        assert not jobs.artifact(job).exists()
+        assert not jobs._scratch(job).exists()
+
+    asyncio.run(scenario())
+
+
+def test_throttled_chapters_are_retried(jobs, monkeypatch):
+    attempts = 0
+
+    async def get_chapter_images(url, priority):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise UpstreamUnavailable("fake", "status 429", 0)
+        return [f"{url}page-0.jpg"]
+
+    async def get_image(url):
+        return _jpeg()
+
+    monkeypatch.setattr(scraper, "get_chapter_images", get_chapter_images)
+    monkeypatch.setattr(image_cache, "get_image", get_image)
+
+    async def scenario():
+        await jobs.start()
+        try:
+            job, token = await jobs.submit("alice", CHAPTERS[:1], "a.pdf")
+            job = await _finished(jobs, job.id, token)
+        finally:
+            await jobs.stop()
+        assert job.state == "done", job.error
+        assert attempts == 2
+
+    asyncio.run(scenario())
+
+
+def test_queued_jobs_resume_after_a_restart(tmp_path):
+    async def scenario():
+        first = PdfJobs(str(tmp_path), workers=1, per_user=2, ttl=3600)
+        job, token = await first.submit("alice", CHAPTERS, "a.pdf")
+
+        restarted = PdfJobs(str(tmp_path), workers=0, per_user=2, ttl=3600)
+        await restarted.start()
+        resumed = restarted.get(job.id, token)
+        assert resumed is not None and resumed.state == "queued"
+        assert restarted._queue.qsize() == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def fetch(value):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            return value * 2
+
+        results = await asyncio.gather(*(flight.do("k", fetch, 21) for _ in range(5)))
+        assert results == [42] * 5
+        assert calls == 1
+        assert "k" not in flight
+
+        assert await flight.do("k", fetch, 1) == 2  # finished calls aren't reused
+        assert calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_errors_reach_every_caller():
+    async def scenario():
+        flight = SingleFlight("test")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream broke")
+
+        results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        assert "k" not in flight
+
+    asyncio.run(scenario())
+
+
+def test_one_caller_leaving_does_not_cancel_the_others():
+    async def scenario():
+        flight = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "done"
+
+        leaver = asyncio.create_task(flight.do("k", fetch))
+        stayer = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        leaver.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await stayer == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await leaver
+
+    asyncio.run(scenario())
+
+
+def test_call_is_cancelled_once_every_caller_leaves():
+    async def scenario():
+        flight = SingleFlight("test")
+        cancelled = asyncio.Event()
+
+        async def fetch():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.create_task(flight.do("k", fetch)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        assert "k" not in flight
+
+    asyncio.run(scenario())
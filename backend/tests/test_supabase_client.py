@@ -0,0 +1,72 @@
+import asyncio
+
+from app.config import settings
+from app.supabase_client import fetch_all_rows, iter_pages
+
+MANGA = "http://fake/manga/paging/"
+
+
+def _seed(db, user_id: str, count: int) -> None:
+    db.table("chapter_status").upsert([
+        {"user_id": user_id, "manga_url": MANGA, "chapter_url": f"{MANGA}{i:05d}/", "is_read": True}
+        for i in range(count)
+    ]).execute()
+
+
+def _statuses(db, user_id: str, calls: list | None = None):
+    def query():
+        if calls is not None:
+            calls.append(1)
+        return db.table("chapter_status").select("chapter_url").eq("user_id", user_id).eq("manga_url", MANGA)
+    return query
+
+
+def _pages(query_fn, page_size: int | None = None) -> list[list[dict]]:
+    async def collect():
+        return [page async for page in iter_pages(query_fn, key="chapter_url", page_size=page_size)]
+    return asyncio.run(collect())
+
+
+def test_pages_follow_the_key_in_order(db, user):
+    _seed(db, user["id"], 5)
+
+    pages = _pages(_statuses(db, user["id"]), page_size=2)
+
+    assert [len(p) for p in pages] == [2, 2, 1]
+    urls = [row["chapter_url"] for page in pages for row in page]
+    assert urls == sorted(urls) and len(set(urls)) == 5
+
+
+def test_exactly_full_last_page_costs_one_empty_request(db, user):
+    _seed(db, user["id"], 4)
+    calls = []
+
+    pages = _pages(_statuses(db, user["id"], calls), page_size=2)
+
+    assert [len(p) for p in pages] == [2, 2]  # the empty page isn't yielded
+    assert len(calls) == 3
+
+
+def test_no_rows_yields_no_pages(db, user):
+    assert _pages(_statuses(db, user["id"]), page_size=2) == []
+
+
+def test_key_values_shared_with_filtered_out_rows(db, user):
+    # Another user has the same chapter URLs: the key only has to be unique
+    # within the filtered result, as (user_id, chapter_url) is
+    _seed(db, user["id"], 5)
+    _seed(db, f"{user['id']}-other", 5)
+
+    rows = asyncio.run(fetch_all_rows(_statuses(db, user["id"]), key="chapter_url", page_size=2))
+
+    assert len(rows) == 5
+    assert len({row["chapter_url"] for row in rows}) == 5
+
+
+def test_page_size_above_max_rows_still_reads_everything(db, user):
+    count = settings.supabase_max_rows + 250
+    _seed(db, user["id"], count)
+
+    pages = _pages(_statuses(db, user["id"]), page_size=settings.supabase_max_rows * 5)
+
+    assert [len(p) for p in pages] == [settings.supabase_max_rows, 250]
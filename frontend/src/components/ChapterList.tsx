@@ -109,7 +109,14 @@ export default function ChapterList({ chapters, mangaUrl }: Props) {
       : 0;
     await api("/api/chapters/mark-previous-read", {
       method: "POST",
-      body: JSON.stringify({ manga_url: mangaUrl, chapter_urls: urls, max_chapter_number: maxChapterNum, is_read: newVal }),
+      // The server marks the range from its chapter catalog; URLs are only a fallback
+      // for lists without chapter numbers
+      body: JSON.stringify({
+        manga_url: mangaUrl,
+        chapter_urls: maxChapterNum >= 0 ? [] : urls,
+        max_chapter_number: maxChapterNum,
+        is_read: newVal,
+      }),
     }).catch((err) => console.error("Failed to mark previous:", err));
   };
 
@@ -1,5 +1,5 @@
 import { useState, useEffect, useCallback } from "react";
-import { imageProxyUrl } from "../lib/api";
+import { imageProxyUrl, imageWidthFor } from "../lib/api";
 
 interface Props {
   images: string[];
@@ -38,7 +38,7 @@ export default function ReaderViewer({ images, onPageChange }: Props) {
     <div className="reader-viewer">
       <div className="reader-image-container" onClick={next}>
         <img
-          src={imageProxyUrl(images[currentPage])}
+          src={imageProxyUrl(images[currentPage], imageWidthFor(window.innerWidth))}
           alt={`Page ${currentPage + 1}`}
           className="reader-image"
         />
@@ -18,10 +18,17 @@ function buildApiUrl(path: string): string {
   return `${API_BASE}${normalizedPath}`;
 }
 
-export async function api<T = unknown>(
-  path: string,
-  options: RequestInit = {}
-): Promise<T> {
+export class ApiError extends Error {
+  /** Seconds the server asked us to wait before retrying (503s), if any. */
+  retryAfter: number | null;
+
+  constructor(message: string, retryAfter: number | null = null) {
+    super(message);
+    this.retryAfter = retryAfter;
+  }
+}
+
+async function apiFetch(path: string, options: RequestInit = {}): Promise<Response> {
   // Always get the fresh token from Supabase session
   const { data } = await supabase.auth.getSession();
   const token = data.session?.access_token;
@@ -38,20 +45,89 @@ export async function api<T = unknown>(
 
   if (!res.ok) {
     const body = await res.json().catch(() => ({ detail: res.statusText }));
-    throw new Error(body.detail || "API error");
+    const retryAfter = Number(res.headers.get("Retry-After")) || null;
+    throw new ApiError(body.detail || "API error", retryAfter);
   }
 
+  return res;
+}
+
+export async function api<T = unknown>(
+  path: string,
+  options: RequestInit = {}
+): Promise<T> {
+  const res = await apiFetch(path, options);
   return res.json();
 }
 
-export function imageProxyUrl(url: string): string {
-  return buildApiUrl(
-    `/api/reader/image-proxy?url=${encodeURIComponent(url)}`
-  );
+/** Yield each item of an NDJSON response as it arrives. */
+export async function* apiStream<T = unknown>(
+  path: string,
+  options: RequestInit = {}
+): AsyncGenerator<T> {
+  const res = await apiFetch(path, options);
+  const reader = res.body!.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += value;
+    const lines = buffer.split("\n");
+    buffer = lines.pop()!;
+    for (const line of lines) {
+      if (line.trim()) yield JSON.parse(line) as T;
+    }
+  }
+  if (buffer.trim()) yield JSON.parse(buffer) as T;
+}
+
+export type ChapterImagesEvent =
+  | { start: number; images: string[] }
+  | { done: true; total: number }
+  | { error: string; retry_after: number | null };
+
+/** Every library entry, following `next_cursor` across pages. */
+export async function libraryEntries<T>(): Promise<T[]> {
+  const entries: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const page: { entries: T[]; next_cursor: string | null } = await api(
+      "/api/library" + (cursor ? `?cursor=${encodeURIComponent(cursor)}` : "")
+    );
+    entries.push(...page.entries);
+    cursor = page.next_cursor;
+  } while (cursor);
+  return entries;
 }
 
-export function pdfDownloadUrl(chapterUrl: string): string {
+const IMAGE_WIDTHS = [360, 480, 720, 1080, 1440];
+
+/** Smallest standard width covering `cssWidth` on this screen (few variants, good cache reuse). */
+export function imageWidthFor(cssWidth: number): number | undefined {
+  const needed = cssWidth * (window.devicePixelRatio || 1);
+  return IMAGE_WIDTHS.find((w) => w >= needed);
+}
+
+export function imageProxyUrl(url: string, width?: number): string {
   return buildApiUrl(
-    `/api/reader/download-pdf?url=${encodeURIComponent(chapterUrl)}`
+    `/api/reader/image-proxy?url=${encodeURIComponent(url)}` +
+      (width ? `&w=${width}&format=auto` : "")
   );
 }
+
+export interface PdfJob {
+  id: string;
+  state: "queued" | "running" | "done" | "failed";
+  filename: string;
+  chapters_total: number;
+  chapters_done: number;
+  pages_total: number;
+  pages_done: number;
+  size: number;
+  error: string | null;
+  token: string;
+}
+
+export function pdfJobDownloadUrl(job: PdfJob): string {
+  return buildApiUrl(`/api/reader/pdf-jobs/${job.id}/download?token=${encodeURIComponent(job.token)}`);
+}
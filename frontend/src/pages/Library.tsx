@@ -1,6 +1,6 @@
 import { useEffect, useState } from "react";
 import { Link, Navigate } from "react-router-dom";
-import { api, imageProxyUrl } from "../lib/api";
+import { api, imageProxyUrl, libraryEntries } from "../lib/api";
 import { useAuth } from "../contexts/AuthContext";
 
 interface LibraryEntry {
@@ -44,8 +44,8 @@ export default function Library() {
 
   useEffect(() => {
     if (!user) return;
-    api<{ entries: LibraryEntry[] }>("/api/library")
-      .then((data) => setEntries(data.entries))
+    libraryEntries<LibraryEntry>()
+      .then(setEntries)
       .finally(() => setLoading(false));
   }, [user]);
 
@@ -1,6 +1,6 @@
 import { useEffect, useState } from "react";
 import { useSearchParams } from "react-router-dom";
-import { api, imageProxyUrl } from "../lib/api";
+import { api, imageProxyUrl, libraryEntries } from "../lib/api";
 import { useAuth } from "../contexts/AuthContext";
 import ChapterList from "../components/ChapterList";
 
@@ -50,8 +50,8 @@ export default function MangaDetail() {
 
   useEffect(() => {
     if (!user) return;
-    api<{ entries: { manga_url: string }[] }>("/api/library").then((data) => {
-      setInLibrary(data.entries.some((e) => e.manga_url === mangaUrl));
+    libraryEntries<{ manga_url: string }>().then((entries) => {
+      setInLibrary(entries.some((e) => e.manga_url === mangaUrl));
     });
   }, [user, mangaUrl]);
 
@@ -59,10 +59,8 @@ export default function MangaDetail() {
     if (!manga) return;
     if (inLibrary) {
       if (!confirm("Remove this manga from your library?")) return;
-      const data = await api<{ entries: { id: string; manga_url: string }[] }>(
-        "/api/library"
-      );
-      const entry = data.entries.find((e) => e.manga_url === mangaUrl);
+      const entries = await libraryEntries<{ id: string; manga_url: string }>();
+      const entry = entries.find((e) => e.manga_url === mangaUrl);
       if (entry) {
         await api(`/api/library/${entry.id}`, { method: "DELETE" });
         setInLibrary(false);
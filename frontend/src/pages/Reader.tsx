@@ -1,6 +1,6 @@
 import { useEffect, useState } from "react";
 import { useSearchParams, Link } from "react-router-dom";
-import { api, pdfDownloadUrl } from "../lib/api";
+import { api, ApiError, apiStream, libraryEntries, pdfJobDownloadUrl, type ChapterImagesEvent, type PdfJob } from "../lib/api";
 import { useAuth } from "../contexts/AuthContext";
 import ReaderViewer from "../components/ReaderViewer";
 
@@ -12,15 +12,47 @@ export default function Reader() {
 
   const [images, setImages] = useState<string[]>([]);
   const [loading, setLoading] = useState(true);
+  const [pdfStatus, setPdfStatus] = useState<string | null>(null);
+
+  const [complete, setComplete] = useState(false);
+  const [error, setError] = useState<string | null>(null);
+  const [attempt, setAttempt] = useState(0);
 
   useEffect(() => {
     if (!chapterUrl) return;
-    api<{ images: string[] }>(
-      `/api/manga/chapter-images?url=${encodeURIComponent(chapterUrl)}`
-    )
-      .then((data) => setImages(data.images))
-      .finally(() => setLoading(false));
-  }, [chapterUrl]);
+    // Pages arrive as the server finds them, so the first can load right away
+    const controller = new AbortController();
+    setImages([]);
+    setComplete(false);
+    setError(null);
+    setLoading(true);
+    (async () => {
+      for await (const event of apiStream<ChapterImagesEvent>(
+        `/api/manga/chapter-images/stream?url=${encodeURIComponent(chapterUrl)}` +
+          (mangaUrl ? `&manga_url=${encodeURIComponent(mangaUrl)}` : ""),
+        { signal: controller.signal }
+      )) {
+        if ("images" in event) {
+          setImages((prev) => [...prev.slice(0, event.start), ...event.images]);
+          setLoading(false);
+        } else if ("done" in event) {
+          setImages((prev) => prev.slice(0, event.total));
+          setComplete(true);
+        } else {
+          throw new ApiError(event.error, event.retry_after);
+        }
+      }
+    })()
+      .catch((e) => {
+        if (controller.signal.aborted) return;
+        const wait = e instanceof ApiError && e.retryAfter ? ` Try again in ${e.retryAfter}s.` : "";
+        setError((e instanceof Error ? e.message : "Could not load this chapter.") + wait);
+      })
+      .finally(() => {
+        if (!controller.signal.aborted) setLoading(false);
+      });
+    return () => controller.abort();
+  }, [chapterUrl, mangaUrl, attempt]);
 
   const updateProgress = async (page: number) => {
     if (!user || !mangaUrl) return;
@@ -28,12 +60,12 @@ export default function Reader() {
     // Extract chapter number from URL
     const parts = chapterUrl.split("/").filter(Boolean);
     const chapNum = parseFloat(parts[parts.length - 1]) || 0;
-    if (chapNum > 0 && page === images.length - 1) {
+    if (chapNum > 0 && complete && page === images.length - 1) {
       try {
-        const libData = await api<{
-          entries: { id: string; manga_url: string; current_chapter: number; anilist_media_id: number | null }[];
-        }>("/api/library");
-        const entry = libData.entries.find((e) => e.manga_url === mangaUrl);
+        const entries = await libraryEntries<{
+          id: string; manga_url: string; current_chapter: number; anilist_media_id: number | null;
+        }>();
+        const entry = entries.find((e) => e.manga_url === mangaUrl);
         if (entry && chapNum > entry.current_chapter) {
           await api(`/api/library/${entry.id}`, {
             method: "PATCH",
@@ -57,6 +89,33 @@ export default function Reader() {
     }
   };
 
+  const downloadPdf = async () => {
+    try {
+      // The PDF is built in the background; poll until it's ready
+      let job = await api<PdfJob>("/api/reader/pdf-jobs", {
+        method: "POST",
+        body: JSON.stringify({ url: chapterUrl }),
+      });
+      while (job.state === "queued" || job.state === "running") {
+        setPdfStatus(
+          job.pages_total
+            ? `Preparing PDF... ${Math.round((100 * job.pages_done) / job.pages_total)}%`
+            : "Preparing PDF..."
+        );
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const status = await api<PdfJob>(
+          `/api/reader/pdf-jobs/${job.id}?token=${encodeURIComponent(job.token)}`
+        );
+        job = { ...status, token: job.token };
+      }
+      if (job.state === "failed") throw new Error(job.error || "PDF export failed");
+      setPdfStatus(null);
+      window.location.href = pdfJobDownloadUrl(job);
+    } catch (e) {
+      setPdfStatus(e instanceof Error ? e.message : "PDF export failed");
+    }
+  };
+
   if (loading) return <div className="loading">Loading chapter...</div>;
 
   return (
@@ -67,15 +126,22 @@ export default function Reader() {
             Back to Manga
           </Link>
         )}
-        <a
-          href={pdfDownloadUrl(chapterUrl)}
+        <button
           className="btn btn-sm"
-          target="_blank"
-          rel="noopener noreferrer"
+          onClick={downloadPdf}
+          disabled={pdfStatus?.startsWith("Preparing")}
         >
-          Download PDF
-        </a>
+          {pdfStatus || "Download PDF"}
+        </button>
       </div>
+      {error && (
+        <div className="error-msg">
+          {error}{" "}
+          <button className="btn btn-sm" onClick={() => setAttempt((n) => n + 1)}>
+            Retry
+          </button>
+        </div>
+      )}
       <ReaderViewer images={images} onPageChange={updateProgress} />
     </div>
   );
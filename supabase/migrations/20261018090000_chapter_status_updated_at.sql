@@ -0,0 +1,22 @@
+-- Track when each chapter_status row last changed so clients can fetch
+-- only the statuses that changed since their last sync (?since=<cursor>).
+
+ALTER TABLE chapter_status
+  ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now();
+
+UPDATE chapter_status SET updated_at = created_at WHERE updated_at > created_at;
+
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+  NEW.updated_at = now();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS chapter_status_set_updated_at ON chapter_status;
+CREATE TRIGGER chapter_status_set_updated_at
+  BEFORE UPDATE ON chapter_status
+  FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+CREATE INDEX IF NOT EXISTS chapter_status_user_manga_updated_idx
+  ON chapter_status (user_id, manga_url, updated_at);
@@ -0,0 +1,65 @@
+-- Stored chapter catalog per manga, so "mark everything up to chapter N"
+-- runs as one statement in the database instead of the client (or the
+-- backend) sending one chapter_status row per chapter.
+
+CREATE TABLE IF NOT EXISTS manga_chapters (
+  manga_url text NOT NULL,
+  chapter_url text NOT NULL,
+  chapter_number float NOT NULL DEFAULT -1,
+  position int NOT NULL,
+  synced_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (manga_url, chapter_url)
+);
+
+CREATE INDEX IF NOT EXISTS manga_chapters_manga_number_idx
+  ON manga_chapters (manga_url, chapter_number);
+
+-- Public site data; only the backend (service key) writes it
+ALTER TABLE manga_chapters ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Anyone can view the chapter catalog" ON manga_chapters;
+CREATE POLICY "Anyone can view the chapter catalog" ON manga_chapters
+  FOR SELECT USING (true);
+
+-- Mark (or unmark) every catalogued chapter of a manga with
+-- chapter_number <= p_max_chapter (all chapters when null) and return the
+-- number of rows that changed.  Rows already in the requested state are
+-- left alone so their updated_at (the delta-sync cursor) doesn't move.
+-- Chapters whose number is unknown (-1) are never part of a range.
+-- The backend calls it with the service key, which bypasses RLS, so it
+-- trusts p_user_id: only service_role may execute it (see below).
+CREATE OR REPLACE FUNCTION mark_chapters_read(
+  p_user_id uuid,
+  p_manga_url text,
+  p_max_chapter float DEFAULT NULL,
+  p_is_read boolean DEFAULT true
+) RETURNS integer AS $$
+DECLARE
+  changed integer;
+BEGIN
+  IF p_is_read THEN
+    INSERT INTO chapter_status (user_id, manga_url, chapter_url, is_read)
+    SELECT p_user_id, p_manga_url, c.chapter_url, true
+    FROM manga_chapters c
+    WHERE c.manga_url = p_manga_url
+      AND (p_max_chapter IS NULL OR c.chapter_number BETWEEN 0 AND p_max_chapter)
+    ON CONFLICT (user_id, chapter_url) DO UPDATE SET is_read = true
+      WHERE NOT chapter_status.is_read;
+  ELSE
+    UPDATE chapter_status s SET is_read = false
+    FROM manga_chapters c
+    WHERE s.user_id = p_user_id
+      AND s.manga_url = p_manga_url
+      AND s.is_read
+      AND c.manga_url = p_manga_url
+      AND c.chapter_url = s.chapter_url
+      AND (p_max_chapter IS NULL OR c.chapter_number BETWEEN 0 AND p_max_chapter);
+  END IF;
+  GET DIAGNOSTICS changed = ROW_COUNT;
+  RETURN changed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Otherwise any signed-in user could mark chapters for any p_user_id
+REVOKE EXECUTE ON FUNCTION mark_chapters_read(uuid, text, float, boolean) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION mark_chapters_read(uuid, text, float, boolean) TO service_role;
@@ -0,0 +1,216 @@
+-- Per-(user, manga) reading progress maintained by triggers, so the API
+-- reads "highest chapter read" with one primary-key lookup instead of
+-- fetching every read row and mapping URLs to chapter numbers in Python.
+
+-- Chapter number on each status row; filled from the chapter catalog when
+-- the writer doesn't know it
+ALTER TABLE chapter_status
+  ADD COLUMN IF NOT EXISTS chapter_number float NOT NULL DEFAULT -1;
+
+-- Numbers rows whose chapters are already catalogued.  Usually none are
+-- yet: older rows get their numbers from chapter_status_number_from_catalog
+-- (below) as each manga's catalog is stored.
+UPDATE chapter_status s SET chapter_number = c.chapter_number
+FROM manga_chapters c
+WHERE s.chapter_number < 0
+  AND c.manga_url = s.manga_url
+  AND c.chapter_url = s.chapter_url;
+
+-- Rows still waiting for a number, looked up by chapter when the catalog
+-- arrives
+CREATE INDEX IF NOT EXISTS chapter_status_unnumbered_idx
+  ON chapter_status (manga_url, chapter_url)
+  WHERE chapter_number < 0;
+
+-- Covering index for the hot paths: read rows of one manga for one user
+-- (progress, status listing) are answered from the index alone
+CREATE INDEX IF NOT EXISTS chapter_status_user_manga_read_idx
+  ON chapter_status (user_id, manga_url, is_read)
+  INCLUDE (chapter_url, chapter_number, updated_at);
+
+-- GET /api/library lists a user's entries newest first
+CREATE INDEX IF NOT EXISTS library_user_updated_idx
+  ON library (user_id, updated_at DESC);
+
+CREATE TABLE IF NOT EXISTS chapter_progress (
+  user_id uuid REFERENCES auth.users(id) ON DELETE CASCADE NOT NULL,
+  manga_url text NOT NULL,
+  max_read_chapter float NOT NULL DEFAULT 0,
+  read_count int NOT NULL DEFAULT 0,
+  -- read rows whose chapter number is still unknown (-1), which the API
+  -- resolves through the scraper instead of trusting max_read_chapter
+  unnumbered_count int NOT NULL DEFAULT 0,
+  last_read_at timestamptz,
+  updated_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (user_id, manga_url)
+);
+
+ALTER TABLE chapter_progress ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view own chapter progress" ON chapter_progress;
+CREATE POLICY "Users can view own chapter progress" ON chapter_progress
+  FOR SELECT USING (auth.uid() = user_id);
+
+CREATE OR REPLACE FUNCTION chapter_status_fill_number() RETURNS trigger AS $$
+BEGIN
+  IF NEW.chapter_number < 0 THEN
+    SELECT c.chapter_number INTO NEW.chapter_number
+    FROM manga_chapters c
+    WHERE c.manga_url = NEW.manga_url AND c.chapter_url = NEW.chapter_url;
+    NEW.chapter_number = coalesce(NEW.chapter_number, -1);
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Also on UPDATE OF chapter_url: an upsert that hits an existing row takes
+-- the conflict path, and PostgREST's SET list always names chapter_url
+DROP TRIGGER IF EXISTS chapter_status_fill_number ON chapter_status;
+CREATE TRIGGER chapter_status_fill_number
+  BEFORE INSERT OR UPDATE OF chapter_url ON chapter_status
+  FOR EACH ROW EXECUTE FUNCTION chapter_status_fill_number();
+
+-- Storing a manga's catalog numbers its chapter_status rows written before
+-- the chapter was catalogued (including every row that predates this
+-- migration).  The UPDATE fires chapter_progress_after_update, which
+-- refreshes the summaries.
+CREATE OR REPLACE FUNCTION chapter_status_number_from_catalog() RETURNS trigger AS $$
+BEGIN
+  UPDATE chapter_status s SET chapter_number = c.chapter_number
+  FROM new_rows c
+  WHERE s.chapter_number < 0
+    AND c.chapter_number >= 0
+    AND s.manga_url = c.manga_url
+    AND s.chapter_url = c.chapter_url;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS chapter_status_number_after_catalog_insert ON manga_chapters;
+CREATE TRIGGER chapter_status_number_after_catalog_insert
+  AFTER INSERT ON manga_chapters
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION chapter_status_number_from_catalog();
+
+DROP TRIGGER IF EXISTS chapter_status_number_after_catalog_update ON manga_chapters;
+CREATE TRIGGER chapter_status_number_after_catalog_update
+  AFTER UPDATE ON manga_chapters
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION chapter_status_number_from_catalog();
+
+-- Recompute one summary row from the covering index.  SECURITY DEFINER so
+-- the triggers can write chapter_progress, which users can only read.
+--
+-- Two transactions writing rows of the same (user, manga) would otherwise
+-- each aggregate a snapshot missing the other's uncommitted rows, and the
+-- last to commit would leave a stale summary.  The transaction-scoped lock
+-- makes the second wait until the first commits; its aggregate, a new
+-- statement under READ COMMITTED, then sees both.
+CREATE OR REPLACE FUNCTION refresh_chapter_progress(p_user_id uuid, p_manga_url text)
+RETURNS void AS $$
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext(p_user_id::text || '|' || p_manga_url));
+  INSERT INTO chapter_progress (user_id, manga_url, max_read_chapter, read_count, unnumbered_count, last_read_at, updated_at)
+  SELECT p_user_id, p_manga_url,
+         greatest(coalesce(max(s.chapter_number), 0), 0),
+         count(*),
+         count(*) FILTER (WHERE s.chapter_number < 0),
+         max(s.updated_at),
+         now()
+  FROM chapter_status s
+  WHERE s.user_id = p_user_id AND s.manga_url = p_manga_url AND s.is_read
+  ON CONFLICT (user_id, manga_url) DO UPDATE SET
+    max_read_chapter = excluded.max_read_chapter,
+    read_count = excluded.read_count,
+    unnumbered_count = excluded.unnumbered_count,
+    last_read_at = excluded.last_read_at,
+    updated_at = excluded.updated_at;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Statement-level triggers: a bulk mark_chapters_read() of a thousand rows
+-- refreshes the summary once per (user, manga), not once per row.  Keys are
+-- locked in a fixed order so two bulk writes can't deadlock on each other.
+CREATE OR REPLACE FUNCTION chapter_progress_from_new_rows() RETURNS trigger AS $$
+BEGIN
+  PERFORM refresh_chapter_progress(k.user_id, k.manga_url)
+  FROM (SELECT DISTINCT user_id, manga_url FROM new_rows ORDER BY 1, 2) k;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION chapter_progress_from_old_rows() RETURNS trigger AS $$
+BEGIN
+  PERFORM refresh_chapter_progress(k.user_id, k.manga_url)
+  FROM (SELECT DISTINCT user_id, manga_url FROM old_rows ORDER BY 1, 2) k;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS chapter_progress_after_insert ON chapter_status;
+CREATE TRIGGER chapter_progress_after_insert
+  AFTER INSERT ON chapter_status
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION chapter_progress_from_new_rows();
+
+DROP TRIGGER IF EXISTS chapter_progress_after_update ON chapter_status;
+CREATE TRIGGER chapter_progress_after_update
+  AFTER UPDATE ON chapter_status
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION chapter_progress_from_new_rows();
+
+DROP TRIGGER IF EXISTS chapter_progress_after_delete ON chapter_status;
+CREATE TRIGGER chapter_progress_after_delete
+  AFTER DELETE ON chapter_status
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION chapter_progress_from_old_rows();
+
+-- Range marking also records chapter numbers
+CREATE OR REPLACE FUNCTION mark_chapters_read(
+  p_user_id uuid,
+  p_manga_url text,
+  p_max_chapter float DEFAULT NULL,
+  p_is_read boolean DEFAULT true
+) RETURNS integer AS $$
+DECLARE
+  changed integer;
+BEGIN
+  IF p_is_read THEN
+    INSERT INTO chapter_status (user_id, manga_url, chapter_url, chapter_number, is_read)
+    SELECT p_user_id, p_manga_url, c.chapter_url, c.chapter_number, true
+    FROM manga_chapters c
+    WHERE c.manga_url = p_manga_url
+      AND (p_max_chapter IS NULL OR c.chapter_number BETWEEN 0 AND p_max_chapter)
+    ON CONFLICT (user_id, chapter_url) DO UPDATE
+      SET is_read = true, chapter_number = excluded.chapter_number
+      WHERE NOT chapter_status.is_read;
+  ELSE
+    UPDATE chapter_status s SET is_read = false
+    FROM manga_chapters c
+    WHERE s.user_id = p_user_id
+      AND s.manga_url = p_manga_url
+      AND s.is_read
+      AND c.manga_url = p_manga_url
+      AND c.chapter_url = s.chapter_url
+      AND (p_max_chapter IS NULL OR c.chapter_number BETWEEN 0 AND p_max_chapter);
+  END IF;
+  GET DIAGNOSTICS changed = ROW_COUNT;
+  RETURN changed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- CREATE OR REPLACE keeps the grants from the catalog migration; restated
+-- so this definition can't end up executable by users on its own
+REVOKE EXECUTE ON FUNCTION mark_chapters_read(uuid, text, float, boolean) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION mark_chapters_read(uuid, text, float, boolean) TO service_role;
+
+-- Backfill
+INSERT INTO chapter_progress (user_id, manga_url, max_read_chapter, read_count, unnumbered_count, last_read_at)
+SELECT user_id, manga_url,
+       greatest(coalesce(max(chapter_number) FILTER (WHERE is_read), 0), 0),
+       count(*) FILTER (WHERE is_read),
+       count(*) FILTER (WHERE is_read AND chapter_number < 0),
+       max(updated_at) FILTER (WHERE is_read)
+FROM chapter_status
+GROUP BY user_id, manga_url
+ON CONFLICT (user_id, manga_url) DO NOTHING;
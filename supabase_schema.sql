@@ -30,16 +30,213 @@ create table if not exists chapter_status (
   user_id uuid references auth.users(id) on delete cascade not null,
   manga_url text not null,
   chapter_url text not null,
+  chapter_number float not null default -1,
   is_read boolean not null default false,
   is_bookmarked boolean not null default false,
   created_at timestamptz not null default now(),
+  updated_at timestamptz not null default now(),
   unique(user_id, chapter_url)
 );
 
+-- Keep chapter_status.updated_at current for delta sync (?since=<cursor>)
+create or replace function set_updated_at() returns trigger as $$
+begin
+  new.updated_at = now();
+  return new;
+end;
+$$ language plpgsql;
+
+create trigger chapter_status_set_updated_at
+  before update on chapter_status
+  for each row execute function set_updated_at();
+
+create index if not exists chapter_status_user_manga_updated_idx
+  on chapter_status (user_id, manga_url, updated_at);
+
+-- Covering index: a user's read rows for one manga straight from the index
+create index if not exists chapter_status_user_manga_read_idx
+  on chapter_status (user_id, manga_url, is_read)
+  include (chapter_url, chapter_number, updated_at);
+
+-- Rows whose chapter number is still unknown, numbered when the catalog arrives
+create index if not exists chapter_status_unnumbered_idx
+  on chapter_status (manga_url, chapter_url)
+  where chapter_number < 0;
+
+create index if not exists library_user_updated_idx
+  on library (user_id, updated_at desc);
+
+-- Chapter catalog: every chapter of a manga as last scraped, used by
+-- mark_chapters_read() to mark ranges server-side
+create table if not exists manga_chapters (
+  manga_url text not null,
+  chapter_url text not null,
+  chapter_number float not null default -1,
+  position int not null,
+  synced_at timestamptz not null default now(),
+  primary key (manga_url, chapter_url)
+);
+
+create index if not exists manga_chapters_manga_number_idx
+  on manga_chapters (manga_url, chapter_number);
+
+-- Mark/unmark all catalogued chapters up to p_max_chapter (all when null;
+-- unnumbered chapters never match a range); returns the number of rows
+-- that changed.  Trusts p_user_id, so only the backend may call it.
+create or replace function mark_chapters_read(
+  p_user_id uuid,
+  p_manga_url text,
+  p_max_chapter float default null,
+  p_is_read boolean default true
+) returns integer as $$
+declare
+  changed integer;
+begin
+  if p_is_read then
+    insert into chapter_status (user_id, manga_url, chapter_url, chapter_number, is_read)
+    select p_user_id, p_manga_url, c.chapter_url, c.chapter_number, true
+    from manga_chapters c
+    where c.manga_url = p_manga_url
+      and (p_max_chapter is null or c.chapter_number between 0 and p_max_chapter)
+    on conflict (user_id, chapter_url) do update
+      set is_read = true, chapter_number = excluded.chapter_number
+      where not chapter_status.is_read;
+  else
+    update chapter_status s set is_read = false
+    from manga_chapters c
+    where s.user_id = p_user_id
+      and s.manga_url = p_manga_url
+      and s.is_read
+      and c.manga_url = p_manga_url
+      and c.chapter_url = s.chapter_url
+      and (p_max_chapter is null or c.chapter_number between 0 and p_max_chapter);
+  end if;
+  get diagnostics changed = row_count;
+  return changed;
+end;
+$$ language plpgsql;
+
+revoke execute on function mark_chapters_read(uuid, text, float, boolean) from public, anon, authenticated;
+grant execute on function mark_chapters_read(uuid, text, float, boolean) to service_role;
+
+-- Chapter progress: per-(user, manga) summary of chapter_status kept
+-- current by triggers, read by the API with one primary-key lookup
+create table if not exists chapter_progress (
+  user_id uuid references auth.users(id) on delete cascade not null,
+  manga_url text not null,
+  max_read_chapter float not null default 0,
+  read_count int not null default 0,
+  -- read rows with no known chapter number; the API resolves those itself
+  unnumbered_count int not null default 0,
+  last_read_at timestamptz,
+  updated_at timestamptz not null default now(),
+  primary key (user_id, manga_url)
+);
+
+-- Fill chapter_status.chapter_number from the catalog when the writer didn't
+create or replace function chapter_status_fill_number() returns trigger as $$
+begin
+  if new.chapter_number < 0 then
+    select c.chapter_number into new.chapter_number
+    from manga_chapters c
+    where c.manga_url = new.manga_url and c.chapter_url = new.chapter_url;
+    new.chapter_number = coalesce(new.chapter_number, -1);
+  end if;
+  return new;
+end;
+$$ language plpgsql;
+
+-- Also on update of chapter_url, which upserts hitting an existing row set
+create trigger chapter_status_fill_number
+  before insert or update of chapter_url on chapter_status
+  for each row execute function chapter_status_fill_number();
+
+-- ...and number rows written before their chapter was catalogued
+create or replace function chapter_status_number_from_catalog() returns trigger as $$
+begin
+  update chapter_status s set chapter_number = c.chapter_number
+  from new_rows c
+  where s.chapter_number < 0
+    and c.chapter_number >= 0
+    and s.manga_url = c.manga_url
+    and s.chapter_url = c.chapter_url;
+  return null;
+end;
+$$ language plpgsql security definer set search_path = public;
+
+create trigger chapter_status_number_after_catalog_insert
+  after insert on manga_chapters
+  referencing new table as new_rows
+  for each statement execute function chapter_status_number_from_catalog();
+
+create trigger chapter_status_number_after_catalog_update
+  after update on manga_chapters
+  referencing new table as new_rows
+  for each statement execute function chapter_status_number_from_catalog();
+
+-- The advisory lock serializes refreshes of one (user, manga), so
+-- concurrent writers can't leave a summary aggregated from a stale snapshot
+create or replace function refresh_chapter_progress(p_user_id uuid, p_manga_url text)
+returns void as $$
+begin
+  perform pg_advisory_xact_lock(hashtext(p_user_id::text || '|' || p_manga_url));
+  insert into chapter_progress (user_id, manga_url, max_read_chapter, read_count, unnumbered_count, last_read_at, updated_at)
+  select p_user_id, p_manga_url,
+         greatest(coalesce(max(s.chapter_number), 0), 0),
+         count(*),
+         count(*) filter (where s.chapter_number < 0),
+         max(s.updated_at),
+         now()
+  from chapter_status s
+  where s.user_id = p_user_id and s.manga_url = p_manga_url and s.is_read
+  on conflict (user_id, manga_url) do update set
+    max_read_chapter = excluded.max_read_chapter,
+    read_count = excluded.read_count,
+    unnumbered_count = excluded.unnumbered_count,
+    last_read_at = excluded.last_read_at,
+    updated_at = excluded.updated_at;
+end;
+$$ language plpgsql security definer set search_path = public;
+
+-- Statement-level, so bulk writes refresh each (user, manga) once; keys in
+-- a fixed order so concurrent bulk writes can't deadlock
+create or replace function chapter_progress_from_new_rows() returns trigger as $$
+begin
+  perform refresh_chapter_progress(k.user_id, k.manga_url)
+  from (select distinct user_id, manga_url from new_rows order by 1, 2) k;
+  return null;
+end;
+$$ language plpgsql;
+
+create or replace function chapter_progress_from_old_rows() returns trigger as $$
+begin
+  perform refresh_chapter_progress(k.user_id, k.manga_url)
+  from (select distinct user_id, manga_url from old_rows order by 1, 2) k;
+  return null;
+end;
+$$ language plpgsql;
+
+create trigger chapter_progress_after_insert
+  after insert on chapter_status
+  referencing new table as new_rows
+  for each statement execute function chapter_progress_from_new_rows();
+
+create trigger chapter_progress_after_update
+  after update on chapter_status
+  referencing new table as new_rows
+  for each statement execute function chapter_progress_from_new_rows();
+
+create trigger chapter_progress_after_delete
+  after delete on chapter_status
+  referencing old table as old_rows
+  for each statement execute function chapter_progress_from_old_rows();
+
 -- Enable Row Level Security
 alter table library enable row level security;
 alter table anilist_tokens enable row level security;
 alter table chapter_status enable row level security;
+alter table manga_chapters enable row level security;
+alter table chapter_progress enable row level security;
 
 -- RLS policies: users can only access their own data
 create policy "Users can view own library" on library
@@ -77,3 +274,9 @@ create policy "Users can update own chapter status" on chapter_status
 
 create policy "Users can delete own chapter status" on chapter_status
   for delete using (auth.uid() = user_id);
+
+create policy "Anyone can view the chapter catalog" on manga_chapters
+  for select using (true);
+
+create policy "Users can view own chapter progress" on chapter_progress
+  for select using (auth.uid() = user_id);